@@ -323,25 +323,24 @@ def xmlobject_to_dict(instance, fields=None, exclude=None, prefix=''):
     else:
         prefix = ''
 
-    for name, field in instance._fields.iteritems():
-        # not editable?
-        if fields and not name in fields:
-            continue
-        if exclude and name in exclude:
-            continue
+    # not editable?
+    names = [name for name in instance._fields
+             if (not fields or name in fields) and not (exclude and name in exclude)]
+    for name, value in zip(names, instance.values(*names)):
+        field = instance._fields[name]
         if isinstance(field, xmlmap.fields.NodeField):
-            nodefield = getattr(instance, name)
+            nodefield = value
             if nodefield is not None:
                 subprefix = '%s%s' % (prefix, name)
                 node_data = xmlobject_to_dict(nodefield, prefix=subprefix)
                 data.update(node_data)   # FIXME: fields/exclude
         if isinstance(field, xmlmap.fields.NodeListField):
-            for i, child in enumerate(getattr(instance, name)):
+            for i, child in enumerate(value):
                 subprefix = '%s%s-%d' % (prefix, name, i)
                 node_data = xmlobject_to_dict(child, prefix=subprefix)
                 data.update(node_data)   # FIXME: fields/exclude
         else:
-            data[prefix + name] = getattr(instance, name)
+            data[prefix + name] = value
 
     return data
 
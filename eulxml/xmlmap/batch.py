@@ -0,0 +1,350 @@
+# file eulxml/xmlmap/batch.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Load, validate, and transform large batches of XML files in parallel.
+
+:func:`validate_files` fans a list of files out to a pool of worker
+processes.  Each worker loads every file it is given as an instance of the
+requested :class:`~eulxml.xmlmap.XmlObject` subclass and validates it,
+reusing its pooled parsers and the schema it compiled when it started, and
+sends back a plain :class:`ValidationResult` record (never an lxml tree).
+
+:func:`xsl_transform_many` similarly runs an XSLT stylesheet over many
+files or :class:`~eulxml.xmlmap.XmlObject` instances with a pool of
+threads or processes, writing the results to files or returning them as
+strings in a :class:`TransformResult` record.
+
+The same functionality is available from the command line as
+``eulxml-validate``::
+
+    eulxml-validate -c eulxml.xmlmap.eadmap.EncodedArchivalDescription -p 4 *.xml
+"""
+
+from collections import namedtuple
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from optparse import OptionParser
+import os
+import sys
+import time
+
+from lxml import etree
+
+from eulxml.xmlmap.core import XmlObject, load_xmlobject_from_file, \
+     xslt_cache
+
+__all__ = ['ValidationResult', 'validate_file', 'validate_files',
+           'TransformResult', 'xsl_transform_many', 'main']
+
+
+class ValidationResult(namedtuple('ValidationResult',
+        ['path', 'valid', 'errors', 'load_time', 'validate_time'])):
+    '''Result of loading and validating a single file: the ``path`` (or
+    other source) it was loaded from; whether it is ``valid``; a list of
+    ``errors`` as strings (parse errors, or schema validation errors); and
+    the time in seconds spent loading (``load_time``) and validating
+    (``validate_time``) the document.'''
+    __slots__ = ()
+
+
+def _import_class(name):
+    '''Import a class specified by its full dotted name, e.g.
+    ``eulxml.xmlmap.eadmap.EncodedArchivalDescription``.'''
+    module_name, _, class_name = name.rpartition('.')
+    if not module_name:
+        raise ValueError('%r is not a full dotted class name' % name)
+    module = __import__(module_name, {}, {}, [class_name])
+    try:
+        return getattr(module, class_name)
+    except AttributeError:
+        raise ValueError('module %s has no class %s' % (module_name, class_name))
+
+
+def validate_file(path, xmlclass=XmlObject):
+    '''Load a single file as an instance of `xmlclass` and validate it.
+    Errors loading or parsing the file are reported in the result rather
+    than raised.
+
+    :param path: path to the file to be loaded, or anything else accepted
+        by :func:`~eulxml.xmlmap.load_xmlobject_from_file` (e.g., a file
+        object)
+    :param xmlclass: subclass of :class:`~eulxml.xmlmap.XmlObject` to
+        load the file as; validation uses its ``XSD_SCHEMA``, and the file
+        is reported as invalid if that schema can't be loaded
+    :rtype: :class:`ValidationResult`
+    '''
+    start = time.time()
+    try:
+        obj = load_xmlobject_from_file(path, xmlclass)
+    except (etree.LxmlError, EnvironmentError) as err:
+        return ValidationResult(path, False, [str(err)],
+                                time.time() - start, 0.0)
+    loaded = time.time()
+    try:
+        if obj.XSD_SCHEMA is not None and obj.xmlschema is None:
+            # e.g., a schema url without a proxy configured; without this,
+            # nothing would be validated and the file reported as valid
+            errors = ['Schema %s could not be loaded' % obj.XSD_SCHEMA]
+        else:
+            errors = [str(entry) for entry in obj.validation_errors()]
+    except (etree.LxmlError, EnvironmentError) as err:
+        # the configured schema could not be loaded or parsed
+        errors = ['%s: %s' % (err.__class__.__name__, err)]
+    return ValidationResult(path, not errors, errors,
+                            loaded - start, time.time() - loaded)
+
+
+# the xmlclass used by the current worker process, set by _init_worker
+_worker_xmlclass = None
+
+def _init_worker(xmlclass):
+    global _worker_xmlclass
+    if isinstance(xmlclass, basestring):
+        xmlclass = _import_class(xmlclass)
+    _worker_xmlclass = xmlclass
+    # compile the schema once, when the worker starts; if it can't be
+    # loaded, validate_file tries again and reports the failure in the
+    # result for each file
+    try:
+        xmlclass.xmlschema
+    except Exception:
+        pass
+
+def _validate_worker_file(path):
+    return validate_file(path, _worker_xmlclass)
+
+
+def validate_files(paths, xmlclass=XmlObject, processes=None, chunksize=16):
+    '''Load and validate a batch of files in parallel, using a
+    :class:`multiprocessing.Pool` of worker processes.  Workers are
+    reused for the whole batch, so each one keeps its parsers and
+    compiled schema from file to file.
+
+    Results are generated as soon as they are available, which is not
+    necessarily the order of `paths`.
+
+    :param paths: iterable of file paths.  With ``processes=1`` anything
+        accepted by :func:`~eulxml.xmlmap.load_xmlobject_from_file` may be
+        used, including open file objects; otherwise items are sent to the
+        worker processes, so must be paths (or other picklable sources,
+        such as URLs).
+    :param xmlclass: subclass of :class:`~eulxml.xmlmap.XmlObject` to load
+        each file as, or its full dotted name (e.g.,
+        ``eulxml.xmlmap.mods.MetadataObjectDescriptionSchema``); the class
+        must be importable from its module, so that the worker processes
+        can use it
+    :param processes: number of worker processes; defaults to the number
+        of CPUs.  With 1, files are processed in the current process.
+    :param chunksize: number of files sent to a worker at a time
+    :returns: generator of one :class:`ValidationResult` per item in
+        `paths`, with that item as its ``path``
+    '''
+    if isinstance(xmlclass, basestring):
+        xmlclass = _import_class(xmlclass)
+    if processes == 1:
+        return (validate_file(path, xmlclass) for path in paths)
+    return _pooled_results(paths, xmlclass, processes, chunksize)
+
+def _pooled_results(paths, xmlclass, processes, chunksize):
+    pool = multiprocessing.Pool(processes, _init_worker, (xmlclass,))
+    try:
+        for result in pool.imap_unordered(_validate_worker_file, paths,
+                                          chunksize):
+            yield result
+        pool.close()
+    finally:
+        # also stops the workers if the caller stops early
+        pool.terminate()
+        pool.join()
+
+
+class TransformResult(namedtuple('TransformResult',
+        ['source', 'output', 'error', 'load_time', 'transform_time'])):
+    '''Result of transforming a single file or object with
+    :func:`xsl_transform_many`: the ``source`` file path or object; the
+    ``output``, either the path of the file the result was written to or
+    the serialized result itself; an ``error`` message if the source could
+    not be loaded or transformed (otherwise None); and the time in seconds
+    spent loading (``load_time``) and transforming and writing the result
+    (``transform_time``).'''
+    __slots__ = ()
+
+
+def _stylesheet_args(stylesheet):
+    # xsl_transform arguments for a registered stylesheet name or a file
+    if stylesheet in xslt_cache:
+        return {'stylesheet': stylesheet}
+    return {'filename': stylesheet}
+
+def _output_path(index, source, output_dir, extension):
+    if isinstance(source, basestring):
+        name = os.path.splitext(os.path.basename(source))[0]
+    else:
+        name = str(index)
+    return os.path.join(output_dir, name + extension)
+
+def _transform_item(task):
+    index, source, stylesheet, params, xmlclass, output_dir, extension = task
+    start = loaded = time.time()
+    try:
+        if isinstance(source, basestring):
+            loaded = None
+            obj = load_xmlobject_from_file(source, xmlclass)
+            loaded = time.time()
+        else:
+            obj = source
+        kwargs = _stylesheet_args(stylesheet)
+        kwargs.update(params)
+        result = obj.xsl_transform(raw=True, **kwargs)
+        output = str(result)
+        if output_dir is not None:
+            path = _output_path(index, source, output_dir, extension)
+            with open(path, 'wb') as outfile:
+                outfile.write(output)
+            output = path
+    except (etree.LxmlError, EnvironmentError) as err:
+        if loaded is None:
+            return TransformResult(source, None, str(err), time.time() - start, 0.0)
+        return TransformResult(source, None, str(err), loaded - start,
+                               time.time() - loaded)
+    return TransformResult(source, output, None, loaded - start,
+                           time.time() - loaded)
+
+
+def xsl_transform_many(sources, stylesheet, params=None, workers=None,
+                       processes=False, xmlclass=XmlObject, output_dir=None,
+                       extension='.html', callback=None, chunksize=1):
+    '''Transform a batch of files or :class:`~eulxml.xmlmap.XmlObject`
+    instances with an XSLT stylesheet in parallel, using
+    :meth:`~eulxml.xmlmap.XmlObject.xsl_transform` in a pool of worker
+    threads (lxml releases the GIL while transforming) or processes.  The
+    compiled stylesheet is cached in :data:`~eulxml.xmlmap.xslt_cache`
+    and shared by all the threads (or compiled once in each process).
+
+    Each result is serialized as specified by the stylesheet's
+    ``xsl:output`` (e.g., as HTML), and either written to a file in
+    `output_dir` (named for the source file, or for the position of the
+    source object, with the specified `extension`) or returned as a string
+    in the :class:`TransformResult`.  Results are generated in the same
+    order as `sources`.  Sources are passed to the workers as they are
+    read, rather than read into a list first, so a generator (e.g., of
+    paths read from a file) can be used for a large batch.
+
+    :param sources: iterable of file paths and/or
+        :class:`~eulxml.xmlmap.XmlObject` instances; process workers only
+        accept file paths, and a :class:`TypeError` is raised when the
+        result for any other source is reached
+    :param stylesheet: file name or URL of the stylesheet, or the name of a
+        stylesheet registered with :meth:`~eulxml.xmlmap.XsltCache.register`
+    :param params: dictionary of parameters for the transformation (see
+        :meth:`~eulxml.xmlmap.XmlObject.xsl_transform`)
+    :param workers: number of worker threads or processes; defaults to the
+        number of CPUs
+    :param processes: use worker processes instead of threads
+    :param xmlclass: subclass of :class:`~eulxml.xmlmap.XmlObject` to load
+        files as
+    :param output_dir: directory to write results to (optional)
+    :param extension: file extension for results written to `output_dir`
+    :param callback: function to call with each :class:`TransformResult`
+        (optional); if specified, all the sources are transformed before
+        returning, and the number of sources is returned
+    :param chunksize: number of sources sent to a worker at a time
+    :returns: generator of :class:`TransformResult`, or the number of
+        sources transformed if `callback` is specified
+    '''
+    params = params or {}
+    tasks = _transform_tasks(sources, processes, stylesheet, params, xmlclass,
+                             output_dir, extension)
+    pool_class = multiprocessing.Pool if processes else ThreadPool
+    results = _pooled_transforms(pool_class, workers, tasks, chunksize)
+    if callback is None:
+        return results
+    count = 0
+    for result in results:
+        callback(result)
+        count += 1
+    return count
+
+def _transform_tasks(sources, processes, *args):
+    for index, source in enumerate(sources):
+        if processes and not isinstance(source, basestring):
+            raise TypeError('only file paths can be transformed in worker processes')
+        yield (index, source) + args
+
+def _pooled_transforms(pool_class, workers, tasks, chunksize):
+    pool = pool_class(workers)
+    try:
+        for result in pool.imap(_transform_item, tasks, chunksize):
+            yield result
+        pool.close()
+    finally:
+        # also stops the workers if the caller stops early
+        pool.terminate()
+        pool.join()
+
+
+def main(argv=None):
+    '''Command-line entry point for ``eulxml-validate``.  Prints a line for
+    each file with its path, ``valid`` or ``invalid``, and load and
+    validation times, followed by any errors, indented; then a summary.
+    Exits with status 1 if any file is invalid.'''
+    parser = OptionParser(usage='%prog [options] [file ...]',
+        description='Load and validate XML files in parallel.  If no files ' +
+                    'are given (or "-"), paths are read from standard input, ' +
+                    'one per line.')
+    parser.add_option('-c', '--class', dest='xmlclass',
+        default='eulxml.xmlmap.XmlObject',
+        help='full dotted name of the XmlObject class to load files as ' +
+             '(default: %default)')
+    parser.add_option('-p', '--processes', type='int',
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_option('--chunksize', type='int', default=16,
+        help='number of files sent to a worker at a time (default: %default)')
+    parser.add_option('-q', '--quiet', action='store_true', default=False,
+        help='only report invalid files')
+    options, args = parser.parse_args(argv)
+
+    try:
+        xmlclass = _import_class(options.xmlclass)
+    except (ImportError, ValueError) as err:
+        parser.error(str(err))
+
+    if not args or args == ['-']:
+        paths = (line.rstrip('\r\n') for line in sys.stdin if line.strip())
+    else:
+        paths = args
+
+    total = invalid = 0
+    start = time.time()
+    for result in validate_files(paths, xmlclass, options.processes,
+                                 options.chunksize):
+        total += 1
+        if not result.valid:
+            invalid += 1
+        elif options.quiet:
+            continue
+        print '%s\t%s\t%.4f\t%.4f' % (result.path,
+            'valid' if result.valid else 'invalid',
+            result.load_time, result.validate_time)
+        for error in result.errors:
+            print '    %s' % error
+    sys.stderr.write('%d files, %d invalid, %.2fs\n' %
+                     (total, invalid, time.time() - start))
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
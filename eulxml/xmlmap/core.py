@@ -14,33 +14,47 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import collections
+from contextlib import contextmanager
 import cStringIO
+import hashlib
+import itertools
 import logging
 import os
+import tempfile
+import threading
+import time
 import urllib2
+import urlparse
 import warnings
 
 from lxml import etree
 from lxml.builder import ElementMaker
 
-from eulxml.xmlmap.fields import Field, NodeList
+from eulxml.xmlmap.fields import Field, NodeList, NodeMapper, \
+     SingleNodeManager, XPathContext, _evaluate_xpath, _is_child_name_step
+from eulxml.xpath import serialize
 
 logger = logging.getLogger(__name__)
 
 __all__ = [ 'XmlObject', 'parseUri', 'parseString', 'loadSchema',
-    'load_xmlobject_from_string', 'load_xmlobject_from_file' ]
-
-# NB: When parsing XML in this module, we explicitly create a new parser
-#   each time. Without this, lxml 2.2.7 uses a global default parser. When
-#   parsing strings, lxml appears to set that parser into no-network mode,
-#   causing subsequent network-based parses to fail. Specifically, under
-#   lxml 2.2.7, the second call here fails::
+    'SchemaRegistry', 'schema_registry', 'CachingResolver', 'default_resolver',
+    'load_xmlobject_from_string', 'load_xmlobject_from_file',
+    'iter_xmlobjects', 'validate_many', 'XsltCache', 'xslt_cache' ]
+
+# NB: When parsing XML in this module, we explicitly use our own parsers,
+#   never the lxml default. Without this, lxml 2.2.7 uses a global default
+#   parser. When parsing strings, lxml appears to set that parser into
+#   no-network mode, causing subsequent network-based parses to fail.
+#   Specifically, under lxml 2.2.7, the second call here fails::
 #
 #   >>> etree.fromstring('<foo/>') # set global parser to no-network
 #   >>> etree.parse('http://www.w3.org/2001/xml.xsd') # fails in no-network mode
 #
-#   If we simply construct a separate parser each time, parses will be
-#   marginally slower, but this lxml bug will not affect us.
+#   Our parsers used to be constructed fresh for each parse; they now come
+#   from a thread-local pool of preconfigured parsers (see _ParserPool),
+#   which avoids the cost of setting up a parser every time while still
+#   keeping clear of the global default parser.
 #
 #   This lxml behavior has been logged as a bug:
 #   https://bugs.launchpad.net/lxml/+bug/673205
@@ -48,12 +62,12 @@ __all__ = [ 'XmlObject', 'parseUri', 'parseString', 'loadSchema',
 def parseUri(stream, uri=None):
     """Read an XML document from a URI, and return a :mod:`lxml.etree`
     document."""
-    return etree.parse(stream, parser=_get_xmlparser(), base_url=uri)
+    return _parser_pool.parse(stream, base_url=uri)
 def parseString(string, uri=None):
     """Read an XML document provided as a byte string, and return a
     :mod:`lxml.etree` document. String cannot be a Unicode string.
     Base_uri should be provided for the calculation of relative URIs."""
-    return etree.fromstring(string, parser=_get_xmlparser(), base_url=uri)
+    return _parser_pool.fromstring(string, base_url=uri)
 def loadSchema(uri, base_uri=None, override_proxy_requirement=False):
     """Load an XSD XML document (specified by filename or URL), and return a
     :class:`lxml.etree.XMLSchema`.
@@ -62,6 +76,10 @@ def loadSchema(uri, base_uri=None, override_proxy_requirement=False):
     introduce significant network resource usage as well as instability if
     the schema becomes unavailable. Thus this function will fail if the
     ``HTTP_PROXY`` environment variable is not set.
+
+    The schema and any schemas it imports or includes are resolved with
+    :data:`default_resolver`, which caches remote documents and can be
+    configured to use a cache directory or XML catalogs.
     """
 
     # uri to use for reporting errors - include base uri if any
@@ -90,16 +108,522 @@ def loadSchema(uri, base_uri=None, override_proxy_requirement=False):
             return None
 
     try:
-        return etree.XMLSchema(etree.parse(uri, parser=_get_xmlparser(), base_url=base_uri))
+        # imports and includes are resolved with the parser, so compile
+        # the schema before returning it to the pool
+        with _parser_pool.parser() as parser:
+            return etree.XMLSchema(etree.parse(uri, parser=parser,
+                                               base_url=base_uri))
     except IOError as io_err:
         # add a little more detail to the error message - but should still be an IO error
         raise IOError('Failed to load schema %s : %s' % (error_uri, io_err))
     except etree.XMLSchemaParseError as parse_err:
         # re-raise as a schema parse error, but ensure includes details about schema being loaded
         raise etree.XMLSchemaParseError('Failed to parse schema %s -- %s' % (error_uri, parse_err))
+
 def _http_uri(uri):
     return uri.startswith('http:') or uri.startswith('https:')
 
+
+class SchemaRegistry(object):
+    '''Process-wide registry of XSD schemas, so that each schema is loaded
+    (from the network or disk) only once and the resulting
+    :class:`lxml.etree.XMLSchema` is shared by every :class:`XmlObject`
+    class and instance that uses it.  Safe to use from multiple threads;
+    concurrent requests for the same schema wait for a single load.
+
+    Failed loads are remembered: if :meth:`loadSchema` returns None (e.g.,
+    because no web proxy is configured) or raises an exception, later
+    requests for the same schema return None or re-raise the same exception
+    without trying again.  Set :attr:`retry_interval` to a number of seconds
+    to try loading failed schemas again after that interval, or use
+    :meth:`forget` to discard a failure (or a loaded schema) immediately.
+
+    The shared schema keeps the errors from the most recent validation in
+    its :attr:`~lxml.etree.XMLSchema.error_log`, so validating with it from
+    several threads at once mixes up their errors.  Use :meth:`validate`
+    instead, which validates with a separate copy of the schema for each
+    concurrent validation and returns the errors for that document alone.
+    '''
+
+    retry_interval = None
+    '''Number of seconds after a failed load before a schema will be loaded
+    again; None (the default) means failed loads are not retried.'''
+
+    def __init__(self, retry_interval=None):
+        if retry_interval is not None:
+            self.retry_interval = retry_interval
+        # loaded schemas and failures, keyed on uri and base uri; failures
+        # are stored as a tuple of time and exception (None if no schema)
+        self._schemas = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+        # one lock per schema being loaded, so different schemas can load
+        # concurrently but each one is only loaded once
+        self._load_locks = {}
+        # copies of loaded schemas not currently in use by validate
+        self._validators = collections.defaultdict(list)
+
+    def get(self, uri, base_uri=None):
+        '''Get the :class:`lxml.etree.XMLSchema` for a schema URI or file
+        path, loading it with :meth:`loadSchema` if it hasn't been loaded
+        yet.  Returns None if the schema could not be loaded.'''
+        key = (uri, base_uri)
+        try:
+            return self._schemas[key]
+        except KeyError:
+            pass
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # another thread may have loaded the schema in the meantime
+            if key in self._schemas:
+                return self._schemas[key]
+            failure = self._failures.get(key)
+            if failure is not None and not self._retry(failure[0]):
+                if failure[1] is not None:
+                    raise failure[1]
+                return None
+            try:
+                schema = loadSchema(uri, base_uri)
+            except (IOError, etree.XMLSchemaParseError) as err:
+                self._failures[key] = (time.time(), err)
+                raise
+            if schema is None:
+                self._failures[key] = (time.time(), None)
+            else:
+                self._failures.pop(key, None)
+                self._schemas[key] = schema
+            return schema
+
+    def validate(self, node, uri, base_uri=None):
+        '''Validate an :mod:`lxml.etree` node against a schema, loading the
+        schema if necessary, and return the validation errors, as an
+        :class:`lxml.etree._ListErrorLog` that is empty if the node is
+        valid; returns None if the schema could not be loaded.
+
+        Safe to use from multiple threads: each validation uses a copy of
+        the schema that no other thread is using, so validations can run
+        concurrently (lxml releases the GIL while validating) and the
+        errors returned belong to this node alone.  Copies are loaded with
+        :meth:`loadSchema` as needed, so failures are reported the same way
+        as for the shared schema, and are kept for reuse.'''
+        key = (uri, base_uri)
+        schema = self.get(uri, base_uri)
+        if schema is None:
+            return None
+        with self._lock:
+            validators = self._validators[key]
+            validator = validators.pop() if validators else None
+        if validator is None:
+            validator = loadSchema(uri, base_uri)
+            if validator is None:
+                return None
+        validator.validate(node)
+        errors = validator.error_log.copy()
+        with self._lock:
+            # don't keep copies of a schema that has been forgotten
+            if self._schemas.get(key) is schema:
+                self._validators[key].append(validator)
+        return errors
+
+    def _retry(self, failed_at):
+        return self.retry_interval is not None and \
+            time.time() - failed_at >= self.retry_interval
+
+    def forget(self, uri=None, base_uri=None):
+        '''Discard a loaded schema or a remembered failure, so that the
+        schema will be loaded again the next time it is requested.  If no
+        uri is specified, all schemas and failures are discarded.'''
+        with self._lock:
+            if uri is None:
+                self._schemas.clear()
+                self._failures.clear()
+                self._validators.clear()
+            else:
+                self._schemas.pop((uri, base_uri), None)
+                self._failures.pop((uri, base_uri), None)
+                self._validators.pop((uri, base_uri), None)
+
+schema_registry = SchemaRegistry()
+'''The shared :class:`SchemaRegistry` used to load the
+:attr:`XmlObject.XSD_SCHEMA` for :class:`XmlObject` classes.'''
+
+
+class XsltCache(object):
+    '''Cache of compiled XSLT stylesheets (:class:`lxml.etree.XSLT`), so
+    that a stylesheet used repeatedly, e.g. with
+    :meth:`XmlObject.xsl_transform`, is read, parsed, and compiled once.
+    Safe to use from multiple threads.
+
+    Stylesheets are cached by file name or URL, or by a hash of the
+    stylesheet content when passed as a string.  The most recently used
+    :attr:`size` stylesheets are kept.  Stylesheets loaded from local
+    files are compiled again if the file has been modified since it was
+    compiled.
+
+    Stylesheets can also be registered with a name, e.g. when an
+    application starts, with :meth:`register`; named stylesheets are
+    compiled immediately and are never discarded.
+
+    Options for the :class:`lxml.etree.XSLT` constructor (``extensions``,
+    ``regexp``, and ``access_control``) can be passed to :meth:`get` and
+    :meth:`register`; a stylesheet is compiled and cached separately for
+    each set of options, with extension functions and access control
+    objects compared by identity.
+    '''
+
+    size = 50
+    '''Maximum number of stylesheets to keep, not counting named
+    stylesheets.'''
+
+    def __init__(self, size=None):
+        if size is not None:
+            self.size = size
+        # compiled stylesheets, least recently used first, keyed on file
+        # name or content hash; stored as a tuple of file modification time
+        # (None if not a local file) and compiled stylesheet
+        self._transforms = collections.OrderedDict()
+        # named stylesheets: file name, modification time, XSLT options, and
+        # compiled stylesheet (file name is None for stylesheets given as a
+        # string)
+        self._named = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, filename=None, xsl=None, **options):
+        '''Compile a stylesheet, from a file name or URL or from a string,
+        and register it with the specified name, for use with :meth:`get`
+        and :meth:`XmlObject.xsl_transform`.  Registering a stylesheet with
+        a name that is already registered replaces it.  Any keyword
+        arguments are options for the :class:`lxml.etree.XSLT`
+        constructor.'''
+        if filename is None and xsl is None:
+            raise ValueError('a stylesheet filename or xsl string is required')
+        _xslt_options_key(options)
+        path, mtime = self._file_info(filename if xsl is None else None)
+        transform = _compile_xslt(filename, xsl, options)
+        with self._lock:
+            self._named[name] = (path, mtime, options, transform)
+
+    def get(self, filename=None, xsl=None, name=None, **options):
+        '''Get the compiled :class:`lxml.etree.XSLT` for a stylesheet, by
+        file name or URL, as a string, or by registered name, compiling the
+        stylesheet if it is not already cached.  Any keyword arguments are
+        options for the :class:`lxml.etree.XSLT` constructor; options for a
+        named stylesheet are specified when it is registered.
+
+        :raises: KeyError if `name` is not a registered stylesheet
+        :raises: TypeError for an unknown option
+        '''
+        options_key = _xslt_options_key(options)
+        if name is not None:
+            if options:
+                raise ValueError('options for a named stylesheet must be ' +
+                                 'specified when it is registered')
+            return self._get_named(name)
+        if xsl is not None:
+            data = xsl.encode('utf-8') if isinstance(xsl, unicode) else xsl
+            key, mtime = hashlib.sha1(data).digest(), None
+        elif filename is not None:
+            key, mtime = self._file_info(filename)
+        else:
+            raise ValueError('a stylesheet filename, xsl string, or name is required')
+        if options_key:
+            key = (key, options_key)
+
+        with self._lock:
+            cached = self._transforms.pop(key, None)
+            if cached is not None and cached[0] == mtime:
+                # keep track of use by moving it to the end
+                self._transforms[key] = cached
+                return cached[1]
+        transform = _compile_xslt(filename, xsl, options)
+        with self._lock:
+            self._transforms[key] = (mtime, transform)
+            while len(self._transforms) > self.size:
+                self._transforms.popitem(last=False)
+        return transform
+
+    def __contains__(self, name):
+        # check for a registered stylesheet name
+        return name in self._named
+
+    def _get_named(self, name):
+        path, mtime, options, transform = self._named[name]
+        if path is not None and mtime is not None:
+            if self._file_info(path)[1] != mtime:
+                self.register(name, filename=path, **options)
+                return self._named[name][3]
+        return transform
+
+    def _file_info(self, filename):
+        # cache key and modification time for a stylesheet file
+        if filename is None or _remote_uri(filename):
+            return filename, None
+        path = os.path.abspath(_local_path(filename))
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            # let the parser report the missing file
+            return path, None
+
+    def forget(self, name=None):
+        '''Discard the cached stylesheets (but not named stylesheets), or
+        the named stylesheet specified.'''
+        with self._lock:
+            if name is None:
+                self._transforms.clear()
+            else:
+                self._named.pop(name, None)
+
+# keyword arguments to XmlObject.xsl_transform that are options for the
+# lxml.etree.XSLT constructor, rather than parameters for the stylesheet
+_XSLT_OPTIONS = ('extensions', 'regexp', 'access_control')
+
+def _xslt_options_key(options):
+    # hashable cache key for a set of XSLT constructor options; values are
+    # compared by identity, except for the extensions dictionary
+    for option in options:
+        if option not in _XSLT_OPTIONS:
+            raise TypeError('unknown XSLT option %r' % option)
+    return tuple(sorted(
+        (option, tuple(sorted(value.items())) if isinstance(value, dict) else value)
+        for option, value in options.iteritems()))
+
+def _compile_xslt(filename=None, xsl=None, options=None):
+    # imports and includes are resolved with the parser, so compile the
+    # stylesheet before returning it to the pool
+    with _parser_pool.parser() as parser:
+        if xsl is not None:
+            xslt_doc = etree.fromstring(xsl, parser=parser)
+        else:
+            xslt_doc = etree.parse(filename, parser=parser)
+        return etree.XSLT(xslt_doc, **(options or {}))
+
+xslt_cache = XsltCache()
+'''The shared :class:`XsltCache` used by :meth:`XmlObject.xsl_transform`.'''
+
+# interned xpath contexts for XmlObject instances, keyed on XmlObject class,
+# node namespaces, and any context passed in; cleared whenever it reaches
+# the maximum size
+_xpath_contexts = {}
+_XPATH_CONTEXTS_SIZE = 1000
+
+def _get_xpath_context(xmlclass, nsmap, context=None):
+    '''Get the shared :class:`~eulxml.xmlmap.fields.XPathContext` for an
+    instance of xmlclass wrapping a node with the specified namespaces and
+    an optional dictionary of additional context (namespaces, variables).'''
+    key = (xmlclass, frozenset(nsmap.iteritems()))
+    if context is not None:
+        try:
+            key += (frozenset((name, frozenset(val.iteritems())
+                               if isinstance(val, dict) else val)
+                              for name, val in context.iteritems()), )
+            hash(key)
+        except TypeError:
+            # context includes something unhashable; don't share it
+            key = None
+
+    xpath_context = None
+    if key is not None:
+        xpath_context = _xpath_contexts.get(key, None)
+    if xpath_context is None:
+        # xpath has no notion of a default namespace - omit any namespace with no prefix
+        opts = {'namespaces': dict([(prefix, ns) for prefix, ns in nsmap.iteritems() if prefix ]) }
+        if context is not None:
+            opts.update(context)
+        # also include any root namespaces to guarantee that expected prefixes are available
+        namespaces = dict(opts['namespaces'])
+        namespaces.update(getattr(xmlclass, 'ROOT_NAMESPACES', None) or {})
+        opts['namespaces'] = namespaces
+        xpath_context = XPathContext(opts)
+
+        if key is not None:
+            if len(_xpath_contexts) >= _XPATH_CONTEXTS_SIZE:
+                _xpath_contexts.clear()
+            _xpath_contexts[key] = xpath_context
+    return xpath_context
+
+
+class _FieldBatch(object):
+    '''Plan for evaluating a set of single-node fields together (see
+    :meth:`XmlObject.values`).  Fields that select child elements by name
+    are answered from a single pass over the children of the current node,
+    and each location step shared by more than one field is only evaluated
+    once; the remaining steps are evaluated relative to the node it
+    matches.'''
+
+    def __init__(self, fields, level=0):
+        # list of (index, field) for all fields evaluated by this batch
+        self.fields = fields
+        self.level = level
+        # fields evaluated on their own, relative to the current node
+        self.ungrouped = []
+        # fields whose last step selects child elements by name, as
+        # (index, field, prefix, name)
+        self.children = []
+        # fields that share a location step, as (step, step xpath, _FieldBatch)
+        self.groups = []
+
+        by_step = {}
+        for index, field in fields:
+            step = field._path_steps[level]
+            if len(field._path_steps) > level + 1:
+                by_step.setdefault(serialize(step), []).append((index, field))
+            elif _is_child_name_step(step):
+                self.children.append((index, field, step.node_test.prefix,
+                                      step.node_test.name))
+            else:
+                self.ungrouped.append((index, field))
+        for xpath, members in by_step.iteritems():
+            if len(members) > 1:
+                step = members[0][1]._path_steps[level]
+                self.groups.append((step, xpath, _FieldBatch(members, level + 1)))
+            else:
+                self.ungrouped.extend(members)
+        if len(self.children) == 1 and not any(_is_child_name_step(step)
+                                              for step, x, b in self.groups):
+            # nothing to be gained from looking at all the children
+            self.ungrouped.append(self.children[0][:2])
+            self.children = []
+
+    def evaluate(self, obj, node, values):
+        '''Store the value of each field in the batch in values, by index.'''
+        context = obj.context
+        wrappers = _get_identity_map(obj)
+        for index, field in self.ungrouped:
+            if self.level:
+                values[index] = field._get_for_step_node(node, context,
+                                                         self.level, wrappers)
+            else:
+                values[index] = field.get_for_node(node, context, wrappers)
+
+        children = None
+        if self.children or self.groups:
+            namespaces = context.get('namespaces', None) or {}
+            tags = {}
+            for index, field, prefix, name in self.children:
+                tags[index] = _clark_name(prefix, name, namespaces)
+            for step, xpath, batch in self.groups:
+                if _is_child_name_step(step):
+                    tags[xpath] = _clark_name(step.node_test.prefix,
+                                              step.node_test.name, namespaces)
+            if tags:
+                children = dict((tag, []) for tag in tags.itervalues()
+                                if tag is not None)
+                for child in node:
+                    if child.tag in children:
+                        children[child.tag].append(child)
+
+        for index, field, prefix, name in self.children:
+            matches = children.get(tags[index], None)
+            if matches is None:
+                # unknown namespace prefix; let the xpath engine report it
+                values[index] = field._get_for_step_node(node, context,
+                                                         self.level, wrappers)
+            else:
+                values[index] = field._get_mapper(wrappers).to_python(
+                    matches[0] if matches else None)
+
+        for step, xpath, batch in self.groups:
+            if children is not None and xpath in tags and \
+                    tags[xpath] in children:
+                matches = children[tags[xpath]]
+            else:
+                matches = _evaluate_xpath(xpath, node, context)
+            if len(matches) == 1 and isinstance(matches[0], etree._Element):
+                batch.evaluate(obj, matches[0], values)
+            elif not matches:
+                # none of the fields can match anything
+                for index, field in batch.fields:
+                    values[index] = field.mapper.to_python(None)
+            else:
+                # ambiguous; evaluate each field on its own
+                for index, field in batch.fields:
+                    values[index] = field.get_for_node(obj.node, context, wrappers)
+
+
+def _clark_name(prefix, name, namespaces):
+    # element name in Clark notation for an xpath name test; None if the
+    # prefix is not defined
+    if prefix is None:
+        return name
+    if prefix in namespaces:
+        return '{%s}%s' % (namespaces[prefix], name)
+
+
+# batched evaluation plans for XmlObject.values, keyed on XmlObject class
+# and field names; cleared whenever it reaches the maximum size
+_field_batches = {}
+_FIELD_BATCHES_SIZE = 1000
+
+def _get_field_batch(xmlclass, names):
+    '''Get a :class:`_FieldBatch` for the named fields of xmlclass that can
+    be evaluated together (single-node fields with a relative location path),
+    and a list of (index, name) for everything else.'''
+    key = (xmlclass, names)
+    batch = _field_batches.get(key, None)
+    if batch is None:
+        fields = []
+        other = []
+        for index, name in enumerate(names):
+            field = xmlclass._fields.get(name, None)
+            if field is not None and field._path_steps is not None and \
+                    isinstance(field.manager, SingleNodeManager) and \
+                    not field.manager.instantiate_on_get:
+                fields.append((index, field))
+            else:
+                other.append((index, name))
+        batch = (_FieldBatch(fields), other)
+
+        if len(_field_batches) >= _FIELD_BATCHES_SIZE:
+            _field_batches.clear()
+        _field_batches[key] = batch
+    return batch
+
+
+class _IdentityMap(object):
+    '''Identity map of the :class:`XmlObject` instances wrapping the elements
+    of a document, keyed on element and class, so that navigating to the
+    same element with the same class returns the same object; see
+    :attr:`XmlObject.IDENTITY_MAP`.
+
+    The map is only referenced by the objects that use it (not globally),
+    and is freed along with them once none of them are in use.'''
+
+    def __init__(self):
+        self._wrappers = {}
+
+    def get(self, node, node_class):
+        '''Get the object of the specified class wrapping a node, creating
+        and storing it if there is none.'''
+        if not isinstance(node, etree._Element):
+            # strings and other xpath results are compared by value, so
+            # can't be used to identify a node
+            return node_class(node)
+        key = (node, node_class)
+        obj = self._wrappers.get(key)
+        if obj is None:
+            obj = node_class(node)
+            obj._identity_map = self
+            self._wrappers[key] = obj
+        return obj
+
+    def __len__(self):
+        return len(self._wrappers)
+
+
+def _get_identity_map(obj):
+    # identity map for objects navigated to from obj; shared by every object
+    # retrieved through it, and created on first use if obj has IDENTITY_MAP
+    state = obj._state
+    if state is not None and 'identity_map' in state:
+        return state['identity_map']
+    if obj.IDENTITY_MAP:
+        obj._identity_map = _IdentityMap()
+        return obj._identity_map
+    return None
+
+
 class _FieldDescriptor(object):
     def __init__(self, field):
         self.field = field
@@ -107,12 +631,29 @@ class _FieldDescriptor(object):
     def __get__(self, obj, objtype):
         if obj is None:
             return self
-        return self.field.get_for_node(obj.node, obj.context)
+        if obj.SNAPSHOT_LISTS and obj._cache is not None \
+                and self.field in obj._cache:
+            return obj._cache[self.field]
+
+        value = self.field.get_for_node(obj.node, obj.context,
+                                        _get_identity_map(obj))
+        if isinstance(value, NodeList):
+            value.owner = obj
+            if obj.SNAPSHOT_LISTS:
+                # keep the list, so the snapshot can be re-used until the
+                # xml is changed
+                value.snapshot = True
+                if obj._cache is None:
+                    obj._cache = {}
+                obj._cache[self.field] = value
+        return value
 
     def __set__(self, obj, value):        
+        obj._changed()
         return self.field.set_for_node(obj.node, obj.context, value)
 
     def __delete__(self, obj):
+        obj._changed()
         return self.field.delete_for_node(obj.node, obj.context)
 
 
@@ -134,6 +675,12 @@ class XmlObjectType(type):
          :class:`eulxml.xmlmap.NodeField` objects then patch them up
          to refer to the newly-created :class:`XmlObject`.
 
+    It also gives each class an empty ``__slots__`` (unless the class
+    defines its own, or sets :attr:`~XmlObject.DYNAMIC_ATTRIBUTES`), so
+    that instances only have the slots defined by :class:`XmlObject`, and
+    converts options that can be overridden on an instance (such as
+    :attr:`~XmlObject.SNAPSHOT_LISTS`) into descriptors.
+
     """
 
     def __new__(cls, name, bases, defined_attrs):
@@ -186,9 +733,15 @@ class XmlObjectType(type):
                     create_method = cls._make_create_field(create_method_name, attr_val)
                     use_attrs[create_method_name] = create_method
 
+            elif attr_name in _INSTANCE_OPTIONS:
+                use_attrs[attr_name] = _InstanceOption(attr_name, attr_val)
+
             else:
                 use_attrs[attr_name] = attr_val
         use_attrs['_fields'] = fields
+        if '__slots__' not in defined_attrs and \
+                not defined_attrs.get('DYNAMIC_ATTRIBUTES', False):
+            use_attrs['__slots__'] = ()
 
         super_new = super(XmlObjectType, cls).__new__
         new_class = super_new(cls, name, bases, use_attrs)
@@ -204,11 +757,92 @@ class XmlObjectType(type):
     @staticmethod
     def _make_create_field(field_name, field):
         def create_field(xmlobject):
+            xmlobject._changed()
             field.create_for_node(xmlobject.node, xmlobject.context)
         create_field.__name__ = field_name
         return create_field
 
 
+# a new number is taken from _change_counter for every change made to the
+# xml through any XmlObject (or NodeList), and kept as the latest change, so
+# that cached text can be checked for changes made through other objects
+# (e.g., through a field of a child object)
+_change_counter = itertools.count(1)
+_latest_change = [0]
+
+# class-level options that can also be set on individual instances
+_INSTANCE_OPTIONS = ('xmlschema', 'SNAPSHOT_LISTS', 'CACHE_HASH',
+                     'IDENTITY_MAP', 'CACHE_TEXT')
+
+
+class _InstanceOption(object):
+    '''Descriptor for an :class:`XmlObject` option defined on a class that
+    can also be set on an instance (which has no ``__dict__`` to hold it);
+    values set on an instance are kept with its other optional data.'''
+
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+        # the default may itself be a descriptor (see _SchemaDescriptor)
+        self._get_default = getattr(default, '__get__', None)
+
+    def __get__(self, obj, objtype=None):
+        if obj is not None:
+            state = obj._state
+            if state is not None and self.name in state:
+                return state[self.name]
+        if self._get_default is not None:
+            return self._get_default(obj, objtype)
+        return self.default
+
+    def __set__(self, obj, value):
+        if obj._state is None:
+            obj._state = {}
+        obj._state[self.name] = value
+
+    def __delete__(self, obj):
+        if obj._state is not None:
+            obj._state.pop(self.name, None)
+
+
+def _state_attribute(key, default=None):
+    # property for optional per-instance data (e.g., cached values), kept
+    # in a dictionary in the _state slot that is only created when needed
+    def get(self):
+        if self._state is None:
+            return default
+        return self._state.get(key, default)
+
+    def set(self, value):
+        if self._state is None:
+            self._state = {}
+        self._state[key] = value
+    return property(get, set)
+
+
+class _SchemaDescriptor(object):
+    '''Class-level descriptor for :attr:`XmlObject.xmlschema`: the schema
+    configured in ``XSD_SCHEMA`` is only loaded, through
+    :data:`schema_registry`, the first time it is needed (e.g., for
+    validation), instead of when the class is defined or instantiated.
+    A schema assigned on a subclass or an instance takes precedence.'''
+
+    def __get__(self, obj, objtype=None):
+        xsd_schema = (obj if obj is not None else objtype).XSD_SCHEMA
+        if xsd_schema is None:
+            return None
+        return schema_registry.get(xsd_schema)
+
+
+# used when validating with a schema not loaded through schema_registry,
+# since its error log can only hold the errors for one document at a time
+_validation_lock = threading.Lock()
+
+# compiled once, rather than for every call to node.xpath(); used for the
+# text content of an xmlobject
+_NORMALIZED_TEXT = etree.XPath('normalize-space(.)')
+
+
 class XmlObject(object):
 
     """
@@ -224,20 +858,35 @@ class XmlObject(object):
     constructor arguments.
 
     Programs can also pass an optional dictionary to the constructor to
-    specify namespaces for XPath evaluation.
+    specify namespaces for XPath evaluation.  The resulting :attr:`context`
+    is an immutable :class:`~eulxml.xmlmap.fields.XPathContext`, shared by
+    all instances of the same class wrapping nodes with the same namespaces.
 
     If keyword arguments are passed in to the constructor, they will be used to
     set initial values for the corresponding fields on the :class:`XmlObject`.
     (Only currently supported for non-list fields.)
 
     Custom equality/non-equality tests: two instances of :class:`XmlObject` are
-    considered equal if they point to the same lxml element node.
+    considered equal if they point to the same lxml element node, or to
+    structurally identical element nodes: with the same names (by namespace
+    URI, regardless of prefix), attributes (in any order), text, and children,
+    including comments and processing instructions.  The text following each
+    of the two nodes themselves (their ``tail``) is not compared.  Instances
+    are hashed by identity, unless :attr:`CACHE_HASH` is set; see
+    :meth:`structural_hash` for a hash of the XML itself.
     """
 
     __metaclass__ = XmlObjectType
 
-    node = None
-    """The top-level xml node wrapped by the object"""
+    # instances only have the wrapped node, their (shared) xpath context,
+    # and a dictionary of optional data that is created when needed
+    __slots__ = ('node', 'context', '_state', '__weakref__')
+
+    DYNAMIC_ATTRIBUTES = False
+    """Instances of :class:`XmlObject` use ``__slots__`` to save memory, so
+    only fields and the attributes documented here can be set on them.  Set
+    to True on a subclass to give its instances a ``__dict__``, so that
+    other attributes can be set."""
 
     ROOT_NAME = None
     """A default root element name (without namespace prefix) used when an object
@@ -258,11 +907,14 @@ class XmlObject(object):
     :meth:`load_xmlobject_from_string` and :meth:`load_xmlobject_from_file`,
     and with :meth:`is_valid`.
     """
-    xmlschema = None 
+    xmlschema = _SchemaDescriptor()
     """A parsed XSD schema instance of :class:`lxml.etree.XMLSchema`; will be
-    loaded at class initialization time if XSD_SCHEMA is set and xmlchema is None.
+    loaded the first time it is used (e.g., for validation) if XSD_SCHEMA is set,
+    so that defining, importing, or instantiating a class never loads a schema.
+    Schemas are loaded through :data:`schema_registry`, so each schema is
+    loaded once per process and shared by all classes and instances that use it.
     If you wish to load and parse the schema at class definition time, instead
-    of at class instance initialization time, you may want to define your schema
+    of when it is first used, you may want to define your schema
     in your subclass like this::
 
         XSD_SCHEMA = "http://www.openarchives.org/OAI/2.0/oai_dc.xsd"
@@ -270,12 +922,66 @@ class XmlObject(object):
     """
     # NOTE: DTD and RNG validation could be handled similarly to XSD validation logic
 
+    SNAPSHOT_LISTS = False
+    """Set to True (on a subclass or an instance) to enable *snapshot* mode
+    for list fields: the :class:`~eulxml.xmlmap.fields.NodeList` for each list
+    field is kept and its matches and converted values are cached, instead of
+    re-evaluating the xpath for every list operation.  Snapshots are discarded
+    whenever the XML is modified through this object or one of its lists;
+    changes made any other way will not be seen until
+    :meth:`~eulxml.xmlmap.fields.NodeList.refresh` is called."""
+
+    # number of changes made to the xml through this object; used to
+    # invalidate cached data
+    _generation = _state_attribute('generation', 0)
+
+    CACHE_HASH = False
+    """Set to True (on a subclass or an instance) to hash instances by
+    :meth:`structural_hash` instead of by identity, and to cache the
+    structural hash instead of computing it every time it is needed.  The
+    cached hash is discarded whenever the XML is modified through this
+    object; changes made any other way (including through an object
+    returned by one of its fields) will not be seen, so this should only
+    be used for objects that are not modified by other means."""
+
+    IDENTITY_MAP = False
+    """Set to True (on a subclass or an instance) to keep an identity map of
+    the objects returned by :class:`~eulxml.xmlmap.NodeField` and
+    :class:`~eulxml.xmlmap.NodeListField` on this object and on any object
+    reached through them, so that navigating to the same element as the
+    same class (e.g., ``ead.archdesc.did.unittitle`` in a template) returns
+    the existing object instead of creating a new one.  The objects are
+    kept until this object and every object reached through it are no
+    longer in use, so this is best suited to documents that are read and
+    then discarded, such as when rendering a template."""
+
+    CACHE_TEXT = False
+    """Set to True (on a subclass or an instance) to cache the normalized
+    text content returned by :meth:`__unicode__`, for objects that are
+    converted to text many times (e.g., when rendering a template).  The
+    cached text is discarded whenever XML is modified through a field or
+    list of any :class:`XmlObject` (including the fields of objects
+    returned by this one's fields), but changes made any other way (e.g.,
+    directly with lxml) will not be seen."""
+
+    # errors from the most recent schema validation of this object
+    _schema_errors = _state_attribute('schema_errors')
+    # cached structural hash, and the generation it was computed for
+    _hash = _state_attribute('hash')
+    # cached normalized text, and the latest change it was computed after
+    _text = _state_attribute('text')
+    # identity map shared with the objects navigated to from this one
+    _identity_map = _state_attribute('identity_map')
+    # cached data for this object (e.g., snapshot lists), keyed on field
+    _cache = _state_attribute('cache')
+
     def __init__(self, node=None, context=None, **kwargs):
         if node is None:
             node = self._build_root_element()
 
+        self._state = None
         self.node = node
-        # FIXME: context probably needs work
+        """The top-level xml node wrapped by the object"""
         # get namespaces from current node OR its parent (in case of an lxml 'smart' string)
         if hasattr(node, 'nsmap'):
             nsmap = node.nsmap
@@ -284,23 +990,76 @@ class XmlObject(object):
         else:
             nsmap = {}
 
-        # xpath has no notion of a default namespace - omit any namespace with no prefix
-        self.context = {'namespaces': dict([(prefix, ns) for prefix, ns in nsmap.iteritems() if prefix ]) }
-
-        if context is not None:
-            self.context.update(context)
-        if hasattr(self, 'ROOT_NAMESPACES'):
-            # also include any root namespaces to guarantee that expected prefixes are available
-            self.context['namespaces'].update(self.ROOT_NAMESPACES)
-
-        if self.XSD_SCHEMA is not None and self.xmlschema is None:
-            # load xml schema if one is defined and has not already been loaded
-            self.xmlschema = loadSchema(self.XSD_SCHEMA)
+        # contexts are immutable and shared by all instances of the same
+        # class wrapping nodes with the same namespaces
+        self.context = _get_xpath_context(self.__class__, nsmap, context)
 
         for field, value in kwargs.iteritems():
             # TODO (maybe): handle setting/creating list fields
             setattr(self, field, value)
 
+    def _changed(self):
+        # record that the xml was modified through this object, so any data
+        # cached for an older generation is out of date
+        self._generation += 1
+        _latest_change[0] = next(_change_counter)
+
+    def values(self, *names):
+        """Get the values of several fields at once, as a list in the order
+        requested; equivalent to ``[getattr(obj, name) for name in names]``.
+
+        Fields with single-node values are evaluated together in one pass:
+        where their xpaths begin with the same location steps (e.g.,
+        ``e:did/e:unitid`` and ``e:did/e:unittitle``), those steps are only
+        evaluated once.  List fields and any other attributes are retrieved
+        individually.
+        """
+        names = tuple(names)
+        batch, other = _get_field_batch(self.__class__, names)
+        values = [None] * len(names)
+        batch.evaluate(self, self.node, values)
+        for index, name in other:
+            values[index] = getattr(self, name)
+        return values
+
+    def to_dict(self, depth=None, fields=None, exclude=None):
+        """Get the values of the fields on this object as a dictionary
+        keyed on field name, using :meth:`values`.  List fields are returned
+        as lists.  :class:`~eulxml.xmlmap.NodeField` and
+        :class:`~eulxml.xmlmap.NodeListField` values are converted to
+        dictionaries (or lists of dictionaries) recursively.
+
+        :param depth: optional limit on how many levels of node fields are
+            included; node fields below that level are omitted, e.g.
+            ``depth=0`` returns only the fields on this object that are not
+            node fields
+        :param fields: optional list of fields - if specified, only the named
+            fields will be included
+        :param exclude: optional list of fields to exclude
+        """
+        names = [name for name in self._fields
+                 if (not fields or name in fields) and
+                    not (exclude and name in exclude)]
+        if depth is not None:
+            subdepth = depth - 1
+            if depth <= 0:
+                names = [name for name in names if not
+                         isinstance(self._fields[name].mapper, NodeMapper)]
+        else:
+            subdepth = None
+
+        data = {}
+        for name, value in zip(names, self.values(*names)):
+            if isinstance(value, NodeList):
+                value = list(value)
+            if isinstance(self._fields[name].mapper, NodeMapper):
+                if isinstance(value, list):
+                    value = [item.to_dict(subdepth) for item in value]
+                elif value is not None:
+                    value = value.to_dict(subdepth)
+            data[name] = value
+        return data
+
     def _build_root_element(self):
         opts = {}
         if hasattr(self, 'ROOT_NS'):
@@ -313,35 +1072,58 @@ class XmlObject(object):
         return root
         
 
-    def xsl_transform(self, filename=None, xsl=None, return_type=None, **params):
+    def xsl_transform(self, filename=None, xsl=None, return_type=None,
+                      stylesheet=None, raw=False, **params):
         """Run an xslt transform on the contents of the XmlObject.
 
-        XSLT can be passed as filename or string. If a params dictionary is
-        specified, its items will be passed as parameters to the XSL
-        transformation.
-
-        :param filename: xslt filename (optional, one of file and xsl is required)
+        XSLT can be passed as filename or string, or as the name of a
+        stylesheet registered with :meth:`XsltCache.register`.  Compiled
+        stylesheets are cached in :data:`xslt_cache`, so using the same
+        stylesheet again does not read, parse, or compile it again.  The
+        keyword arguments ``extensions``, ``regexp``, and ``access_control``
+        are passed to the :class:`lxml.etree.XSLT` constructor (see
+        :class:`XsltCache`).  Any other keyword arguments will be passed as
+        parameters to the XSL transformation; string values are XPath
+        expressions, so literal strings must be quoted (see
+        :meth:`lxml.etree.XSLT.strparam`).
+
+        :param filename: xslt filename (optional, one of file, xsl, and
+            stylesheet is required)
         :param xsl: xslt as string (optional)
+        :param stylesheet: name of a registered stylesheet (optional)
         :param return_type: type of object to return; optional, defaults to
             :class:`XmlObject`
-        :returns: an instance of :class:`XmlObject` or the return_type specified
+        :param raw: return the XSLT result tree itself, without wrapping it
+            in an object; ``str()`` of the result serializes it as
+            specified by the stylesheet's ``xsl:output`` (e.g., as HTML)
+        :returns: an instance of :class:`XmlObject` or the return_type
+            specified, or an :class:`lxml.etree._XSLTResultTree`
         """
-        parser = _get_xmlparser()
-        if filename is not None:
-            xslt_doc = etree.parse(filename, parser=parser)
-        if xsl is not None:
-            xslt_doc = etree.fromstring(xsl, parser=parser)
-        transform = etree.XSLT(xslt_doc, **params)
+        options = dict((option, params.pop(option))
+                       for option in _XSLT_OPTIONS if option in params)
+        transform = xslt_cache.get(filename=filename, xsl=xsl, name=stylesheet,
+                                   **options)
+        result = transform(self.node, **params)
+        if raw:
+            return result
         # NOTE: converting _XSLTResultTree to XmlObject because of a bug in its unicode method
         # - to output xml result, use serialize instead of unicode
         if return_type is None:
             return_type = XmlObject
-        return return_type(transform(self.node))
+        return return_type(result)
 
     def __unicode__(self):
         if isinstance(self.node, basestring):
             return self.node
-        return self.node.xpath("normalize-space(.)")
+        cache = self.CACHE_TEXT
+        if cache:
+            cached = self._text
+            if cached is not None and cached[0] == _latest_change[0]:
+                return cached[1]
+        text = _NORMALIZED_TEXT(self.node)
+        if cache:
+            self._text = (_latest_change[0], text)
+        return text
 
     def __string__(self):
         if isinstance(self.node, basestring):
@@ -352,6 +1134,11 @@ class XmlObject(object):
         # consider two xmlobjects equal if they are pointing to the same xml node
         if hasattr(other, 'node') and self.node == other.node:
             return True
+        # consider two xmlobjects equal if their xml is structurally the same,
+        # comparing the trees only as far as the first difference
+        if isinstance(other, XmlObject) and _is_element(self.node) \
+                and _is_element(other.node):
+            return _nodes_equal(self.node, other.node)
         # consider two xmlobjects equal if they serialize the same
         if hasattr(other, 'serialize') and self.serialize() == other.serialize():
             return True
@@ -361,47 +1148,79 @@ class XmlObject(object):
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def serialize(self, stream=None, pretty=False):
+    def __hash__(self):
+        if self.CACHE_HASH:
+            return self.structural_hash()
+        return object.__hash__(self)
+
+    def structural_hash(self):
+        """Hash of the XML for this object, consistent with equality: the
+        same for any two instances that are considered equal, and changed
+        when the XML is.  The whole tree is read to compute it, unless it
+        is cached with :attr:`CACHE_HASH`."""
+        if not _is_element(self.node):
+            return hash(self.serialize())
+        if not self.CACHE_HASH:
+            return _node_hash(self.node)
+        if self._hash is None or self._hash[0] != self._generation:
+            self._hash = (self._generation, _node_hash(self.node))
+        return self._hash[1]
+
+    def serialize(self, stream=None, pretty=False, compression=0):
         """Serialize the contents of the XmlObject to a stream.  Serializes
         current node only; for the entire XML document, use :meth:`serializeDocument`.
 
-        If no stream is specified, returns a string.
+        If no stream is specified, returns a string.  XML is written to the
+        stream in chunks as it is serialized, so large documents are never
+        held in memory as a single string.
         :param stream: stream or other file-like object to write content to (optional)
         :param pretty: pretty-print the XML output; boolean, defaults to False
-        :rtype: stream passed in or an instance of :class:`cStringIO.StringIO`
+        :param compression: gzip compression level (1-9) for the output;
+            defaults to 0, no compression
+        :rtype: stream passed in or a string
         """
-        return self._serialize(self.node, stream=stream, pretty=pretty)
+        return self._serialize(self.node, stream=stream, pretty=pretty,
+                               compression=compression)
 
-    def serializeDocument(self, stream=None, pretty=False):
+    def serializeDocument(self, stream=None, pretty=False, compression=0):
         """Serialize the contents of the entire XML document (including Doctype
         declaration, if there is one), with an XML declaration, for the current
         XmlObject to a stream.
 
-        If no stream is specified, returns a string.
+        If no stream is specified, returns a string.  XML is written to the
+        stream in chunks as it is serialized, as with :meth:`serialize`.
         :param stream: stream or other file-like object to write content to (optional)
         :param pretty: pretty-print the XML output; boolean, defaults to False
-        :rtype: stream passed in or an instance of :class:`cStringIO.StringIO`
+        :param compression: gzip compression level (1-9) for the output;
+            defaults to 0, no compression
+        :rtype: stream passed in or a string
         """
         return self._serialize(self.node.getroottree(), stream=stream, pretty=pretty,
-                                xml_declaration=True)
+                                xml_declaration=True, compression=compression)
 
-    def _serialize(self, node, stream=None, pretty=False, xml_declaration=False):
+    def _serialize(self, node, stream=None, pretty=False, xml_declaration=False,
+                   compression=0):
         # actual logic of xml serialization
+        # NOTE: etree c14n doesn't seem to like fedora info: URIs
         if stream is None:
-            string_mode = True
+            if not compression:
+                # return the serialized string itself, without copying it
+                # through a buffer
+                return etree.tostring(node, encoding='UTF-8', pretty_print=pretty,
+                                      xml_declaration=xml_declaration)
             stream = cStringIO.StringIO()
+            self._serialize(node, stream, pretty, xml_declaration, compression)
+            return stream.getvalue()
+
+        # write to the stream while serializing, instead of serializing the
+        # whole document to a string first
+        if isinstance(node, etree._ElementTree):
+            node.write(stream, encoding='UTF-8', pretty_print=pretty,
+                       xml_declaration=xml_declaration, compression=compression)
         else:
-            string_mode = False
-
-        # NOTE: etree c14n doesn't seem to like fedora info: URIs
-        stream.write(etree.tostring(node, encoding='UTF-8', pretty_print=pretty,
-                                    xml_declaration=xml_declaration))
-
-        if string_mode:
-            data = stream.getvalue()
-            stream.close()
-            return data
-
+            with etree.xmlfile(stream, encoding='UTF-8',
+                               compression=compression) as xmlfile:
+                xmlfile.write(node, pretty_print=pretty)
         return stream
 
     def is_valid(self):
@@ -418,7 +1237,8 @@ class XmlObject(object):
         """Return a list of validation errors.  Returns an empty list if the xml
         is schema valid or no schema is defined.
         
-        Currently only supports schema validation.
+        Currently only supports schema validation.  Safe to use from multiple
+        threads; see :meth:`schema_valid`.
 
         :rtype: list
         """
@@ -431,24 +1251,42 @@ class XmlObject(object):
         """Determine if the current document is schema-valid according to the
         configured XSD Schema associated with this instance of :class:`XmlObject`.
 
+        Validation errors are kept with this object (see
+        :meth:`schema_validation_errors`) rather than read from the shared
+        schema, so documents can be validated concurrently from multiple
+        threads: a schema configured with :attr:`XSD_SCHEMA` is validated
+        with :meth:`SchemaRegistry.validate`; any other schema assigned to
+        :attr:`xmlschema` is used by one thread at a time.
+
         :rtype: boolean
         :raises: Exception if no XSD schema is defined for this XmlObject instance
         """
-        if self.xmlschema is not None:
-            return self.xmlschema.validate(self.node)
-        else:
+        schema = self.xmlschema
+        if schema is None:
             raise Exception('No XSD schema is defined, cannot validate document')
+        if self.XSD_SCHEMA is not None and \
+                schema is schema_registry.get(self.XSD_SCHEMA):
+            errors = schema_registry.validate(self.node, self.XSD_SCHEMA)
+        else:
+            with _validation_lock:
+                schema.validate(self.node)
+                errors = schema.error_log.copy()
+        self._schema_errors = errors
+        return len(errors) == 0
 
     def schema_validation_errors(self):
         """
         Retrieve any validation errors that occured during schema validation
-        done via :meth:`is_valid`.
+        done via :meth:`is_valid` or :meth:`schema_valid` (validating the
+        document first, if it has not been validated yet).
         
         :returns: a list of :class:`lxml.etree._LogEntry` instances
         :raises: Exception if no XSD schema is defined for this XmlObject instance
         """
         if self.xmlschema is not None:
-            return self.xmlschema.error_log
+            if self._schema_errors is None:
+                self.schema_valid()
+            return self._schema_errors
         else:
             raise Exception('No XSD schema is defined, cannot return validation errors')
 
@@ -460,27 +1298,267 @@ class XmlObject(object):
         return len(self.node) == 0 and len(self.node.attrib) == 0 \
             and not self.node.text and not self.node.tail # regular text or text after a node
 
+def _is_element(node):
+    # elements (including comments and processing instructions), as
+    # opposed to the strings xpaths can return
+    return isinstance(node, etree._Element)
+
+def _nodes_equal(a, b):
+    '''Compare two lxml elements and their descendants structurally, in
+    document order, stopping at the first difference.  Names are compared
+    by namespace URI, attributes in any order, and the tails of the two
+    elements themselves are ignored.'''
+    if not _node_items_equal(a, b):
+        return False
+    for x, y in itertools.izip(a.iterdescendants(), b.iterdescendants()):
+        if x.tail != y.tail or not _node_items_equal(x, y):
+            return False
+    # every node has the same number of children, so the trees are the
+    # same size
+    return True
+
+def _node_items_equal(x, y):
+    if x.tag != y.tag or x.text != y.text or len(x) != len(y):
+        return False
+    if x.tag is etree.PI:
+        return x.target == y.target
+    x_items = x.items()
+    y_items = y.items()
+    return x_items == y_items or sorted(x_items) == sorted(y_items)
+
+def _node_hash(node):
+    '''Structural hash of an lxml element and its descendants, consistent
+    with :func:`_nodes_equal`.'''
+    digest = hashlib.sha1()
+    update = digest.update
+    for x in node.iter():
+        if x is not node:
+            update('\0t')
+            if x.tail:
+                update(x.tail.encode('utf-8'))
+        tag = x.tag
+        if not isinstance(tag, basestring):
+            # comment, processing instruction, or entity
+            tag = tag.__name__
+            if x.tag is etree.PI:
+                tag += x.target
+        update('\0<%s\0%d' % (tag.encode('utf-8'), len(x)))
+        for name, value in sorted(x.items()):
+            update('\0@%s\0%s' % (name.encode('utf-8'), value.encode('utf-8')))
+        if x.text:
+            update('\0>')
+            update(x.text.encode('utf-8'))
+    return hash(digest.digest())
+
+
 class Urllib2Resolver(etree.Resolver):
     def resolve(self, url, public_id, context):
         if url.startswith('/'):
             url = 'file:' + url
         f = urllib2.urlopen(url)
         return self.resolve_file(f, context, base_url=url)
-_defaultResolver = Urllib2Resolver()
 
-def _get_xmlparser(xmlclass=XmlObject, validate=False, resolver=_defaultResolver):
+
+XML_CATALOG_NAMESPACE = 'urn:oasis:names:tc:entity:xmlns:xml:catalog'
+XSD_NAMESPACE = 'http://www.w3.org/2001/XMLSchema'
+
+def _remote_uri(uri):
+    return _http_uri(uri) or uri.startswith('ftp:')
+
+def _local_path(uri):
+    if uri.startswith('file:'):
+        return urllib2.url2pathname(urlparse.urlparse(uri).path)
+    return uri
+
+
+class CachingResolver(Urllib2Resolver):
+    '''Resolver that keeps a copy of every remote document it loads (e.g.,
+    schemas and the schemas they import or include), so that each one is
+    only fetched once.  Documents are cached in memory and, if a
+    ``cache_dir`` is specified, on disk, where they can be shared between
+    processes and will be used by later runs.
+
+    Documents can also be resolved to local copies listed in OASIS XML
+    catalog files (``system``, ``uri``, ``public``, ``rewriteSystem``,
+    ``rewriteURI``, and ``nextCatalog`` entries are supported).  With
+    ``offline=True``, remote documents that are not in a catalog or the
+    cache are not fetched; an :class:`IOError` is raised instead.
+
+    The number of documents resolved from a catalog or the cache, and the
+    number that had to be fetched, are counted in :attr:`hits` and
+    :attr:`misses`.  Local files are always read directly, and are not
+    counted.
+
+    :param cache_dir: directory for cached copies of remote documents
+        (optional); created if it does not exist
+    :param catalogs: list of XML catalog file paths (optional)
+    :param offline: boolean; if True, never fetch remote documents
+    '''
+
+    def __init__(self, cache_dir=None, catalogs=None, offline=False):
+        super(CachingResolver, self).__init__()
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._documents = {}
+        self._lock = threading.Lock()
+        # catalog entries: uri or system id -> location, public id ->
+        # location, and prefix rewrites
+        self._catalog_uris = {}
+        self._catalog_public = {}
+        self._catalog_rewrites = []
+        for catalog in catalogs or []:
+            self.add_catalog(catalog)
+
+    def add_catalog(self, path):
+        '''Add the entries in an OASIS XML catalog file.  Relative locations
+        are resolved against the catalog file (or any ``xml:base``).'''
+        catalog = etree.parse(path)
+        for entry in catalog.iter('{%s}*' % XML_CATALOG_NAMESPACE):
+            kind = etree.QName(entry).localname
+            base = entry.base or path
+            if kind in ('system', 'uri'):
+                key = entry.get('systemId') or entry.get('name')
+                self._catalog_uris[key] = urlparse.urljoin(base, entry.get('uri'))
+            elif kind == 'public':
+                self._catalog_public[entry.get('publicId')] = \
+                    urlparse.urljoin(base, entry.get('uri'))
+            elif kind in ('rewriteSystem', 'rewriteURI'):
+                prefix = entry.get('systemIdStartString') or entry.get('uriStartString')
+                self._catalog_rewrites.append((prefix,
+                    urlparse.urljoin(base, entry.get('rewritePrefix'))))
+            elif kind == 'nextCatalog':
+                self.add_catalog(urlparse.urljoin(base, entry.get('catalog')))
+        # longest matching prefix is used for rewrites
+        self._catalog_rewrites.sort(key=lambda rewrite: len(rewrite[0]),
+                                    reverse=True)
+
+    def catalog_location(self, url, public_id=None):
+        '''Get the location listed in the catalogs for a url or public
+        identifier, if any.'''
+        if url in self._catalog_uris:
+            return self._catalog_uris[url]
+        for prefix, rewrite in self._catalog_rewrites:
+            if url.startswith(prefix):
+                return rewrite + url[len(prefix):]
+        if public_id is not None:
+            return self._catalog_public.get(public_id)
+
+    def cache_path(self, url):
+        '''Path to the on-disk copy of a remote url in the cache directory,
+        or None if no cache directory is configured.'''
+        if self.cache_dir is None:
+            return None
+        name = os.path.basename(urlparse.urlparse(url).path)
+        return os.path.join(self.cache_dir,
+                            '%s-%s' % (hashlib.sha1(url).hexdigest(), name))
+
+    def get(self, url, public_id=None):
+        '''Get the contents of a remote document, from a catalog, the
+        cache, or by fetching it.  Returns None for local documents.'''
+        location = self.catalog_location(url, public_id)
+        if location is not None and not _remote_uri(location):
+            self._count(hit=True)
+            with open(_local_path(location), 'rb') as local_copy:
+                return local_copy.read()
+        if location is not None:
+            url = location
+        if not _remote_uri(url):
+            return None
+
+        data = self._documents.get(url)
+        if data is None:
+            path = self.cache_path(url)
+            if path is not None and os.path.exists(path):
+                with open(path, 'rb') as cached:
+                    data = cached.read()
+        if data is not None:
+            self._count(hit=True)
+        else:
+            if self.offline:
+                raise IOError('%s is not in a catalog or the cache, and can not be loaded offline' \
+                              % url)
+            self._count(hit=False)
+            data = urllib2.urlopen(url).read()
+            self._store(url, data)
+        self._documents[url] = data
+        return data
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _store(self, url, data):
+        # write to a temporary file and rename, so other processes never
+        # see a partial copy
+        path = self.cache_path(url)
+        if path is None:
+            return
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(handle, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.rename(tmp_path, path)
+
+    def resolve(self, url, public_id, context):
+        data = self.get(url, public_id)
+        if data is None:
+            return super(CachingResolver, self).resolve(url, public_id, context)
+        return self.resolve_string(data, context, base_url=url)
+
+    def warm(self, *urls):
+        '''Load the specified schemas into the cache, along with all of the
+        schemas that they import, include, or redefine, so that they can be
+        resolved later without network access.  Returns a list of all
+        the urls that were loaded.'''
+        loaded = []
+        pending = list(urls)
+        while pending:
+            url = pending.pop(0)
+            if url in loaded:
+                continue
+            loaded.append(url)
+            data = self.get(url)
+            if data is None:
+                with open(_local_path(url), 'rb') as local_file:
+                    data = local_file.read()
+            schema = etree.fromstring(data, base_url=url)
+            for location in schema.xpath('(xs:import|xs:include|xs:redefine)/@schemaLocation',
+                                         namespaces={'xs': XSD_NAMESPACE}):
+                pending.append(urlparse.urljoin(url, location))
+        return loaded
+
+default_resolver = CachingResolver()
+'''The :class:`CachingResolver` used when loading schemas with
+:meth:`loadSchema` and by default when parsing; configure it (e.g., with a
+``cache_dir``, catalogs, or ``offline``) to change how schemas are loaded.'''
+_defaultResolver = default_resolver
+
+def _get_xmlparser(xmlclass=XmlObject, validate=False, resolver=_defaultResolver,
+                   **options):
     """Initialize an instance of :class:`lxml.etree.XMLParser` with appropriate
     settings for validation.  If validation is requested and the specified
     instance of :class:`XmlObject` has an XSD_SCHEMA defined, that will be used.
-    Otherwise, uses DTD validation.
+    Otherwise, uses DTD validation.  Any other keyword arguments are passed
+    to the parser as options.
     """
+    options.update(_validation_options(xmlclass, validate))
+    return _new_xmlparser(options, resolver)
+
+def _validation_options(xmlclass, validate):
+    # parser options for validating documents for an XmlObject class
     if validate:
         if hasattr(xmlclass, 'XSD_SCHEMA') and xmlclass.XSD_SCHEMA is not None:
             if xmlclass.xmlschema is not None:
                 # if the schema is already loaded, use that
                 xmlschema = xmlclass.xmlschema
             else:         # otherwise, load the schema
-                xmlschema = loadSchema(xmlclass.XSD_SCHEMA)
+                xmlschema = schema_registry.get(xmlclass.XSD_SCHEMA)
             opts = {'schema': xmlschema}
         else:
             # if configured XmlObject does not have a schema defined, assume DTD validation
@@ -488,14 +1566,75 @@ def _get_xmlparser(xmlclass=XmlObject, validate=False, resolver=_defaultResolver
     else:
         # if validation is not requested, no parser options are needed
         opts = {}
+    return opts
 
-    parser = etree.XMLParser(**opts)
+def _new_xmlparser(options, resolver):
+    parser = etree.XMLParser(**options)
     
     if resolver is not None:
         parser.resolvers.add(resolver)
         
     return parser
 
+
+class _ParserPool(threading.local):
+    '''Thread-local pool of preconfigured :class:`lxml.etree.XMLParser`
+    instances, keyed on the validation settings (including the schema), the
+    resolver, and any other parser options, so that parsing does not need
+    to set up a new parser every time.  Parsers are taken out of the pool
+    while in use, so a parse started while another one is in progress
+    (e.g., by a resolver) gets a parser of its own.
+
+    A parser is only returned to the pool if it was used without errors:
+    lxml keeps exceptions raised by resolvers in the parser and raises them
+    from the next parse, so a parser that may hold one is discarded.'''
+
+    def __init__(self):
+        # available parsers, keyed on options and resolver
+        self.parsers = collections.defaultdict(list)
+
+    def _take(self, xmlclass, validate, resolver, options):
+        # take a parser out of the pool, or create a new one; returns the
+        # list of available parsers to return it to, and the parser
+        if validate:
+            options.update(_validation_options(xmlclass, validate))
+        if options:
+            available = self.parsers[(tuple(sorted(options.iteritems())), resolver)]
+        else:
+            available = self.parsers[resolver]
+        if available:
+            return available, available.pop()
+        return available, _new_xmlparser(options, resolver)
+
+    @contextmanager
+    def parser(self, xmlclass=XmlObject, validate=False,
+               resolver=_defaultResolver, **options):
+        '''Context manager to use a parser from the pool; takes the same
+        arguments as :meth:`_get_xmlparser`.'''
+        available, parser = self._take(xmlclass, validate, resolver, options)
+        yield parser
+        available.append(parser)
+
+    def fromstring(self, text, base_url=None, xmlclass=XmlObject,
+                   validate=False, resolver=_defaultResolver):
+        '''Parse a string with a parser from the pool, as
+        :func:`lxml.etree.fromstring`.'''
+        available, parser = self._take(xmlclass, validate, resolver, {})
+        element = etree.fromstring(text, parser, base_url=base_url)
+        available.append(parser)
+        return element
+
+    def parse(self, source, base_url=None, xmlclass=XmlObject,
+              validate=False, resolver=_defaultResolver):
+        '''Parse a file or url with a parser from the pool, as
+        :func:`lxml.etree.parse`.'''
+        available, parser = self._take(xmlclass, validate, resolver, {})
+        tree = etree.parse(source, parser, base_url=base_url)
+        available.append(parser)
+        return tree
+
+_parser_pool = _ParserPool()
+
 def load_xmlobject_from_string(string, xmlclass=XmlObject, validate=False,
         resolver=None):
     """Initialize an XmlObject from a string.
@@ -514,8 +1653,8 @@ def load_xmlobject_from_string(string, xmlclass=XmlObject, validate=False,
     :param validate: boolean, enable validation; defaults to false
     :rtype: instance of :class:`~eulxml.xmlmap.XmlObject` requested
     """
-    parser = _get_xmlparser(xmlclass=xmlclass, validate=validate, resolver=resolver)    
-    element = etree.fromstring(string, parser)
+    element = _parser_pool.fromstring(string, xmlclass=xmlclass,
+                                      validate=validate, resolver=resolver)
     return xmlclass(element)
 
 
@@ -532,11 +1671,110 @@ def load_xmlobject_from_file(filename, xmlclass=XmlObject, validate=False,
         file-like object, or an HTTP or FTP url, however file path and URL are
         recommended, as they are generally faster for lxml to handle.    
     """
-    parser = _get_xmlparser(xmlclass=xmlclass, validate=validate, resolver=resolver)
-
-    tree = etree.parse(filename, parser)
+    tree = _parser_pool.parse(filename, xmlclass=xmlclass, validate=validate,
+                              resolver=resolver)
     return xmlclass(tree.getroot())
 
+
+def iter_xmlobjects(source, tag=None, xmlclass=XmlObject, namespaces=None,
+        resolver=_defaultResolver, **options):
+    """Incrementally parse a file, and generate an XmlObject for each
+    element matching the specified tag, e.g. each ``xm:Message`` in a CERP
+    account, each ``mods:mods`` in a ``modsCollection``, or each
+    ``oai_dc:dc`` in an OAI-PMH response.
+
+    Each element is only parsed when its object is requested, and once the
+    next object is requested, the previous element is cleared and it and
+    any other content that comes before it is removed from the document.
+    Memory use therefore stays flat regardless of the size of the file, but
+    an object (and any nodes or lists from it) should not be used after the
+    next object has been generated; to keep any of the xml, copy it or
+    serialize it first.  Matching elements should not be nested inside one
+    another.
+
+    :param source: name of the file to be parsed, or a file or file-like
+        object; see :func:`lxml.etree.iterparse`
+    :param tag: element to generate objects for; may be a prefixed name
+        using a prefix defined in namespaces, or in Clark notation
+        (``{namespace}name``).  Defaults to the ROOT_NAME and ROOT_NS of
+        the xmlclass.
+    :param xmlclass: subclass of :class:`~eulxml.xmlmap.XmlObject` to
+        initialize for each element
+    :param namespaces: dictionary of namespace prefixes and URIs used in tag
+        (optional); defaults to the ROOT_NAMESPACES of the xmlclass
+    :param resolver: resolver to use for external documents; defaults to
+        :data:`default_resolver`
+    :returns: generator of instances of the xmlclass requested
+
+    Any other keyword arguments are passed to :func:`lxml.etree.iterparse`
+    as parser options (e.g., ``huge_tree=True``).
+    """
+    if tag is None:
+        tag = xmlclass.ROOT_NAME
+        if xmlclass.ROOT_NS:
+            tag = '{%s}%s' % (xmlclass.ROOT_NS, tag)
+    elif ':' in tag and not tag.startswith('{'):
+        if namespaces is None:
+            namespaces = xmlclass.ROOT_NAMESPACES
+        prefix, name = tag.split(':', 1)
+        tag = '{%s}%s' % (namespaces[prefix], name)
+
+    events = etree.iterparse(source, events=('end',), tag=tag, **options)
+    if resolver is not None:
+        events.resolvers.add(resolver)
+    for event, element in events:
+        yield xmlclass(element)
+        # free everything that has been processed: the element itself, its
+        # preceding siblings, and the preceding siblings of its ancestors
+        element.clear()
+        node = element
+        while node is not None:
+            parent = node.getparent()
+            if parent is not None:
+                while node.getprevious() is not None:
+                    del parent[0]
+            node = parent
+
+
+def validate_many(objects, threads=4):
+    """Validate a number of :class:`XmlObject` instances concurrently, using
+    a pool of threads.  lxml releases the GIL while validating a document,
+    so this makes use of multiple processors without the overhead of
+    starting worker processes and sending documents to them (compare
+    :func:`eulxml.xmlmap.batch.validate_files`).
+
+    :param objects: iterable of :class:`XmlObject` instances
+    :param threads: number of threads to validate with
+    :returns: list of the :meth:`~XmlObject.validation_errors` for each
+        object, in the same order as `objects`
+    """
+    objects = list(objects)
+    results = [None] * len(objects)
+    exceptions = []
+    indexes = iter(xrange(len(objects)))
+    lock = threading.Lock()
+
+    def validate():
+        while not exceptions:
+            with lock:
+                i = next(indexes, None)
+            if i is None:
+                return
+            try:
+                results[i] = objects[i].validation_errors()
+            except Exception as err:
+                exceptions.append(err)
+
+    workers = [threading.Thread(target=validate)
+               for i in xrange(min(threads, len(objects)))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if exceptions:
+        raise exceptions[0]
+    return results
+
 # Import these for backward compatibility. Should consider deprecating these
 # and asking new code to pull them from descriptor
 from eulxml.xmlmap.fields import *
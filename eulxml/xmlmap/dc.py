@@ -44,7 +44,6 @@ class DublinCore(_BaseDublinCore):
     ROOT_NAME = 'dc'
 
     XSD_SCHEMA = "http://www.openarchives.org/OAI/2.0/oai_dc.xsd"
-    xmlschema = xmlmap.loadSchema(XSD_SCHEMA)
 
     contributor = xmlmap.StringField("dc:contributor", required=False)
     contributor_list = xmlmap.StringListField("dc:contributor",
@@ -119,10 +118,12 @@ class DublinCore(_BaseDublinCore):
         @property
         def dcmi_types_graph(self):
             'DCMI Types Vocabulary as an :class:`rdflib.Graph`'
-            # only initialize if requested; then save the result
+            # only initialize if requested; then save the result on the
+            # class, since it is the same for every instance
             if self._dcmi_types_graph is None:
-                self._dcmi_types_graph = rdflib.Graph()
-                self._dcmi_types_graph.parse(self.DCMI_TYPES_RDF)
+                graph = rdflib.Graph()
+                graph.parse(self.DCMI_TYPES_RDF)
+                type(self)._dcmi_types_graph = graph
             return self._dcmi_types_graph
 
         _dcmi_types = None
@@ -132,14 +133,15 @@ class DublinCore(_BaseDublinCore):
             http://dublincore.org/documents/dcmi-type-vocabulary/'''
             if self._dcmi_types is None:
                 # generate a list of DCMI types based on the RDF dctype document
-                self._dcmi_types = []
+                dcmi_types = []
                 # get all items with rdf:type of rdfs:Clas
                 items = self.dcmi_types_graph.subjects(rdflib.RDF.type, rdflib.RDFS.Class)
                 for item in items:
                     # check that this item is defined by dcmitype
                     if (item, rdflib.RDFS.isDefinedBy, self.DCMI_TYPE_URI) in self.dcmi_types_graph:
                         # add the label to the list
-                        self._dcmi_types.append(str(self.dcmi_types_graph.label(subject=item)))
+                        dcmi_types.append(str(self.dcmi_types_graph.label(subject=item)))
+                type(self)._dcmi_types = dcmi_types
             return self._dcmi_types
     else:
         # no rdflib
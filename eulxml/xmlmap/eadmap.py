@@ -56,14 +56,12 @@ class Section(_EadBase):
 
 class Heading(_EadBase):
     """Generic xml object for headings used under `controlaccess`"""
+    CACHE_TEXT = True
     source = xmlmap.StringField("@source")
     "source vocabulary for controlled term - `@source`"
     value  = xmlmap.StringField(".", normalize=True)
     "controlled term text value (content of the heading element)"
 
-    def __unicode__(self):
-        return self.value
-
 
 class ControlledAccessHeadings(Section):
     """
@@ -142,6 +140,7 @@ class Unitid(_EadBase):
     "human-readable unitid - (contents of the element)"
 
 class UnitTitle(_EadBase):
+    CACHE_TEXT = True
     unitdate = xmlmap.NodeField("e:unitdate", DateField)
     "unit date"
     
@@ -274,6 +273,7 @@ class Reference(_EadBase):
 
     Expected node element passed to constructor: `ref`.
     """
+    CACHE_TEXT = True
     type = xmlmap.StringField("@xlink:type")
     "link type - `xlink:type`"
     target = xmlmap.StringField("@target")
@@ -282,9 +282,6 @@ class Reference(_EadBase):
     "text content of the reference"
     # TODO: add mappings for other relevant reference and link attributes
 
-    def __unicode__(self):
-        return self.value
-
 
 class PointerGroup(_EadBase):
     """Group of pointer or reference elements in an index entry
@@ -428,7 +425,6 @@ class EncodedArchivalDescription(_EadBase):
     """
 
     XSD_SCHEMA = 'http://www.loc.gov/ead/ead.xsd'
-    xmlschema = xmlmap.loadSchema(XSD_SCHEMA)
 
     id = xmlmap.StringField('@id')
     "top-level id attribute - `@id`; preferable to use eadid"
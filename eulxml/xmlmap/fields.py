@@ -16,8 +16,8 @@
 
 from datetime import datetime
 import logging
+import re
 from lxml import etree
-from lxml.builder import ElementMaker
 from eulxml.xpath import ast, parse, serialize
 from types import ListType, FloatType
 
@@ -51,9 +51,11 @@ class Field(object):
                     help_text=None):
         # compile xpath in order to catch an invalid xpath at load time
         etree.XPath(xpath)
-        # NOTE: not saving compiled xpath because namespaces must be
-        # passed in at compile time when evaluating an etree.XPath on a node
+        # NOTE: namespaces must be passed in at compile time when evaluating
+        # an etree.XPath on a node, so compiled xpaths are cached per
+        # namespace context; see compiled_xpath()
         self.xpath = xpath
+        self._compiled_xpaths = {}
         self.manager = manager
         self.mapper = mapper
         self.required = required
@@ -62,23 +64,97 @@ class Field(object):
 
         # pre-parse the xpath for setters, etc
         self.parsed_xpath = parse(xpath)
+        # simple attribute and text xpaths can be read without the xpath
+        # engine, for mappers that convert the strings they are given (the
+        # lxml results themselves are returned by other mappers)
+        self._simple_step = None
+        if isinstance(mapper, _CONVERTING_MAPPERS):
+            self._simple_step = _simple_step(self.parsed_xpath)
+        # location steps, for evaluating fields with common leading steps
+        # together; see XmlObject.values()
+        self._path_steps = _path_steps(self.parsed_xpath)
+        # plan for creating and updating nodes in setters
+        self._creation_plan = _CreationPlan(self.parsed_xpath)
 
         # adjust creation counter, save local copy of current count
         self.creation_counter = Field.creation_counter
         Field.creation_counter += 1
 
-    def get_for_node(self, node, context):
-        return self.manager.get(self.xpath, node, context, self.mapper, self.parsed_xpath)
+    def compiled_xpath(self, context, read_only=False):
+        """Get a compiled :class:`lxml.etree.XPath` for this field's xpath,
+        using the namespaces in the specified context.  Compiled xpaths are
+        cached on the field, one per distinct set of namespaces.  If the
+        context can't be used to compile an xpath (e.g., it includes xpath
+        extension functions), returns the xpath as a string.
+
+        If ``read_only`` is True, the xpath is a simple attribute or
+        ``text()`` step, and the field's mapper converts its values (e.g.,
+        to strings or integers), returns an equivalent callable that reads the
+        value directly with lxml rather than the xpath engine; its results
+        are plain strings, which can't be used to update the XML.
+        """
+        key = _context_key(context)
+        if key is None:
+            return self.xpath
+        try:
+            return self._compiled_xpaths[(key, read_only)]
+        except KeyError:
+            compiled = _compile_xpath(self.xpath, context)
+            if read_only and self._simple_step is not None:
+                compiled = _SimpleXPath.for_context(compiled,
+                                        self._simple_step, context) or compiled
+            self._compiled_xpaths[(key, read_only)] = compiled
+            return compiled
+
+    def _get_mapper(self, wrappers=None):
+        # mapper to convert matches with; node mappers use the identity map
+        # of xmlobject wrappers, if any (see XmlObject.IDENTITY_MAP)
+        if wrappers is not None and isinstance(self.mapper, NodeMapper):
+            return NodeMapper(self.mapper.node_class, wrappers)
+        return self.mapper
+
+    def _get_for_step_node(self, node, context, level, wrappers=None):
+        # get the value of a single-node field from the node matched by
+        # the leading location steps of its xpath, up to the specified level
+        key = _context_key(context)
+        try:
+            xpath = self._compiled_xpaths[(key, 'steps', level)]
+        except KeyError:
+            xpath = '/'.join(serialize(step) for step in self._path_steps[level:])
+            if key is not None:
+                xpath = _compile_xpath(xpath, context)
+                self._compiled_xpaths[(key, 'steps', level)] = xpath
+        return self.manager.get(xpath, node, context,
+                                self._get_mapper(wrappers), self._creation_plan)
+
+    def get_for_node(self, node, context, wrappers=None):
+        # a single node value is only read, never updated, on get
+        read_only = isinstance(self.manager, SingleNodeManager)
+        return self.manager.get(self.compiled_xpath(context, read_only),
+                                node, context, self._get_mapper(wrappers),
+                                self._creation_plan)
 
     def set_for_node(self, node, context, value):
-        return self.manager.set(self.xpath, self.parsed_xpath, node, context, self.mapper, value)
+        return self.manager.set(self.compiled_xpath(context), self._creation_plan,
+                                node, context, self.mapper, value)
 
     def delete_for_node(self, node, context):
-        return self.manager.delete(self.xpath, self.parsed_xpath, node, context, self.mapper)
+        return self.manager.delete(self.compiled_xpath(context), self._creation_plan,
+                                   node, context, self.mapper)
 
 
 # data mappers to translate between identified xml nodes and Python values
 
+def _node_string(node):
+    '''Shortcut for the xpath ``string()`` of a node: returns the text of an
+    element with no child nodes, or None if the xpath is required.'''
+    if isinstance(node, etree._Element) and not len(node):
+        return node.text or ''
+
+# xml whitespace, as used by the xpath normalize-space() function
+_XML_WHITESPACE = re.compile(u'[ \t\r\n]+')
+_XML_INTEGER = re.compile(u'^[ \t\r\n]*-?[0-9]+[ \t\r\n]*$')
+
 class Mapper(object):
     # generic mapper to_xml function
     def to_xml(self, value):
@@ -91,6 +167,7 @@ class Mapper(object):
 class StringMapper(Mapper):
     XPATH = etree.XPath('string()')
     def __init__(self, normalize=False):
+        self.normalize = normalize
         if normalize:
             self.XPATH = etree.XPath('normalize-space(string())')
         
@@ -99,7 +176,12 @@ class StringMapper(Mapper):
             return None
         if isinstance(node, basestring):
             return node
-        return self.XPATH(node)
+        text = _node_string(node)
+        if text is None:
+            return self.XPATH(node)
+        if self.normalize:
+            return _XML_WHITESPACE.sub(' ', text).strip(' ')
+        return text
        
 class IntegerMapper(Mapper):
     XPATH = etree.XPath('number()')
@@ -111,6 +193,9 @@ class IntegerMapper(Mapper):
             if isinstance(node, basestring) or isinstance(node, FloatType):
                 return int(node)
 
+            text = _node_string(node)
+            if text is not None and _XML_INTEGER.match(text):
+                return int(text)
             return int(self.XPATH(node))
         except ValueError:
             # anything that can't be converted to an Integer
@@ -131,7 +216,9 @@ class SimpleBooleanMapper(Mapper):
         if isinstance(node, basestring):
             value = node
         else:
-            value = self.XPATH(node)
+            value = _node_string(node)
+            if value is None:
+                value = self.XPATH(node)
         if value == str(self.true):
             return True
         if self.false is not None and \
@@ -157,7 +244,9 @@ class DateMapper(object):
         if isinstance(node, basestring):
             rep = node
         else:
-            rep = self.XPATH(node)
+            rep = _node_string(node)
+            if rep is None:
+                rep = self.XPATH(node)
         if rep.endswith('Z'): # strip Z
             rep = rep[:-1]
         if rep[-6] in '+-': # strip tz
@@ -180,21 +269,196 @@ class NullMapper(object):
 
 
 class NodeMapper(object):
-    def __init__(self, node_class):
+    def __init__(self, node_class, wrappers=None):
         self.node_class = node_class
+        # identity map to get existing wrapper objects from, if any
+        self.wrappers = wrappers
 
     def to_python(self, node):
         if node is None:
             return None
+        if self.wrappers is not None:
+            return self.wrappers.get(node, self.node_class)
         return self.node_class(node)
 
     def to_xml(self, xmlobject):
         if xmlobject:
             return xmlobject.node
 
+# mappers that convert xpath results to python values, rather than
+# returning the results themselves
+_CONVERTING_MAPPERS = (Mapper, DateMapper)
+
 
 # internal xml utility functions for use by managers
 
+# options that etree.XPath requires at compile time; any other context
+# entries are passed in as xpath variables at evaluation time
+_XPATH_COMPILE_OPTIONS = ('namespaces', 'extensions', 'smart_strings')
+
+# compiled xpaths for expressions that don't belong to a single field (e.g.,
+# partial paths used when creating or removing nodes), keyed on xpath and
+# context; cleared whenever it reaches the maximum size
+_xpath_cache = {}
+_XPATH_CACHE_SIZE = 500
+
+def _context_key(context):
+    '''Generate a hashable key for the compile-time portion of an xpath
+    context, for use in caching compiled xpaths.  Returns None if the context
+    can't be used with a cached xpath (i.e., it specifies extension functions).'''
+    if isinstance(context, XPathContext):
+        return context.xpath_key
+    if context.get('extensions'):
+        return None
+    return (frozenset(context.get('namespaces', {}).iteritems()),
+            context.get('smart_strings', True))
+
+
+def _xpath_variables(context):
+    # anything in the context that isn't a compile option is an xpath variable
+    if isinstance(context, XPathContext):
+        return context.xpath_variables
+    return dict((name, val) for name, val in context.iteritems()
+                if name not in _XPATH_COMPILE_OPTIONS)
+
+
+class _ImmutableDict(dict):
+    # dictionary that raises an error on any attempt to modify it
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('%s can not be modified' % self.__class__.__name__)
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+    # immutable, so copies can safely share the original
+    def __copy__(self):
+        return self
+    def __deepcopy__(self, memo):
+        return self
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+
+class XPathContext(_ImmutableDict):
+    """Immutable dictionary of options for evaluating xpaths on a node
+    (``namespaces`` and any xpath variables), as used by
+    :class:`~eulxml.xmlmap.XmlObject`.  Contexts are shared between all
+    :class:`~eulxml.xmlmap.XmlObject` instances of the same class with the
+    same namespaces, so they can not be modified once created.
+    """
+    def __init__(self, options):
+        options = dict(options)
+        if 'namespaces' in options:
+            options['namespaces'] = _ImmutableDict(options['namespaces'])
+        super(XPathContext, self).__init__(options)
+        # pre-calculate cache key and xpath variables for evaluating xpaths
+        self.xpath_key = _context_key(options)
+        self.xpath_variables = _xpath_variables(options)
+
+
+def _compile_xpath(xpath, context):
+    return etree.XPath(xpath, namespaces=context.get('namespaces', None),
+                       smart_strings=context.get('smart_strings', True))
+
+
+def _evaluate_xpath(xpath, node, context, **variables):
+    '''Evaluate an xpath relative to a node.  The xpath may be a string or
+    a compiled :class:`lxml.etree.XPath`; strings are compiled and cached
+    whenever the context allows it.  Any keyword arguments are passed to
+    the xpath as variables, in addition to those in the context.'''
+    if isinstance(xpath, basestring):
+        key = _context_key(context)
+        if key is None:
+            return node.xpath(xpath, **dict(context, **variables))
+        try:
+            xpath = _xpath_cache[(xpath, key)]
+        except KeyError:
+            if len(_xpath_cache) >= _XPATH_CACHE_SIZE:
+                _xpath_cache.clear()
+            compiled = _compile_xpath(xpath, context)
+            _xpath_cache[(xpath, key)] = compiled
+            xpath = compiled
+    if variables:
+        return xpath(node, **dict(_xpath_variables(context), **variables))
+    return xpath(node, **_xpath_variables(context))
+
+
+def _path_steps(xast):
+    '''Split a parsed relative location path into a list of its steps, if
+    it consists only of steps joined with ``/``.  Returns None for any other
+    xpath.'''
+    if isinstance(xast, (ast.Step, ast.AbbreviatedStep)):
+        return [xast]
+    if isinstance(xast, ast.BinaryExpression) and xast.op == '/' and \
+            isinstance(xast.right, (ast.Step, ast.AbbreviatedStep)):
+        steps = _path_steps(xast.left)
+        if steps is not None:
+            return steps + [xast.right]
+    return None
+
+
+def _is_child_name_step(step):
+    '''Check if a parsed location step selects child elements by name (no
+    wildcard or predicates).'''
+    return isinstance(step, ast.Step) and step.axis in (None, 'child') and \
+        isinstance(step.node_test, ast.NameTest) and \
+        step.node_test.name != '*' and not step.predicates
+
+
+def _simple_step(xast):
+    '''Check if a parsed xpath is a single attribute or ``text()`` step with
+    no predicates, which can be read without the xpath engine.  Returns a
+    tuple of (type, prefix, name), or None if the xpath is not simple.'''
+    if not isinstance(xast, ast.Step) or xast.predicates:
+        return None
+    test = xast.node_test
+    if isinstance(test, ast.NameTest) and xast.axis in ('@', 'attribute') \
+            and test.name != '*':
+        return ('attribute', test.prefix, test.name)
+    if isinstance(test, ast.NodeType) and test.name == 'text' \
+            and xast.axis in (None, 'child'):
+        return ('text', None, None)
+    return None
+
+
+class _SimpleXPath(object):
+    '''Callable stand-in for a compiled :class:`lxml.etree.XPath` that reads
+    a simple attribute or ``text()`` xpath (see :func:`_simple_step`) with
+    direct lxml calls.  Results are plain strings, which can't be used to
+    update the XML.  Falls back to the compiled xpath when not evaluated on
+    an element.'''
+
+    def __init__(self, xpath, kind, attribute=None):
+        self.xpath = xpath
+        self.path = xpath.path
+        self.kind = kind
+        self.attribute = attribute
+
+    @classmethod
+    def for_context(cls, xpath, step, context):
+        '''Initialize for the namespaces in a context, with any attribute
+        name in Clark notation; returns None if a namespace prefix can not
+        be resolved.'''
+        kind, prefix, name = step
+        if prefix is not None:
+            namespaces = context.get('namespaces') or {}
+            if prefix not in namespaces:
+                return None
+            name = '{%s}%s' % (namespaces[prefix], name)
+        return cls(xpath, kind, name)
+
+    def __call__(self, node, **variables):
+        if not isinstance(node, etree._Element) or \
+                not isinstance(node.tag, basestring):
+            return self.xpath(node, **variables)
+        if self.kind == 'attribute':
+            value = node.get(self.attribute)
+            if value is None:
+                return []
+            return [value]
+        # text(): the element text and the tail of each child node
+        return [text for text in [node.text] + [child.tail for child in node]
+                if text is not None]
+
+
 def _find_terminal_step(xast):
     if isinstance(xast, ast.Step):
         return xast
@@ -206,80 +470,245 @@ def _find_terminal_step(xast):
 
 def _find_xml_node(xpath, node, context):
     #In some cases the this will return a value not a node
-    matches = node.xpath(xpath, **context)
+    matches = _evaluate_xpath(xpath, node, context)
     if matches and isinstance(matches, ListType):
         return matches[0]
     elif matches:
         return matches
 
 
-def _create_xml_node(xast, node, context, insert_index=None):
-    if isinstance(xast, ast.Step):
-        if isinstance(xast.node_test, ast.NameTest):
-            # check the predicates (if any) to verify they're constructable
-            for pred in xast.predicates:
-                if not _predicate_is_constructible(pred):
-                    msg = ("Missing element for '%s', and node creation is " +
-                           "supported only for simple child and attribute " +
-                           "nodes with simple predicates.") % (serialize(xast),)
-                    raise Exception(msg)
-
-            # create the node itself
-            if xast.axis in (None, 'child'):
-                new_node = _create_child_node(node, context, xast, insert_index)
-            elif xast.axis in ('@', 'attribute'):
-                new_node = _create_attribute_node(node, context, xast)
-
-            # and create any nodes necessary for the predicates
-            for pred in xast.predicates:
-                _construct_predicate(pred, new_node, context)
-
-            return new_node
-
-        # if this is a text() node, we don't need to create anything further
-        # return the node that will be parent to text()
-        elif _is_text_nodetest(xast):
-            return node
-        
-    elif isinstance(xast, ast.BinaryExpression):
-        if xast.op == '/':
-            left_xpath = serialize(xast.left)
-            left_node = _find_xml_node(left_xpath, node, context)
-            if left_node is None:
-                left_node = _create_xml_node(xast.left, node, context)
-            return _create_xml_node(xast.right, left_node, context)
+class _CreationPlan(object):
+    '''Plan for creating, updating, and removing the xml matched by an
+    xpath, compiled once from the parsed xpath so that setters don't have
+    to re-walk it.  A plan consists of the steps of the xpath joined with
+    ``/``; the xpaths for the leading steps, used to find any portion of the
+    path that already exists, are compiled and cached per namespace context.
+    '''
 
-    # anything else, throw an exception:
-    msg = ("Missing element for '%s', and node creation is supported " + \
-           "only for simple child and attribute nodes.") % (serialize(xast),)
-    raise Exception(msg)
+    def __init__(self, xast):
+        self.xast = xast
+        steps = []
+        lefts = []
+        while isinstance(xast, ast.BinaryExpression) and xast.op == '/':
+            steps.append(xast.right)
+            lefts.append(serialize(xast.left))
+            xast = xast.left
+        steps.append(xast)
+        steps.reverse()
+        lefts.reverse()
+        self.steps = [_CreationStep(step) for step in steps]
+        # xpaths for the leading steps; paths[i] selects steps[:i+1]
+        self.paths = lefts
+        self._xpaths = {}
+        # terminal (rightmost) step informs how we update the xml
+        terminal = _find_terminal_step(self.xast)
+        if terminal is not None:
+            terminal = _CreationStep(terminal)
+        self.terminal = terminal
+
+    def _find_leading(self, count, node, context):
+        # find the node matched by the specified number of leading steps
+        key = _context_key(context)
+        try:
+            xpath = self._xpaths[(key, count)]
+        except KeyError:
+            xpath = self.paths[count - 1]
+            if key is not None:
+                xpath = _compile_xpath(xpath, context)
+                self._xpaths[(key, count)] = xpath
+        return _find_xml_node(xpath, node, context)
+
+    def create(self, node, context, insert_index=None):
+        '''Create the xml for the xpath relative to node, re-using any
+        portion of the path that already exists; returns the new node.  An
+        insert index is only used for single-step xpaths.'''
+        steps = self.steps
+        if len(steps) == 1:
+            return steps[0].create(node, context, insert_index)
+        # find the longest portion of the path that exists already
+        start = 0
+        for count in xrange(len(steps) - 1, 0, -1):
+            found = self._find_leading(count, node, context)
+            if found is not None:
+                node = found
+                start = count
+                break
+        for step in steps[start:]:
+            node = step.create(node, context)
+        return node
 
+    def set_value(self, match, value, context):
+        '''Set a value on a node matched by the xpath.'''
+        _set_in_xml(match, value, context, self.terminal)
 
-def _create_child_node(node, context, step, insert_index=None):
-    opts = {}
+    def remove(self, node, context):
+        '''Remove the node or attribute matched by the xpath; returns True
+        when something is deleted.'''
+        if len(self.steps) > 1:
+            node = self._find_leading(len(self.steps) - 1, node, context)
+            if node is None:
+                return False
+        return self.steps[-1].remove(node, context)
+
+
+class _CreationStep(object):
+    '''A single step in a :class:`_CreationPlan`: a child element, attribute,
+    or ``text()`` node, and constructors for any predicates on it.  Steps
+    that can't be created keep the error to be raised if creation is
+    attempted.'''
+
+    def __init__(self, xast):
+        self.xast = xast
+        self.xpath = serialize(xast)
+        self.kind = None
+        self.predicates = []
+        self.error = None
+        self._attribute_names = {}
+        self._element_names = {}
+        if isinstance(xast, ast.Step):
+            if isinstance(xast.node_test, ast.NameTest):
+                if xast.axis in (None, 'child'):
+                    self.kind = 'child'
+                elif xast.axis in ('@', 'attribute'):
+                    self.kind = 'attribute'
+                # check the predicates (if any) to verify they're constructable
+                if not all(_predicate_is_constructible(pred)
+                           for pred in xast.predicates):
+                    self.error = ("Missing element for '%s', and node creation is " +
+                                  "supported only for simple child and attribute " +
+                                  "nodes with simple predicates.") % (self.xpath,)
+                self.predicates = [_PredicatePlan(pred) for pred in xast.predicates]
+            # if this is a text() node, we don't need to create anything further
+            elif _is_text_nodetest(xast):
+                self.kind = 'text'
+        if self.kind is None and self.error is None:
+            self.error = ("Missing element for '%s', and node creation is supported " + \
+                          "only for simple child and attribute nodes.") % (self.xpath,)
+
+    def attribute_name(self, context):
+        '''Get the attribute name in Clark notation and a compiled xpath to
+        find it, for the namespaces in the specified context.'''
+        key = _context_key(context)
+        try:
+            return self._attribute_names[key]
+        except KeyError:
+            node_name, node_xpath, nsmap = _get_attribute_name(self.xast, context)
+            names = (node_name, etree.XPath(node_xpath, namespaces=nsmap))
+            if key is not None:
+                self._attribute_names[key] = names
+            return names
+
+    def element_name(self, context):
+        '''Get the element name in Clark notation and the namespace map for
+        new elements, for the namespaces in the specified context.'''
+        key = _context_key(context)
+        try:
+            return self._element_names[key]
+        except KeyError:
+            names = _get_element_name(self.xast, context)
+            if key is not None:
+                self._element_names[key] = names
+            return names
+
+    def create(self, node, context, insert_index=None, previous=None):
+        if self.error is not None:
+            raise Exception(self.error)
+        # return the node that will be parent to text()
+        if self.kind == 'text':
+            return node
+
+        # create the node itself
+        if self.kind == 'child':
+            tag, nsmap = self.element_name(context)
+            new_node = _create_child_node(node, tag, nsmap, insert_index,
+                                          previous)
+        else:
+            node_name, node_xpath = self.attribute_name(context)
+            # create an empty attribute node
+            node.set(node_name, '')
+            # find via xpath so a 'smart' string can be returned and set normally
+            new_node = node_xpath(node)[0]
+
+        # and create any nodes necessary for the predicates
+        for pred in self.predicates:
+            pred.construct(new_node, context)
+        return new_node
+
+    def remove(self, node, context):
+        if self.kind == 'child':
+            child = _find_xml_node(self.xpath, node, context)
+            if child is not None:
+                node.remove(child)
+                return True
+        elif self.kind == 'attribute':
+            del node.attrib[self.attribute_name(context)[0]]
+            return True
+        # special case for text()
+        # since it can't be removed, at least clear out any value in the text node
+        elif self.kind == 'text':
+            node.text = ''
+            return True
+        return False
+
+
+class _PredicatePlan(object):
+    '''Constructor for a predicate on a :class:`_CreationStep`: creates the
+    node or path in the predicate, and sets its value for an ``=``
+    predicate.  Any other predicates (e.g., positions) require no
+    construction.'''
+
+    def __init__(self, xast):
+        self.path = None
+        self.value = None
+        self.variable = None
+        if isinstance(xast, ast.Step) or \
+                (isinstance(xast, ast.BinaryExpression) and xast.op == '/'):
+            self.path = _CreationPlan(xast)
+        elif isinstance(xast, ast.BinaryExpression) and xast.op == '=':
+            self.path = _CreationPlan(xast.left)
+            if isinstance(xast.right, ast.VariableReference):
+                self.variable = xast.right.name
+            else:
+                self.value = str(xast.right)
+
+    def construct(self, node, context):
+        if self.path is None:
+            return
+        leaf = self.path.create(node, context)
+        if self.variable is not None:
+            ctxval = context.get(self.variable, None)
+            if ctxval is None:
+                ctxval = context[self.variable[1]]
+            self.path.set_value(leaf, str(ctxval), context)
+        elif self.value is not None:
+            self.path.set_value(leaf, self.value, context)
+
+
+def _get_element_name(step, context):
+    nsmap = None
     ns_uri = None
     if 'namespaces' in context:
-        opts['nsmap'] = context['namespaces']
+        nsmap = context['namespaces']
         if step.node_test.prefix:
             ns_uri = context['namespaces'][step.node_test.prefix]
-    E = ElementMaker(namespace=ns_uri, **opts)
-    new_node = E(step.node_test.name)
-    if insert_index is not None:
-        node.insert(insert_index, new_node)
+    if ns_uri:
+        return '{%s}%s' % (ns_uri, step.node_test.name), nsmap
+    return step.node_test.name, nsmap
+
+
+def _create_child_node(node, tag, nsmap, insert_index=None, previous=None):
+    # new node is appended, inserted at an index, or added directly after
+    # a previous sibling (which avoids finding the index in a long list)
+    if insert_index is None and previous is None:
+        return etree.SubElement(node, tag, nsmap=nsmap)
+    new_node = node.makeelement(tag, nsmap=nsmap)
+    if previous is not None:
+        previous.addnext(new_node)
     else:
-        node.append(new_node)
+        node.insert(insert_index, new_node)
     return new_node
 
 
-def _create_attribute_node(node, context, step):
-    node_name, node_xpath, nsmap = _get_attribute_name(step, context)
-    # create an empty attribute node
-    node.set(node_name, '')
-    # find via xpath so a 'smart' string can be returned and set normally
-    result = node.xpath(node_xpath, namespaces=nsmap)
-    return result[0]
-
-
 def _predicate_is_constructible(pred):
     if isinstance(pred, ast.Step):
         # only child and attribute for now
@@ -312,30 +741,8 @@ def _predicate_is_constructible(pred):
     return True
 
 
-def _construct_predicate(xast, node, context):
-    if isinstance(xast, ast.Step):
-        return _create_xml_node(xast, node, context)
-    elif isinstance(xast, ast.BinaryExpression):
-        if xast.op == '/':
-            left_leaf = _construct_predicate(xast.left, node, context)
-            right_node = _construct_predicate(xast.right, left_node, context)
-            return right_node
-        elif xast.op == '=':
-            left_leaf = _construct_predicate(xast.left, node, context)
-            step = _find_terminal_step(xast.left)
-            if isinstance(xast.right, ast.VariableReference):
-                name = xast.right.name
-                ctxval = context.get(name, None)
-                if ctxval is None:
-                    ctxval = context[name[1]]
-                xvalue = str(ctxval)
-            else:
-                xvalue = str(xast.right)
-            _set_in_xml(left_leaf, xvalue, context, step)
-            return left_leaf
-
-
 def _set_in_xml(node, val, context, step):
+    # step is the terminal _CreationStep for the xpath that matched node
 
     # node could be either an element or an attribute
     if isinstance(node, etree._Element): # if it's an element
@@ -358,51 +765,15 @@ def _set_in_xml(node, val, context, step):
     # or an attribute
     elif hasattr(node, 'getparent'): 
         # if node test is text(), set the text of the parent node
-        if _is_text_nodetest(step):
+        if step.kind == 'text':
             node.getparent().text = val
 
         # otherwise, treat it as an attribute
         else:
-            attribute, node_xpath, nsmap = _get_attribute_name(step, context)
+            attribute, node_xpath = step.attribute_name(context)
             node.getparent().set(attribute, val)
 
 
-def _remove_xml(xast, node, context):
-    'Remove a node or attribute; returns True when something is deleted'
-    if isinstance(xast, ast.Step):
-        if isinstance(xast.node_test, ast.NameTest):
-            if xast.axis in (None, 'child'):
-                return _remove_child_node(node, context, xast)
-            elif xast.axis in ('@', 'attribute'):
-                return _remove_attribute_node(node, context, xast)
-        # special case for text()
-        # since it can't be removed, at least clear out any value in the text node
-        elif _is_text_nodetest(xast):
-            node.text = ''
-            return True
-    elif isinstance(xast, ast.BinaryExpression):
-        if xast.op == '/':
-            left_xpath = serialize(xast.left)
-            left_node = _find_xml_node(left_xpath, node, context)
-            if left_node is not None:
-                return _remove_xml(xast.right, left_node, context)
-    return False
-
-    
-def _remove_child_node(node, context, xast):
-    xpath = serialize(xast)
-    child = _find_xml_node(xpath, node, context)
-    if child is not None:
-        node.remove(child)
-        return True
-
-
-def _remove_attribute_node(node, context, xast):
-    node_name, node_xpath, nsmap = _get_attribute_name(xast, context)
-    del node.attrib[node_name]
-    return True
-
-
 def _get_attribute_name(step, context):
     # calculate attribute name, xpath, and nsmap based on node info and context namespaces
     if not step.node_test.prefix:
@@ -444,45 +815,43 @@ class SingleNodeManager(object):
         # described in XmlObjectType.__new__ comments and used by NodeField.
         self.instantiate_on_get = instantiate_on_get
 
-    def get(self, xpath, node, context, mapper, xast):
+    def get(self, xpath, node, context, mapper, plan):
         match = _find_xml_node(xpath, node, context)
         if match is None and self.instantiate_on_get:
-            return mapper.to_python(_create_xml_node(xast, node, context))
+            return mapper.to_python(plan.create(node, context))
         # else, non-None match, or not instantiate
         return mapper.to_python(match)
 
-    def set(self, xpath, xast, node, context, mapper, value):
+    def set(self, xpath, plan, node, context, mapper, value):
         xvalue = mapper.to_xml(value)
         match = _find_xml_node(xpath, node, context)
 
         if xvalue is None:
             # match must be None. if it exists, delete it.
             if match is not None:
-                removed = _remove_xml(xast, node, context)
+                removed = plan.remove(node, context)
                 # if a node can't be removed, warn since it could have unexpected results
                 if not removed:
                     logger.warn('''Could not remove xml for '%s' from %r''' % \
-                                (serialize(xast), node))
+                                (serialize(plan.xast), node))
         else:
             if match is None:
-                match = _create_xml_node(xast, node, context)
-            # terminal (rightmost) step informs how we update the xml
-            step = _find_terminal_step(xast)
-            _set_in_xml(match, xvalue, context, step)
+                match = plan.create(node, context)
+            plan.set_value(match, xvalue, context)
 
-    def create(self, xpath, xast, node, context):
+    def create(self, xpath, plan, node, context):
         # most clients will want to use get() or set(), but occasially we
         # just want a basic node to match the xpath.
         match = _find_xml_node(xpath, node, context)
         if match is not None:
             return match
-        return _create_xml_node(xast, node, context)
+        return plan.create(node, context)
 
-    def delete(self, xpath, xast, node, context, mapper):
+    def delete(self, xpath, plan, node, context, mapper):
         match = _find_xml_node(xpath, node, context)
         # match must be None. if it exists, delete it.
         if match is not None:
-            _remove_xml(xast, node, context)
+            plan.remove(node, context)
             
 
 class NodeList(object):
@@ -493,8 +862,12 @@ class NodeList(object):
     from a ListField.
 
     Supports common list functions and operators, including the following: len();
-    **in**; equal and not equal comparison to standard python Lists.  Items can
-    be retrieved, set, and deleted by index, but slice indexing is not supported.
+    **in**; equal and not equal comparison to standard python Lists.  Length and
+    truth value (or :meth:`exists`) are determined without converting any of the
+    list items.  Items can
+    be retrieved, set, and deleted by index.  Items can also be retrieved by
+    slice (or with :meth:`islice`), which only converts the requested items;
+    setting and deleting by slice is not supported.
     Supports the methods that Python documentation indicates should be provided
     by Mutable sequences, with the exceptions of reverse and sort; in the
     particular case of :class:`NodeListField`, it is unclear how a list of 
@@ -506,25 +879,78 @@ class NodeList(object):
     In the case of an empty list, the new content will be appended at the end of
     the appropriate XML parent node.  For XML content where element order is important
     for schema validity, extra care may be required when constructing content.
+
+    By default, every list operation retrieves the current matches from the XML,
+    so changes made to the document by any means are always reflected.  In
+    *snapshot* mode (see :attr:`~eulxml.xmlmap.XmlObject.SNAPSHOT_LISTS`), the
+    matches and converted values are cached until the XML is modified through
+    the :class:`NodeList` or the :class:`~eulxml.xmlmap.XmlObject` it belongs
+    to; changes made by other means will not be seen until :meth:`refresh`
+    is called.
     """
-    def __init__(self, xpath, node, context, mapper, xast):
+    def __init__(self, xpath, node, context, mapper, plan, snapshot=False):
         self.xpath = xpath
         self.node = node
         self.context = context
         self.mapper = mapper
-        self.xast = xast
+        self.plan = plan
+        self.snapshot = snapshot
+        # XmlObject this list was accessed from, if any; notified of changes
+        self.owner = None
+        # snapshot data: matches, converted values by index, and the owner
+        # generation they were retrieved for
+        self._matches = None
+        self._values = {}
+        self._generation = None
 
     @property
     def matches(self):
         # current matches from the xml tree
-        # NOTE: retrieving from the xml every time rather than caching
-        # because the xml document could change, and we want the latest data
-        return self.node.xpath(self.xpath, **self.context)
+        if not self.snapshot:
+            # NOTE: retrieving from the xml every time rather than caching
+            # because the xml document could change, and we want the latest data
+            return _evaluate_xpath(self.xpath, self.node, self.context)
+
+        generation = getattr(self.owner, '_generation', None)
+        if self._matches is None or self._generation != generation:
+            self._matches = _evaluate_xpath(self.xpath, self.node, self.context)
+            self._values = {}
+            self._generation = generation
+        return self._matches
+
+    def _to_python(self, matches, index):
+        # convert the match at the specified index, using the snapshot
+        # values when in snapshot mode
+        if not self.snapshot:
+            return self.mapper.to_python(matches[index])
+        if index < 0:
+            index += len(matches)
+        try:
+            return self._values[index]
+        except KeyError:
+            value = self.mapper.to_python(matches[index])
+            self._values[index] = value
+            return value
+
+    def _changed(self):
+        # the xml was modified through this list; discard any snapshot data
+        # and let the owning XmlObject know
+        self._matches = None
+        self._values = {}
+        if self.owner is not None:
+            self.owner._changed()
+
+    def refresh(self):
+        """Discard any snapshot data, so that the next list operation
+        retrieves the current matches from the XML."""
+        self._matches = None
+        self._values = {}
 
     @property
     def data(self):
         # data in list form - basis for several other list-y functions
-        return [ self.mapper.to_python(match) for match in self.matches ]
+        matches = self.matches
+        return [ self._to_python(matches, i) for i in xrange(len(matches)) ]
 
     def __str__(self):
         return str(self.data)
@@ -532,15 +958,48 @@ class NodeList(object):
     def __repr__(self):
         return str(self.data)
 
+    def _evaluate_function(self, function):
+        # evaluate an xpath function (e.g., count or boolean) on the list
+        # xpath, without retrieving or converting the matches themselves
+        xpath = '%s(%s)' % (function, getattr(self.xpath, 'path', self.xpath))
+        return _evaluate_xpath(xpath, self.node, self.context)
+
     def __len__(self):
-        return len(self.data)
+        if self.snapshot:
+            return len(self.matches)
+        try:
+            return int(self._evaluate_function('count'))
+        except etree.XPathEvalError:
+            # xpath does not select nodes; count the results instead
+            return len(self.matches)
+
+    def exists(self):
+        """Check if there are any items in the list, without retrieving
+        or converting any of them.
+
+        :rtype: boolean
+        """
+        if self.snapshot:
+            return bool(self.matches)
+        try:
+            return self._evaluate_function('boolean')
+        except etree.XPathEvalError:
+            # xpath does not select nodes; check the results instead
+            return bool(self.matches)
+
+    __nonzero__ = exists
 
     def __contains__(self, item):
-        return item in self.data
+        # convert and compare items one at a time, stopping at the first match
+        for value in self:
+            if item == value:
+                return True
+        return False
 
     def __iter__(self):
-        for item in self.matches:
-            yield self.mapper.to_python(item)
+        matches = self.matches
+        for i in xrange(len(matches)):
+            yield self._to_python(matches, i)
 
     def __eq__(self, other):
         # FIXME: is any other comparison possible ?
@@ -556,37 +1015,135 @@ class NodeList(object):
         assert not isinstance(key, slice), "Slice indexing is not supported"
 
     def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self._slice(key))
         self._check_key_type(key)
-        return self.mapper.to_python(self.matches[key])
+        return self._to_python(self.matches, key)
+
+    def _slice(self, key):
+        # generate converted values for the items in a slice, without
+        # converting (or, where possible, retrieving) any other items
+        start, stop, step = key.indices(len(self))
+        if step == 1 and not self.snapshot:
+            if stop <= start:
+                return
+            # retrieve only the requested window with a positional xpath
+            xpath = '(%s)[position() > $nodelist_start and position() <= $nodelist_stop]' \
+                    % getattr(self.xpath, 'path', self.xpath)
+            try:
+                matches = _evaluate_xpath(xpath, self.node, self.context,
+                                          nodelist_start=start, nodelist_stop=stop)
+            except etree.XPathEvalError:
+                # xpath does not select nodes; use the full list of results
+                pass
+            else:
+                for match in matches:
+                    yield self.mapper.to_python(match)
+                return
+
+        matches = self.matches
+        for i in xrange(start, stop, step):
+            yield self._to_python(matches, i)
+
+    def islice(self, start, stop=None):
+        """Iterate over the items from index ``start`` up to (but not
+        including) index ``stop``, or through the end of the list if ``stop``
+        is not specified.  As with slice indexing, only the requested items
+        are converted, which makes this suitable for paging through long
+        lists."""
+        return self._slice(slice(start, stop))
 
     def __setitem__(self, key, value):
         self._check_key_type(key)
-        if key == len(self.matches):
-            # just after the end of the list - create a new node            
-            if len(self.matches):
-                # if there are existing nodes, use last element in list
-                # to determine where the new node should be created
-                last_item = self.matches[-1]
-                position = last_item.getparent().index(last_item)
-                insert_index = position + 1
-            else:
-                insert_index = None
-            match = _create_xml_node(self.xast, self.node, self.context, insert_index)
-        elif key > len(self.matches):
+        matches = self.matches
+        if key == len(matches):
+            # just after the end of the list - create a new node
+            self._append(matches, [value])
+        elif key > len(matches):
             raise IndexError("Can't set at index %d - out of range" % key )
         else:
-            match = self.matches[key]
+            self._set_match(matches[key], value)
+        self._changed()
 
+    def _set_match(self, match, value):
+        # set the value of a single matched node; returns the node that is
+        # now in the list
         if isinstance(self.mapper, NodeMapper):
             # if this is a NodeListField, the value should be an xmlobject
             # replace the indexed node with the node specified
             # NOTE: lxml does not require dom-style import before append/replace
-            match.getparent().replace(match, value.node)
+            if value.node is not match:
+                match.getparent().replace(match, value.node)
+            return value.node
         else:       # not a NodeListField - set single-node value in xml
-            # terminal (rightmost) step informs how we update the xml
-            step = _find_terminal_step(self.xast)
-            _set_in_xml(match, self.mapper.to_xml(value), self.context, step)
-        
+            self.plan.set_value(match, self.mapper.to_xml(value), self.context)
+            return match
+
+    def _sibling_parent(self, node):
+        # parent of an existing list node, if new list nodes can be created
+        # directly as its siblings (i.e., the list xpath ends in a simple
+        # child step); otherwise None
+        step = self.plan.terminal
+        if isinstance(node, etree._Element) and step is not None and \
+                step.kind == 'child':
+            return node.getparent()
+
+    def _insert_siblings(self, parent, insert_index, values):
+        # create new list nodes for values as children of parent, starting
+        # at the specified index; after the first, each new node is added
+        # directly after the one before it
+        step = self.plan.terminal
+        previous = None
+        for value in values:
+            if isinstance(self.mapper, NodeMapper):
+                new_node = value.node
+                if previous is None:
+                    parent.insert(insert_index, new_node)
+                else:
+                    previous.addnext(new_node)
+            else:
+                new_node = step.create(parent, self.context, insert_index,
+                                       previous)
+                self._set_match(new_node, value)
+            previous = new_node
+
+    def _append(self, matches, values):
+        # add new items to the xml after the last of the current matches.
+        # the insertion point is only determined once, and new nodes are
+        # created as siblings of the last match in a single pass
+        values = iter(values)
+        if matches:
+            last = matches[-1]
+        else:
+            # empty list: create the first node wherever the xpath requires
+            for value in values:
+                last = self._set_match(self.plan.create(self.node, self.context),
+                                       value)
+                break
+            else:
+                return
+
+        parent = self._sibling_parent(last)
+        if parent is None:
+            # new nodes can't be added as siblings; create each one from the xpath
+            for value in values:
+                self._set_match(self.plan.create(self.node, self.context), value)
+            return
+        self._insert_siblings(parent, parent.index(last) + 1, values)
+
+    def _same(self, match, value):
+        # check if a list node already holds the specified value, so that
+        # it does not need to be updated
+        if isinstance(self.mapper, NodeMapper):
+            return getattr(value, 'node', None) is match
+        if value is None:
+            return False
+        try:
+            return self.mapper.to_python(match) == value
+        except Exception:
+            # current content can't be converted; it will be overwritten
+            return False
+
     def __delitem__(self, key):
         self._check_key_type(key)
         if key >= len(self.matches):
@@ -594,6 +1151,7 @@ class NodeList(object):
         
         match = self.matches[key]
         match.getparent().remove(match)
+        self._changed()
 
 
 # according to python docs, Mutable sequences should provide the following methods:
@@ -602,16 +1160,20 @@ class NodeList(object):
 
     def count(self, x):
         "Return the number of times x appears in the list."
-        return self.data.count(x)
+        return sum(1 for value in self if value == x)
 
     def append(self, x):
         "Add an item to the end of the list."
-        self[len(self)] = x
+        self.extend([x])
 
     def index(self, x):
         """Return the index in the list of the first item whose value is x,
         or error if there is no such item."""
-        return self.data.index(x)
+        # convert and compare items one at a time, stopping at the first match
+        for i, value in enumerate(self):
+            if value == x:
+                return i
+        raise ValueError('%r is not in list' % (x,))
 
     def remove(self, x):
         """Remove the first item from the list whose value is x,
@@ -628,9 +1190,90 @@ class NodeList(object):
         return val
 
     def extend(self, list):
-        """Extend the list by appending all the items in the given list."""
-        for item in list:
-            self.append(item)
+        """Extend the list by appending all the items in the given list.  New
+        nodes are created in a single pass, immediately after the last item
+        currently in the list."""
+        self._append(self.matches, list)
+        self._changed()
+
+    def replace_all(self, values):
+        """Replace the contents of the list with the items in the given list.
+
+        Only the nodes that need to change are modified: items at the start
+        and end of the list that already hold the new values are left
+        untouched, remaining nodes are updated in place, surplus nodes are
+        removed in a single sweep, and any additional items are added in a
+        single pass as in :meth:`extend`.  For a list of xmlobjects, if
+        any of the new items are already in the list (e.g., when reordering
+        it), the changed part of the list is rebuilt instead, so that nodes
+        moved to a new position are not lost.  Deleting a list field is
+        equivalent to replacing it with an empty list.
+        """
+        values = list(values)
+        matches = self.matches
+        # skip unchanged items at the start and end of the list
+        start = 0
+        limit = min(len(matches), len(values))
+        while start < limit and self._same(matches[start], values[start]):
+            start += 1
+        end = 0
+        limit -= start
+        while end < limit and self._same(matches[-1 - end], values[-1 - end]):
+            end += 1
+        if end and len(values) > len(matches) and \
+                self._sibling_parent(matches[-end]) is None:
+            # new nodes can only be added at the end of the list
+            end = 0
+
+        old = matches[start:len(matches) - end]
+        new = values[start:len(values) - end]
+        common = min(len(old), len(new))
+        if self._moves_matches(old, new):
+            current = self._move_matches(old, new[:common])
+        else:
+            current = [old[i] if self._same(old[i], new[i])
+                       else self._set_match(old[i], new[i])
+                       for i in xrange(common)]
+            # remove surplus nodes in one sweep
+            for match in old[common:]:
+                match.getparent().remove(match)
+        if len(new) > common:
+            if end:
+                # add the new nodes just before the unchanged end of the list
+                anchor = matches[-end]
+                parent = anchor.getparent()
+                self._insert_siblings(parent, parent.index(anchor), new[common:])
+            else:
+                self._append(matches[:start] + current, new[common:])
+        self._changed()
+
+    def _moves_matches(self, old, values):
+        # check if any of the new values for a list of xmlobjects is one of
+        # the current matches (e.g., when the list is reordered)
+        if not isinstance(self.mapper, NodeMapper) or not old:
+            return False
+        old = set(old)
+        return any(getattr(value, 'node', None) in old for value in values)
+
+    def _move_matches(self, old, values):
+        # replace the old matches with the nodes of the xmlobjects in values,
+        # some of which are old matches at other positions.  replacing one
+        # node with another that is already in the document moves it, so
+        # every old match is taken out of the document before any node is
+        # put in its new place; text following each position (e.g.,
+        # indentation) stays where it is.  returns the nodes now in the list
+        placeholders = []
+        for match in old[:len(values)]:
+            placeholder = etree.Comment()
+            placeholder.tail = match.tail
+            match.getparent().replace(match, placeholder)
+            placeholders.append(placeholder)
+        for match in old[len(values):]:
+            match.getparent().remove(match)
+        for placeholder, value in zip(placeholders, values):
+            placeholder.getparent().replace(placeholder, value.node)
+            value.node.tail = placeholder.tail
+        return [value.node for value in values]
 
     def insert(self, i, x):
         """Insert an item (x) at a given position (i)."""
@@ -639,7 +1282,8 @@ class NodeList(object):
         elif len(self.matches) > i:
             # create a new xml node at the requested position
             insert_index = self.matches[i].getparent().index(self.matches[i])                        
-            _create_xml_node(self.xast, self.node, self.context, insert_index)
+            self.plan.create(self.node, self.context, insert_index)
+            self._changed()
             # then use default set logic
             self[i] = x
         else:
@@ -648,25 +1292,17 @@ class NodeList(object):
 
 
 class NodeListManager(object):
-    def get(self, xpath, node, context, mapper, xast):
-        return NodeList(xpath, node, context, mapper, xast)
+    def get(self, xpath, node, context, mapper, plan):
+        return NodeList(xpath, node, context, mapper, plan)
 
-    def delete(self, xpath, xast, node, context, mapper):
-        current_list = self.get(xpath, node, context, mapper, xast)
-        [current_list.remove(x) for x in current_list]
+    def delete(self, xpath, plan, node, context, mapper):
+        current_list = self.get(xpath, node, context, mapper, plan)
+        current_list.replace_all([])
         
-    def set(self, xpath, xast, node, context, mapper, value):
-        current_list = self.get(xpath, node, context, mapper, xast)
-        # for each value in the new list, set the equivalent value
-        # in the NodeList
-        for i in range(len(value)):
-            current_list[i] = value[i]
-
-        # remove any extra values from end of the current list
-        while len(current_list) > len(value):
-            current_list.pop()
+    def set(self, xpath, plan, node, context, mapper, value):
+        current_list = self.get(xpath, node, context, mapper, plan)
+        current_list.replace_all(value)
 
-        
 
 
 # finished field classes mixing a manager and a mapper
@@ -835,7 +1471,8 @@ class NodeField(Field):
     node_class = property(_get_node_class, _set_node_class)
 
     def create_for_node(self, node, context):
-        return self.manager.create(self.xpath, self.parsed_xpath, node, context)
+        return self.manager.create(self.compiled_xpath(context), self._creation_plan,
+                                   node, context)
 
 
 class NodeListField(Field):
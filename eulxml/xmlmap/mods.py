@@ -188,7 +188,6 @@ class MetadataObjectDescriptionSchema(_BaseMODS):
     ROOT_NAME = 'mods'
 
     XSD_SCHEMA = "http://www.loc.gov/standards/mods/mods.xsd"
-    xmlschema = xmlmap.loadSchema(XSD_SCHEMA)
 
     elements = xmlmap.NodeListField('mods:*', MODSElement)
     'list of all MODS elements as instances of :class:`MODSElement`'
@@ -56,6 +56,7 @@ class TeiEpigraph(_TeiBase):
 
 
 class TeiDiv(_TeiBase):
+    CACHE_TEXT = True
     id       = xmlmap.StringField('@xml:id')
     type     = xmlmap.StringField('@type')
     author   = xmlmap.StringField('tei:docAuthor/tei:name/tei:choice/tei:sic')
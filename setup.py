@@ -50,12 +50,17 @@ setup(
     ],
     install_requires=[
         'ply',
-        'lxml',
+        'lxml>=3.5',
     ],
     extras_require={
         'django': ['Django'],
         'rdf': ['rdflib>=3.0'],
     },
+    entry_points={
+        'console_scripts': [
+            'eulxml-validate = eulxml.xmlmap.batch:main',
+        ],
+    },
 
     description='XPath-based XML data binding, with Django form support',
     long_description=LONG_DESCRIPTION,
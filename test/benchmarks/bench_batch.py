@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_batch.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare loading and validating a batch of files one at a time, with
+:func:`~eulxml.xmlmap.load_xmlobject_from_file` and
+:meth:`~eulxml.xmlmap.XmlObject.is_valid`, with
+:func:`eulxml.xmlmap.batch.validate_files` and a pool of worker processes.
+Uses a local schema, so the benchmark does not need a network connection.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_batch.py [number of files]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from eulxml import xmlmap
+from eulxml.xmlmap.batch import validate_files
+
+FILES = 5000
+
+XSD = '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+    <xsd:element name="record">
+        <xsd:complexType>
+            <xsd:sequence>
+                <xsd:element name="title" type="xsd:string"/>
+                <xsd:element name="name" type="xsd:string" maxOccurs="unbounded"/>
+                <xsd:element name="date" type="xsd:gYear"/>
+                <xsd:element name="subject" type="xsd:string" minOccurs="0" maxOccurs="unbounded"/>
+            </xsd:sequence>
+            <xsd:attribute name="id" type="xsd:ID" use="required"/>
+        </xsd:complexType>
+    </xsd:element>
+</xsd:schema>
+'''
+
+RECORD = '''<record id="r%d">
+  <title>Record %d</title>
+  <name>Heaney, Seamus</name>
+  <name>Longley, Michael</name>
+  <date>%s</date>
+%s</record>
+'''
+
+
+class Record(xmlmap.XmlObject):
+    XSD_SCHEMA = None   # set in main
+    title = xmlmap.StringField('title')
+
+
+def write_files(directory, count):
+    paths = []
+    for i in xrange(count):
+        path = os.path.join(directory, 'record%05d.xml' % i)
+        # every tenth record has an invalid date
+        date = '1966' if i % 10 else 'unknown'
+        subjects = ''.join('  <subject>subject %d</subject>\n' % j
+                           for j in xrange(50))
+        with open(path, 'w') as out:
+            out.write(RECORD % (i, i, date, subjects))
+        paths.append(path)
+    return paths
+
+
+def one_at_a_time(paths):
+    invalid = 0
+    for path in paths:
+        obj = xmlmap.load_xmlobject_from_file(path, Record)
+        if not obj.is_valid():
+            invalid += 1
+    return invalid
+
+
+def pooled(paths):
+    return sum(1 for result in validate_files(paths, Record) if not result.valid)
+
+
+def timed(func, paths):
+    start = time.time()
+    invalid = func(paths)
+    return time.time() - start, invalid
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else FILES
+    directory = tempfile.mkdtemp()
+    try:
+        Record.XSD_SCHEMA = os.path.join(directory, 'record.xsd')
+        with open(Record.XSD_SCHEMA, 'w') as out:
+            out.write(XSD)
+        paths = write_files(directory, count)
+
+        print '%d files, %d CPUs' % (count, multiprocessing.cpu_count())
+        serial, serial_invalid = timed(one_at_a_time, paths)
+        parallel, parallel_invalid = timed(pooled, paths)
+        print '  one at a time   %8.3fs  (%d invalid)' % (serial, serial_invalid)
+        print '  validate_files  %8.3fs  (%d invalid)' % (parallel, parallel_invalid)
+        print 'speedup: %.2fx' % (serial / parallel)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_caching_resolver.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare compiling a schema that imports and includes other remote
+schemas (like EAD, which pulls in xlink and xml.xsd) with the plain
+:class:`~eulxml.xmlmap.core.Urllib2Resolver`, which fetches every document
+each time, with the :class:`~eulxml.xmlmap.CachingResolver`.  Network
+access is simulated with a fixed delay per request, so the benchmark does
+not need a connection.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_caching_resolver.py
+"""
+
+from cStringIO import StringIO
+import shutil
+import tempfile
+import time
+import urllib2
+
+from lxml import etree
+
+from eulxml.xmlmap.core import CachingResolver, Urllib2Resolver
+
+ROUNDS = 20
+LATENCY = 0.02  # seconds per simulated request
+
+SCHEMAS = {
+    'http://example.invalid/ead.xsd': '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+            xmlns:xlink="http://www.w3.org/1999/xlink">
+        <xsd:import namespace="http://www.w3.org/1999/xlink"
+            schemaLocation="http://example.invalid/xlink.xsd"/>
+        <xsd:element name="ead">
+            <xsd:complexType><xsd:attribute ref="xlink:href"/></xsd:complexType>
+        </xsd:element>
+    </xsd:schema>''',
+    'http://example.invalid/xlink.xsd': '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+            targetNamespace="http://www.w3.org/1999/xlink">
+        <xsd:import namespace="http://www.w3.org/XML/1998/namespace"
+            schemaLocation="http://example.invalid/xml.xsd"/>
+        <xsd:attribute name="href" type="xsd:anyURI"/>
+    </xsd:schema>''',
+    'http://example.invalid/xml.xsd': '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+            targetNamespace="http://www.w3.org/XML/1998/namespace">
+        <xsd:attribute name="lang" type="xsd:language"/>
+    </xsd:schema>''',
+}
+
+requests = []
+
+
+def urlopen(url):
+    requests.append(url)
+    time.sleep(LATENCY)
+    return StringIO(SCHEMAS[url])
+
+
+def load_schemas(resolver):
+    for i in xrange(ROUNDS):
+        parser = etree.XMLParser()
+        parser.resolvers.add(resolver)
+        etree.XMLSchema(etree.parse('http://example.invalid/ead.xsd', parser))
+
+
+def timed(resolver):
+    del requests[:]
+    start = time.time()
+    load_schemas(resolver)
+    return time.time() - start, len(requests)
+
+
+def main():
+    urllib2.urlopen = urlopen
+    cache_dir = tempfile.mkdtemp()
+    try:
+        print '%d schema loads, %d documents each, %.0fms per request' % \
+            (ROUNDS, len(SCHEMAS), LATENCY * 1000)
+        plain, plain_requests = timed(Urllib2Resolver())
+        caching = CachingResolver(cache_dir=cache_dir)
+        cached, cached_requests = timed(caching)
+        offline = CachingResolver(cache_dir=cache_dir, offline=True)
+        warm, warm_requests = timed(offline)
+        print '  Urllib2Resolver          %8.3fs  %3d requests' % (plain, plain_requests)
+        print '  CachingResolver          %8.3fs  %3d requests  (%d hits)' % \
+            (cached, cached_requests, caching.hits)
+        print '  offline, from disk cache %8.3fs  %3d requests  (%d hits)' % \
+            (warm, warm_requests, offline.hits)
+        print 'speedup: %.2fx' % (plain / cached)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_creation_plan.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare populating fresh MODS records through field setters using the
+node-creation plan compiled once per field with re-building the plan from
+the parsed xpath on every set, as setters did before plans were cached.
+Fields include multi-step paths, attributes, and predicates, so every set
+has to create the missing xml.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_creation_plan.py
+"""
+
+import time
+
+from eulxml import xmlmap
+from eulxml.xmlmap.fields import _CreationPlan
+
+MODS_NAMESPACE = 'http://www.loc.gov/standards/mods/v3/'
+RECORDS = 5000
+
+
+class Record(xmlmap.XmlObject):
+    ROOT_NAME = 'mods'
+    ROOT_NS = MODS_NAMESPACE
+    ROOT_NAMESPACES = {'mods': MODS_NAMESPACE}
+
+    title = xmlmap.StringField('mods:titleInfo/mods:title')
+    subtitle = xmlmap.StringField('mods:titleInfo/mods:subTitle')
+    author = xmlmap.StringField('mods:name[@type="personal"]/mods:namePart')
+    role = xmlmap.StringField('mods:name[@type="personal"]/mods:role/mods:roleTerm[@type="text"]')
+    date = xmlmap.StringField('mods:originInfo/mods:dateIssued')
+    keydate = xmlmap.StringField('mods:originInfo/mods:dateIssued/@keyDate')
+    publisher = xmlmap.StringField('mods:originInfo/mods:publisher')
+    extent = xmlmap.StringField('mods:physicalDescription/mods:extent')
+    genre = xmlmap.StringField('mods:genre[@authority="aat"]')
+    note = xmlmap.StringField('mods:note[@type="thesis"]')
+    uri = xmlmap.StringField('mods:identifier[@type="uri"]')
+
+VALUES = [
+    ('title', 'Collected Poems'),
+    ('subtitle', 'Selected and Revised'),
+    ('author', 'Heaney, Seamus'),
+    ('role', 'author'),
+    ('date', '1966'),
+    ('keydate', 'yes'),
+    ('publisher', 'Faber'),
+    ('extent', '320 p.'),
+    ('genre', 'poetry'),
+    ('note', 'Thesis (Ph.D.)'),
+    ('uri', 'http://example.com/record/1'),
+]
+
+
+def set_planned():
+    for i in xrange(RECORDS):
+        record = Record()
+        for name, value in VALUES:
+            setattr(record, name, value)
+
+
+def set_unplanned():
+    fields = [(Record._fields[name], name, value) for name, value in VALUES]
+    for i in xrange(RECORDS):
+        record = Record()
+        for field, name, value in fields:
+            field._creation_plan = _CreationPlan(field.parsed_xpath)
+            setattr(record, name, value)
+
+
+def timed(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+def main():
+    unplanned = timed(set_unplanned)
+    planned = timed(set_planned)
+    sets = RECORDS * len(VALUES)
+    print '%d records, %d field sets' % (RECORDS, sets)
+    print '  re-parsed plan %8.3fs  (%.1fus/set)' % (unplanned, unplanned / sets * 1e6)
+    print '  compiled plan  %8.3fs  (%.1fus/set)' % (planned, planned / sets * 1e6)
+    print 'speedup: %.2fx' % (unplanned / planned)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_element_factory.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare creating 100,000 ``dc:subject`` elements with a new
+:class:`lxml.builder.ElementMaker` per element, as field setters used to,
+with the cached element name and namespace map now used for node creation,
+and with raw :func:`lxml.etree.SubElement`.  Also times adding the same
+number of subjects to a :class:`~eulxml.xmlmap.dc.DublinCore` object.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_element_factory.py
+"""
+
+import time
+
+from lxml import etree
+from lxml.builder import ElementMaker
+
+from eulxml.xpath import parse
+from eulxml.xmlmap.dc import DublinCore
+from eulxml.xmlmap.fields import XPathContext, _CreationStep
+
+ELEMENTS = 100000
+NAMESPACES = DublinCore.ROOT_NAMESPACES
+CONTEXT = XPathContext({'namespaces': NAMESPACES})
+
+
+def new_root():
+    return etree.Element('{%s}dc' % NAMESPACES['oai_dc'], nsmap=NAMESPACES)
+
+
+def element_maker():
+    root = new_root()
+    step = parse('dc:subject')
+    for i in xrange(ELEMENTS):
+        E = ElementMaker(namespace=CONTEXT['namespaces'][step.node_test.prefix],
+                         nsmap=CONTEXT['namespaces'])
+        root.append(E(step.node_test.name))
+    return root
+
+
+def cached_step():
+    root = new_root()
+    step = _CreationStep(parse('dc:subject'))
+    for i in xrange(ELEMENTS):
+        step.create(root, CONTEXT)
+    return root
+
+
+def subelement():
+    root = new_root()
+    tag = '{%s}subject' % NAMESPACES['dc']
+    for i in xrange(ELEMENTS):
+        etree.SubElement(root, tag)
+    return root
+
+
+def dublin_core():
+    dc = DublinCore()
+    dc.subject_list.extend(['subject'] * ELEMENTS)
+    return dc.node
+
+
+def timed(func):
+    start = time.time()
+    node = func()
+    return time.time() - start, etree.tostring(node[0])
+
+
+def main():
+    print '%d dc:subject elements' % ELEMENTS
+    results = []
+    for label, func in [('ElementMaker', element_maker),
+                        ('cached step', cached_step),
+                        ('SubElement', subelement),
+                        ('DublinCore', dublin_core)]:
+        elapsed, xml = timed(func)
+        results.append(elapsed)
+        print '  %-13s %8.3fs  %s' % (label, elapsed, xml)
+    print 'speedup: %.2fx' % (results[0] / results[1])
+
+
+if __name__ == '__main__':
+    main()
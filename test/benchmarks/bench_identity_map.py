@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_identity_map.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare the time taken and the number of
+:class:`~eulxml.xmlmap.XmlObject` instances created when simulating the
+rendering of an EAD finding aid (the test fixture), where a template
+navigates to the same elements many times (e.g., ``ead.archdesc.did``),
+with and without :attr:`~eulxml.xmlmap.XmlObject.IDENTITY_MAP`.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_identity_map.py
+"""
+
+import os
+import time
+
+from eulxml import xmlmap
+from eulxml.xmlmap.eadmap import EncodedArchivalDescription
+
+RENDERS = 200
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                       'test_xmlmap', 'fixtures', 'heaney653.xml')
+
+created = [0]
+_init = xmlmap.XmlObject.__init__
+
+
+def counting_init(self, *args, **kwargs):
+    created[0] += 1
+    _init(self, *args, **kwargs)
+
+
+def render(ead):
+    # roughly what a finding aid template does: the same paths are
+    # navigated repeatedly for headings, tables of contents, and content
+    output = []
+    for i in xrange(10):
+        output.append(unicode(ead.archdesc.did.unittitle))
+        output.append(unicode(ead.archdesc.did.unitid))
+        output.append(ead.archdesc.did.abstract)
+    for section in ['biography_history', 'scope_content', 'arrangement',
+                    'access_restriction', 'use_restriction']:
+        for i in xrange(3):
+            output.append(getattr(ead.archdesc, section).head)
+    for i in xrange(2):
+        for series in ead.dsc.c:
+            output.append(unicode(series.did.unittitle))
+            output.append(unicode(series.did.unitid))
+            for component in series.c:
+                output.append(unicode(component.did.unittitle))
+                for container in component.did.container:
+                    output.append(container.value)
+    return output
+
+
+def timed(ead_class):
+    created[0] = 0
+    start = time.time()
+    for i in xrange(RENDERS):
+        ead = xmlmap.load_xmlobject_from_file(FIXTURE, ead_class)
+        render(ead)
+    return time.time() - start, created[0] / RENDERS
+
+
+class MappedEad(EncodedArchivalDescription):
+    IDENTITY_MAP = True
+
+
+def main():
+    xmlmap.XmlObject.__init__ = counting_init
+    assert render(xmlmap.load_xmlobject_from_file(FIXTURE, EncodedArchivalDescription)) \
+        == render(xmlmap.load_xmlobject_from_file(FIXTURE, MappedEad))
+
+    print '%d renders of %s' % (RENDERS, os.path.basename(FIXTURE))
+    plain, plain_created = timed(EncodedArchivalDescription)
+    mapped, mapped_created = timed(MappedEad)
+    print '  new objects          %8.3fs  %5d objects created per render' % \
+        (plain, plain_created)
+    print '  IDENTITY_MAP         %8.3fs  %5d objects created per render' % \
+        (mapped, mapped_created)
+    print 'speedup: %.2fx' % (plain / mapped)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_import_time.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Time importing the xmlmap modules that define XSD schemas (eadmap, cerp,
+dc, and mods) in a fresh interpreter.  These modules used to load their
+schemas from the network at import time; schemas are now loaded on first
+use.  If the ``HTTP_PROXY`` environment variable is set, also times loading
+each schema, which is what importing the module used to cost.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_import_time.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROUNDS = 5
+MODULES = ['eadmap', 'cerp', 'dc', 'mods']
+
+IMPORT = '''
+import time
+start = time.time()
+import eulxml.xmlmap.%s as module
+elapsed = time.time() - start
+# the schema should not have been loaded by importing the module
+from eulxml.xmlmap import schema_registry
+assert not schema_registry._schemas and not schema_registry._failures
+print elapsed
+'''
+
+
+def import_time(module):
+    # fastest of several imports, each in a new interpreter
+    times = []
+    for i in xrange(ROUNDS):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT % module])
+        times.append(float(output))
+    return min(times)
+
+
+def schema_time(module):
+    from eulxml.xmlmap import loadSchema
+    __import__('eulxml.xmlmap.%s' % module)
+    xmlmodule = sys.modules['eulxml.xmlmap.%s' % module]
+    schemas = set(getattr(xmlmodule, name).XSD_SCHEMA for name in dir(xmlmodule)
+                  if getattr(getattr(xmlmodule, name), 'XSD_SCHEMA', None))
+    start = time.time()
+    for uri in schemas:
+        loadSchema(uri)
+    return time.time() - start
+
+
+def main():
+    print 'import time, fastest of %d fresh interpreters' % ROUNDS
+    for module in MODULES:
+        line = '  eulxml.xmlmap.%-7s %8.1fms' % (module, import_time(module) * 1000)
+        if 'HTTP_PROXY' in os.environ:
+            line += '   (schema load %8.1fms)' % (schema_time(module) * 1000)
+        print line
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_iter_xmlobjects.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare peak memory use and time for reading every record in a large
+``modsCollection`` file with :func:`~eulxml.xmlmap.load_xmlobject_from_file`
+(which builds the whole tree) and with the streaming
+:func:`~eulxml.xmlmap.iter_xmlobjects`.  Each approach runs in a separate
+process so that peak memory can be measured independently.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_iter_xmlobjects.py [number of records]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from eulxml import xmlmap
+
+RECORDS = 200000
+MODS_NS = 'http://www.loc.gov/standards/mods/v3/'
+
+RECORD = '''  <mods:mods>
+    <mods:titleInfo><mods:title>Record %d</mods:title></mods:titleInfo>
+    <mods:name type="personal"><mods:namePart>Heaney, Seamus</mods:namePart></mods:name>
+    <mods:originInfo><mods:dateIssued>1966</mods:dateIssued></mods:originInfo>
+    <mods:genre authority="marcgt">thesis</mods:genre>
+  </mods:mods>
+'''
+
+
+class Mods(xmlmap.XmlObject):
+    ROOT_NAME = 'mods'
+    ROOT_NS = MODS_NS
+    ROOT_NAMESPACES = {'mods': MODS_NS}
+    title = xmlmap.StringField('mods:titleInfo/mods:title')
+
+
+class ModsCollection(xmlmap.XmlObject):
+    ROOT_NAMESPACES = {'mods': MODS_NS}
+    records = xmlmap.NodeListField('mods:mods', Mods)
+
+
+def write_collection(filename, records):
+    with open(filename, 'w') as out:
+        out.write('<mods:modsCollection xmlns:mods="%s">\n' % MODS_NS)
+        for i in xrange(records):
+            out.write(RECORD % i)
+        out.write('</mods:modsCollection>\n')
+
+
+def load_tree(filename):
+    collection = xmlmap.load_xmlobject_from_file(filename, ModsCollection)
+    return sum(1 for record in collection.records if record.title)
+
+
+def iterate(filename):
+    return sum(1 for record in xmlmap.iter_xmlobjects(filename, xmlclass=Mods)
+               if record.title)
+
+
+def run(method, filename):
+    # run in this process and report count, time, and peak memory (KB)
+    start = time.time()
+    count = globals()[method](filename)
+    elapsed = time.time() - start
+    print count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(sys.argv[2], sys.argv[3])
+        return
+
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else RECORDS
+    handle, filename = tempfile.mkstemp(suffix='.xml')
+    os.close(handle)
+    try:
+        write_collection(filename, records)
+        print '%d records, %.1f MB' % (records, os.path.getsize(filename) / 1048576.0)
+        for label, method in [('load_xmlobject_from_file', 'load_tree'),
+                              ('iter_xmlobjects', 'iterate')]:
+            output = subprocess.check_output([sys.executable, __file__,
+                                              '--run', method, filename],
+                                             env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+            count, elapsed, maxrss = output.split()
+            print '  %-25s %8.3fs  peak memory %8.1f MB  (%s records)' % \
+                (label, float(elapsed), int(maxrss) / 1024.0, count)
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
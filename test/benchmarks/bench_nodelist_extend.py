@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_nodelist_extend.py
+# 
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare adding items to list fields one at a time with
+:meth:`NodeList.append` against a single batched :meth:`NodeList.extend`,
+for Dublin Core subjects and CERP folder messages, at increasing sizes to
+show how each approach scales.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_nodelist_extend.py
+"""
+
+import time
+
+from eulxml.xmlmap.cerp import Folder, Message
+from eulxml.xmlmap.dc import DublinCore
+
+SIZES = (500, 1000, 2000, 4000)
+
+
+def append_each(nodelist, values):
+    for value in values:
+        nodelist.append(value)
+
+
+def extend(nodelist, values):
+    nodelist.extend(values)
+
+
+def timed(func, nodelist, values):
+    start = time.time()
+    func(nodelist, values)
+    return time.time() - start
+
+
+def compare(label, make_list, make_values):
+    print label
+    print '%8s %12s %12s' % ('items', 'append', 'extend')
+    for size in SIZES:
+        appended = timed(append_each, make_list(), make_values(size))
+        extended = timed(extend, make_list(), make_values(size))
+        print '%8d %11.3fs %11.3fs' % (size, appended, extended)
+    print
+
+
+def main():
+    compare('dc:subject', lambda: DublinCore().subject_list,
+            lambda n: ['subject %d' % i for i in xrange(n)])
+    compare('xm:Message', lambda: Folder().messages,
+            lambda n: [Message() for i in xrange(n)])
+
+
+if __name__ == '__main__':
+    main()
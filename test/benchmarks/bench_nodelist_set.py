@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_nodelist_set.py
+# 
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Time setting and deleting a list field on a MODS subject at increasing
+list sizes, comparing the item-by-item approach previously used by
+:class:`~eulxml.xmlmap.fields.NodeListManager` with the current
+implementation.  Setting re-saves the list with a single value changed, as
+when a form-edited record is saved.  Time per item should stay roughly
+constant for the current implementation.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_nodelist_set.py
+"""
+
+import time
+
+from eulxml.xmlmap.mods import subject
+
+SIZES = (250, 500, 1000, 2000)
+
+
+def make_subject(size):
+    subj = subject()
+    subj.topics.extend(['topic %d' % i for i in xrange(size)])
+    return subj
+
+
+def itemwise_set(subj, values):
+    current = subj.topics
+    for i in xrange(len(values)):
+        current[i] = values[i]
+    while len(current) > len(values):
+        current.pop()
+
+
+def itemwise_delete(subj):
+    current = subj.topics
+    while len(current):
+        current.remove(current[0])
+
+
+def field_set(subj, values):
+    subj.topics = values
+
+
+def field_delete(subj):
+    del subj.topics
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main():
+    print '%8s %12s %12s %12s %12s' % ('items', 'old set', 'set',
+                                       'old delete', 'delete')
+    for size in SIZES:
+        values = ['topic %d' % i for i in xrange(size)]
+        values[size / 2] = 'changed'
+        print '%8d %11.3fs %11.3fs %11.3fs %11.3fs' % (size,
+            timed(itemwise_set, make_subject(size), values),
+            timed(field_set, make_subject(size), values),
+            timed(itemwise_delete, make_subject(size)),
+            timed(field_delete, make_subject(size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_nodelist_slice.py
+# 
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Time retrieving one page of messages from a large CERP folder, comparing
+converting the whole list (``list(nodelist)[a:b]``) with slicing the
+:class:`~eulxml.xmlmap.fields.NodeList` directly.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_nodelist_slice.py
+"""
+
+import time
+
+from eulxml.xmlmap.cerp import Folder, Message
+
+MESSAGES = 10000
+PAGE_SIZE = 25
+PAGE = 40
+REPEAT = 20
+
+
+def full_list(folder, start, stop):
+    return list(folder.messages)[start:stop]
+
+
+def sliced(folder, start, stop):
+    return folder.messages[start:stop]
+
+
+def timed(func, folder, start, stop):
+    begin = time.time()
+    for i in xrange(REPEAT):
+        page = func(folder, start, stop)
+    assert len(page) == PAGE_SIZE
+    return (time.time() - begin) / REPEAT
+
+
+def main():
+    folder = Folder()
+    messages = []
+    for i in xrange(MESSAGES):
+        message = Message()
+        message.local_id = i
+        messages.append(message)
+    folder.messages.extend(messages)
+
+    start = (PAGE - 1) * PAGE_SIZE
+    stop = start + PAGE_SIZE
+    print 'page %d of %d messages (%d per page)' % (PAGE, MESSAGES, PAGE_SIZE)
+    print '  list(nodelist)[a:b]  %.4fs' % timed(full_list, folder, start, stop)
+    print '  nodelist[a:b]        %.4fs' % timed(sliced, folder, start, stop)
+
+
+if __name__ == '__main__':
+    main()
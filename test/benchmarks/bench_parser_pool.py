@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_parser_pool.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare loading many small Dublin Core and MODS records with
+:func:`~eulxml.xmlmap.load_xmlobject_from_string` using a new parser for
+every record, as it used to, with the pooled parsers it now uses.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_parser_pool.py
+"""
+
+import time
+
+from lxml import etree
+
+from eulxml.xmlmap import load_xmlobject_from_string, parseString
+from eulxml.xmlmap.core import _get_xmlparser, default_resolver
+from eulxml.xmlmap.dc import DublinCore
+from eulxml.xmlmap.mods import MetadataObjectDescriptionSchema as MODS
+
+RECORDS = 20000
+
+DC = '''<oai_dc:dc xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/">
+  <dc:title>Record %d</dc:title>
+  <dc:creator>Heaney, Seamus</dc:creator>
+  <dc:subject>poetry</dc:subject>
+</oai_dc:dc>'''
+
+MODS_RECORD = '''<mods:mods xmlns:mods="http://www.loc.gov/standards/mods/v3/">
+  <mods:titleInfo><mods:title>Record %d</mods:title></mods:titleInfo>
+  <mods:genre authority="marcgt">thesis</mods:genre>
+</mods:mods>'''
+
+
+def new_parser(records):
+    for xml, xmlclass in records:
+        parser = _get_xmlparser(xmlclass=xmlclass, resolver=default_resolver)
+        xmlclass(etree.fromstring(xml, parser))
+
+
+def pooled(records):
+    for xml, xmlclass in records:
+        load_xmlobject_from_string(xml, xmlclass, resolver=default_resolver)
+
+
+def new_parser_strings(records):
+    for xml, xmlclass in records:
+        etree.fromstring(xml, _get_xmlparser())
+
+
+def pooled_strings(records):
+    for xml, xmlclass in records:
+        parseString(xml)
+
+
+def timed(func, records):
+    start = time.time()
+    func(records)
+    return time.time() - start
+
+
+def main():
+    records = []
+    for i in xrange(RECORDS / 2):
+        records.append((DC % i, DublinCore))
+        records.append((MODS_RECORD % i, MODS))
+
+    print '%d records' % len(records)
+    for label, old, new in [('load_xmlobject_from_string', new_parser, pooled),
+                            ('parseString', new_parser_strings, pooled_strings)]:
+        old_time = timed(old, records)
+        new_time = timed(new, records)
+        print '  %s' % label
+        print '    new parser  %8.3fs' % old_time
+        print '    pooled      %8.3fs' % new_time
+        print '    speedup: %.2fx' % (old_time / new_time)
+
+
+if __name__ == '__main__':
+    main()
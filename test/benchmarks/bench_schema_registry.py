@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_schema_registry.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare instantiating an :class:`~eulxml.xmlmap.XmlObject` with an
+``XSD_SCHEMA`` when the schema is loaded for every instance, as
+:class:`~eulxml.xmlmap.XmlObject` used to do, with loading it once through
+the shared :data:`~eulxml.xmlmap.schema_registry`.  Uses a small schema
+file on disk; a schema loaded over the network would cost far more per
+load.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_schema_registry.py
+"""
+
+import tempfile
+import time
+
+from eulxml import xmlmap
+
+INSTANCES = 2000
+XSD = '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+    <xsd:element name="a" type="AType"/>
+    <xsd:complexType name="AType">
+        <xsd:sequence>
+            <xsd:element name="b" type="xsd:string" />
+        </xsd:sequence>
+    </xsd:complexType>
+</xsd:schema>
+'''
+
+
+def per_instance(xmlclass):
+    for i in xrange(INSTANCES):
+        obj = xmlclass()
+        obj.xmlschema = xmlmap.loadSchema(xmlclass.XSD_SCHEMA)
+
+
+def registry(xmlclass):
+    for i in xrange(INSTANCES):
+        xmlclass()
+
+
+def timed(func, xmlclass):
+    start = time.time()
+    func(xmlclass)
+    return time.time() - start
+
+
+def main():
+    xsd_file = tempfile.NamedTemporaryFile(suffix='.xsd')
+    xsd_file.write(XSD)
+    xsd_file.flush()
+
+    class SchemaObject(xmlmap.XmlObject):
+        ROOT_NAME = 'a'
+        XSD_SCHEMA = xsd_file.name
+
+    loaded = timed(per_instance, SchemaObject)
+    shared = timed(registry, SchemaObject)
+    print '%d instances' % INSTANCES
+    print '  load per instance %8.3fs' % loaded
+    print '  schema registry   %8.3fs' % shared
+    print 'speedup: %.2fx' % (loaded / shared)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_serialize.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare peak memory use and time for serializing a large CERP-like
+document with :meth:`~eulxml.xmlmap.XmlObject.serializeDocument`, as it
+used to work (serializing to a string, then copying it through a
+:class:`cStringIO.StringIO` buffer) and as it works now (writing to the
+stream in chunks while serializing, or returning the serialized string
+without a copy).  Each case runs in a separate process so that peak
+memory can be measured independently.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_serialize.py [number of messages]
+"""
+
+import cStringIO
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from lxml import etree
+
+from eulxml import xmlmap
+
+MESSAGES = 100000
+BODY = 'All work and no play makes Jack a dull boy. ' * 20
+
+MESSAGE = '''<Message><LocalId>%d</LocalId><From>jack@example.com</From>
+<Subject>Message %d</Subject><SingleBody><BodyContent><Content>%s</Content>
+</BodyContent></SingleBody></Message>
+'''
+
+
+def old_serialize(obj, stream=None):
+    # serializeDocument as it used to be implemented
+    node = obj.node.getroottree()
+    if stream is None:
+        string_mode = True
+        stream = cStringIO.StringIO()
+    else:
+        string_mode = False
+    stream.write(etree.tostring(node, encoding='UTF-8', xml_declaration=True))
+    if string_mode:
+        data = stream.getvalue()
+        stream.close()
+        return data
+    return stream
+
+
+def to_file(serialize, obj, filename):
+    with open(filename + '.out', 'w') as out:
+        serialize(obj, out)
+
+def to_string(serialize, obj, filename):
+    return len(serialize(obj))
+
+def new_serialize(obj, stream=None):
+    return obj.serializeDocument(stream)
+
+def new_serialize_gzip(obj, stream=None):
+    return obj.serializeDocument(stream, compression=6)
+
+
+def run(method, target, filename):
+    # run in this process and report time and peak memory (KB) used
+    # to serialize, beyond loading the document
+    obj = xmlmap.load_xmlobject_from_file(filename)
+    loaded = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    globals()[target](globals()[method], obj, filename)
+    elapsed = time.time() - start
+    print elapsed, loaded, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(*sys.argv[2:5])
+        return
+
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES
+    handle, filename = tempfile.mkstemp(suffix='.xml')
+    os.close(handle)
+    try:
+        with open(filename, 'w') as out:
+            out.write('<Account><Folder><Name>In</Name>\n')
+            for i in xrange(messages):
+                out.write(MESSAGE % (i, i, BODY))
+            out.write('</Folder></Account>\n')
+        print '%d messages, %.1f MB' % (messages, os.path.getsize(filename) / 1048576.0)
+        print '  %-32s %8s %12s %16s' % ('', 'time', 'peak', 'beyond loading')
+        for label, method, target in [
+                ('old, to file', 'old_serialize', 'to_file'),
+                ('serializeDocument, to file', 'new_serialize', 'to_file'),
+                ('serializeDocument, gzip file', 'new_serialize_gzip', 'to_file'),
+                ('old, to string', 'old_serialize', 'to_string'),
+                ('serializeDocument, to string', 'new_serialize', 'to_string')]:
+            output = subprocess.check_output([sys.executable, __file__, '--run',
+                                              method, target, filename],
+                                             env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+            elapsed, loaded, maxrss = output.split()
+            print '  %-32s %7.3fs %9.1f MB %13.1f MB' % (label, float(elapsed),
+                int(maxrss) / 1024.0, (int(maxrss) - int(loaded)) / 1024.0)
+    finally:
+        os.remove(filename)
+        if os.path.exists(filename + '.out'):
+            os.remove(filename + '.out')
+
+
+if __name__ == '__main__':
+    main()
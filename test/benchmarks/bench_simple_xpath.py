@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_simple_xpath.py
+# 
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Micro-benchmark reading simple fields for each field mapper, comparing
+the lxml xpath engine with the direct lxml calls now used for simple
+attribute and ``text()`` xpaths and for converting text-only elements.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_simple_xpath.py
+"""
+
+import time
+
+from eulxml import xmlmap
+from eulxml.xmlmap import fields
+
+REPEAT = 20000
+
+XML = '''<doc xmlns:ex="http://example.com/" id="d1" ex:flag="yes">
+  <ex:title>A title</ex:title>
+  <count>42</count>
+  <ex:part><ex:name>first</ex:name></ex:part>
+  <ex:part><ex:name>second</ex:name></ex:part>
+  text
+</doc>'''
+
+
+class Part(xmlmap.XmlObject):
+    name = xmlmap.StringField('ex:name')
+
+FIXTURE_FIELDS = [
+    ('string (child)', xmlmap.StringField('ex:title')),
+    ('string (attribute)', xmlmap.StringField('@id')),
+    ('string (text())', xmlmap.StringField('text()')),
+    ('string (normalized)', xmlmap.StringField('ex:title', normalize=True)),
+    ('integer', xmlmap.IntegerField('count')),
+    ('boolean', xmlmap.SimpleBooleanField('@ex:flag', 'yes', 'no')),
+    ('node', xmlmap.NodeField('ex:part', Part)),
+    ('string list', xmlmap.StringListField('ex:part/ex:name')),
+]
+
+
+def timed(field, node, context):
+    # best of three runs, in microseconds per access
+    times = []
+    for run in range(3):
+        start = time.time()
+        for i in xrange(REPEAT):
+            value = field.get_for_node(node, context)
+            if isinstance(value, fields.NodeList):
+                list(value)
+        times.append(time.time() - start)
+    return min(times) / REPEAT * 1000000
+
+
+def main():
+    obj = xmlmap.XmlObject(xmlmap.parseString(XML),
+                           context={'namespaces': {'ex': 'http://example.com/'}})
+    node_string = fields._node_string
+    print '%-20s %10s %10s' % ('mapper', 'xpath', 'direct')
+    for label, field in FIXTURE_FIELDS:
+        direct = timed(field, obj.node, obj.context)
+        # disable the direct lxml shortcuts
+        step = field._simple_step
+        field._simple_step = None
+        field._compiled_xpaths.clear()
+        fields._node_string = lambda node: None
+        engine = timed(field, obj.node, obj.context)
+        fields._node_string = node_string
+        field._simple_step = step
+        field._compiled_xpaths.clear()
+        print '%-20s %8.2fus %8.2fus' % (label, engine, direct)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_slots.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare the memory used by and the time taken to create many
+:class:`~eulxml.xmlmap.XmlObject` wrappers (CERP
+:class:`~eulxml.xmlmap.cerp.Message` objects for every message in a large
+account) now that instances use ``__slots__``, with a subclass that sets
+:attr:`~eulxml.xmlmap.XmlObject.DYNAMIC_ATTRIBUTES` and so has a
+``__dict__`` for every instance, as all instances used to.  Each runs in a
+separate process so that memory use can be measured independently.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_slots.py [number of messages]
+"""
+
+import gc
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from lxml import etree
+
+from eulxml.xmlmap import cerp
+
+MESSAGES = 200000
+
+
+class DynamicMessage(cerp.Message):
+    DYNAMIC_ATTRIBUTES = True
+
+    def __init__(self, *args, **kwargs):
+        super(DynamicMessage, self).__init__(*args, **kwargs)
+        # store something in the instance dictionary, as node and context
+        # used to be
+        self.created = True
+
+
+def build_account(messages):
+    account = etree.Element('{%s}Account' % cerp.Message.ROOT_NS, nsmap={None: cerp.Message.ROOT_NS})
+    folder = etree.SubElement(account, '{%s}Folder' % cerp.Message.ROOT_NS)
+    for i in xrange(messages):
+        message = etree.SubElement(folder, '{%s}Message' % cerp.Message.ROOT_NS)
+        etree.SubElement(message, '{%s}LocalId' % cerp.Message.ROOT_NS).text = str(i)
+    return folder
+
+
+def maxrss():
+    # peak memory of this process, in KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(class_name, messages):
+    # create a wrapper for every message, in this process, and report the
+    # time taken and the memory used by the wrappers (in KB)
+    xmlclass = globals()[class_name] if class_name in globals() \
+        else getattr(cerp, class_name)
+    nodes = list(build_account(messages))
+    gc.collect()
+    before = maxrss()
+    start = time.time()
+    wrappers = [xmlclass(node) for node in nodes]
+    elapsed = time.time() - start
+    size = sys.getsizeof(wrappers[0])
+    if hasattr(wrappers[0], '__dict__'):
+        size += sys.getsizeof(wrappers[0].__dict__)
+    print elapsed, maxrss() - before, size
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--run':
+        run(sys.argv[2], int(sys.argv[3]))
+        return
+
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES
+    print '%d Message wrappers' % messages
+    results = {}
+    for label, class_name in [('with __dict__', 'DynamicMessage'),
+                              ('__slots__', 'Message')]:
+        output = subprocess.check_output([sys.executable, __file__, '--run',
+                                          class_name, str(messages)],
+                                         env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        elapsed, memory, size = output.split()
+        results[label] = int(memory)
+        print '  %-14s %8.3fs  %8.1f MB  (%d bytes per wrapper, %d per object)' % \
+            (label, float(elapsed), int(memory) / 1024.0,
+             int(memory) * 1024 / messages, int(size))
+    print 'memory saved: %.0f%%' % \
+        (100 - 100.0 * results['__slots__'] / results['with __dict__'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_structural_equality.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare finding items in a :class:`~eulxml.xmlmap.NodeListField`
+(``index``, ``in``, and ``count``, which ``remove`` also relies on) the way
+it used to work, converting every item and comparing serialized XML, with
+the structural comparison now used by :class:`~eulxml.xmlmap.XmlObject`,
+and with the structural comparison on a snapshot list
+(:attr:`~eulxml.xmlmap.XmlObject.SNAPSHOT_LISTS`).  Uses a list of 2,000
+small MODS names, and a list of 500 larger MODS related items.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_structural_equality.py
+"""
+
+import time
+
+from eulxml import xmlmap
+
+ROUNDS = 20
+
+MODS_NS = 'http://www.loc.gov/standards/mods/v3/'
+NAME = '''<mods:name type="personal" authority="naf">
+    <mods:namePart type="family">Heaney</mods:namePart>
+    <mods:namePart type="given">Seamus %d</mods:namePart>
+    <mods:namePart type="date">1939-2013</mods:namePart>
+    <mods:role><mods:roleTerm type="text" authority="marcrelator">author</mods:roleTerm></mods:role>
+  </mods:name>
+'''
+RELATED_ITEM = '''<mods:relatedItem type="constituent">
+    <mods:titleInfo><mods:title>Chapter %%d</mods:title></mods:titleInfo>
+%s  </mods:relatedItem>
+''' % (''.join('    <mods:subject><mods:topic>Topic %d</mods:topic></mods:subject>\n' % i
+                     for i in xrange(50)))
+
+
+class Item(xmlmap.XmlObject):
+    ROOT_NAMESPACES = {'mods': MODS_NS}
+
+
+class Document(xmlmap.XmlObject):
+    ROOT_NAMESPACES = {'mods': MODS_NS}
+    names = xmlmap.NodeListField('mods:name', Item)
+    items = xmlmap.NodeListField('mods:relatedItem', Item)
+
+
+class CachedDocument(Document):
+    SNAPSHOT_LISTS = True
+
+
+def serialize_equal(a, b):
+    # XmlObject.__eq__ as it used to be implemented
+    if hasattr(b, 'node') and a.node == b.node:
+        return True
+    return a.serialize() == b.serialize()
+
+
+def old_operations(names, target):
+    data = names.data
+    index = [i for i, name in enumerate(data) if serialize_equal(name, target)][0]
+    found = any(serialize_equal(target, name) for name in data)
+    count = sum(1 for name in data if serialize_equal(name, target))
+    return index, found, count
+
+
+def new_operations(names, target):
+    return names.index(target), target in names, names.count(target)
+
+
+def timed(func, xmlclass, field, template, count):
+    xml = '<mods:mods xmlns:mods="%s">\n  %s</mods:mods>' % \
+        (MODS_NS, ''.join(template % i for i in xrange(count)))
+    obj = xmlmap.load_xmlobject_from_string(xml, xmlclass)
+    # a copy of one of the last items, in a separate document
+    target = getattr(xmlmap.load_xmlobject_from_string(
+        '<mods:mods xmlns:mods="%s">%s</mods:mods>' % (MODS_NS, template % (count - 10)),
+        xmlclass), field)[0]
+    start = time.time()
+    for i in xrange(ROUNDS):
+        result = func(getattr(obj, field), target)
+    return (time.time() - start) / ROUNDS, result
+
+
+def main():
+    print 'index, in, and count of the tenth item from the end, average of %d' % ROUNDS
+    for field, template, count in [('names', NAME, 2000),
+                                   ('items', RELATED_ITEM, 500)]:
+        print '  %d %s' % (count, field)
+        old, old_result = timed(old_operations, Document, field, template, count)
+        new, new_result = timed(new_operations, Document, field, template, count)
+        cached, cached_result = timed(new_operations, CachedDocument, field,
+                                      template, count)
+        assert old_result == new_result == cached_result
+        print '    serialize and compare     %8.2fms' % (old * 1000)
+        print '    structural comparison     %8.2fms  (%.2fx)' % (new * 1000, old / new)
+        print '    snapshot list             %8.2fms  (%.2fx)' % (cached * 1000, old / cached)
+
+
+if __name__ == '__main__':
+    main()
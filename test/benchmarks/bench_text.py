@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_text.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare ways of getting the normalized text of every div in a large TEI
+document (the test fixture with its body repeated): evaluating
+``normalize-space(.)`` with ``node.xpath()``, as
+:meth:`XmlObject.__unicode__ <eulxml.xmlmap.XmlObject.__unicode__>` used
+to; with a compiled :class:`lxml.etree.XPath`, as it does now; and by
+joining :meth:`~lxml.etree._Element.itertext` and normalizing whitespace in
+Python.  Also simulates a template that converts every
+:class:`~eulxml.xmlmap.teimap.TeiDiv` to text several times, with and
+without :attr:`~eulxml.xmlmap.XmlObject.CACHE_TEXT`.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_text.py [copies of the document body]
+"""
+
+from copy import deepcopy
+import os
+import re
+import sys
+import time
+
+from lxml import etree
+
+from eulxml import xmlmap
+from eulxml.xmlmap.teimap import Tei, TeiDiv, TEI_NAMESPACE
+
+COPIES = 200
+ROUNDS = 5
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                       'test_xmlmap', 'fixtures', 'tei_clarke.xml')
+
+NORMALIZED_TEXT = etree.XPath('normalize-space(.)')
+XML_WHITESPACE = re.compile(u'[ \t\r\n]+')
+
+
+class UncachedDiv(TeiDiv):
+    CACHE_TEXT = False
+
+
+def load_document(copies):
+    tei = xmlmap.load_xmlobject_from_file(FIXTURE, Tei)
+    body = tei.body.node
+    divs = list(body)
+    for i in xrange(copies - 1):
+        for div in divs:
+            body.append(deepcopy(div))
+    return tei
+
+
+def node_xpath(node):
+    return node.xpath('normalize-space(.)')
+
+
+def compiled_xpath(node):
+    return NORMALIZED_TEXT(node)
+
+
+def itertext(node):
+    return XML_WHITESPACE.sub(u' ', u''.join(node.itertext())).strip(u' ')
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def extract(func, nodes):
+    for node in nodes:
+        func(node)
+
+
+def render(divs, divclass):
+    for node in divs:
+        div = divclass(node)
+        for i in xrange(ROUNDS):
+            unicode(div)
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else COPIES
+    tei = load_document(copies)
+    divs = tei.node.xpath('//tei:div', namespaces={'tei': TEI_NAMESPACE})
+    # small elements, such as headings
+    heads = tei.node.xpath('//tei:head', namespaces={'tei': TEI_NAMESPACE})
+    for node in divs[:10] + heads[:10]:
+        assert node_xpath(node) == compiled_xpath(node) == itertext(node)
+
+    print '%d divs, %d heads, %.1f MB of text' % \
+        (len(divs), len(heads), len(tei.node.xpath('string()')) / 1048576.0)
+    for label, nodes in [('every div', divs), ('every head', heads)]:
+        print '  normalized text of %s' % label
+        for method in [node_xpath, compiled_xpath, itertext]:
+            print '    %-15s %8.3fs' % (method.__name__, timed(extract, method, nodes))
+
+    uncached = timed(render, divs, UncachedDiv)
+    cached = timed(render, divs, TeiDiv)
+    print '  unicode() of every div %d times' % ROUNDS
+    print '    uncached        %8.3fs' % uncached
+    print '    CACHE_TEXT      %8.3fs' % cached
+    print '    speedup: %.2fx' % (uncached / cached)
+
+
+if __name__ == '__main__':
+    main()
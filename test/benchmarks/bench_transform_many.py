@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_transform_many.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare rendering a collection of files to HTML one at a time, loading
+each file and calling :meth:`~eulxml.xmlmap.XmlObject.xsl_transform`, with
+:func:`eulxml.xmlmap.batch.xsl_transform_many` using worker threads and
+worker processes.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_transform_many.py [number of files]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from eulxml import xmlmap
+from eulxml.xmlmap.batch import xsl_transform_many
+
+FILES = 2000
+
+XSL = '''<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" version="1.0">
+  <xsl:output method="html"/>
+  <xsl:template match="/">
+    <html><body><h1><xsl:value-of select="ead/title"/></h1>
+      <xsl:apply-templates select="ead/c"/></body></html>
+  </xsl:template>
+  <xsl:template match="c">
+    <div class="c"><h2><xsl:value-of select="@id"/></h2>
+      <xsl:for-each select="p"><p><xsl:value-of select="."/></p></xsl:for-each>
+      <xsl:apply-templates select="c"/></div>
+  </xsl:template>
+</xsl:stylesheet>'''
+
+
+def write_files(directory, count):
+    component = '<c id="c%%d">%s</c>' % ''.join('<p>paragraph %d</p>' % i for i in xrange(10))
+    paths = []
+    for i in xrange(count):
+        path = os.path.join(directory, 'ead%05d.xml' % i)
+        with open(path, 'w') as out:
+            out.write('<ead><title>Finding aid %d</title>%s</ead>' %
+                      (i, ''.join(component % j for j in xrange(50))))
+        paths.append(path)
+    return paths
+
+
+def one_at_a_time(paths, stylesheet, output_dir):
+    for path in paths:
+        obj = xmlmap.load_xmlobject_from_file(path)
+        result = obj.xsl_transform(filename=stylesheet, raw=True)
+        name = os.path.splitext(os.path.basename(path))[0] + '.html'
+        with open(os.path.join(output_dir, name), 'wb') as out:
+            out.write(str(result))
+
+
+def threads(paths, stylesheet, output_dir):
+    for result in xsl_transform_many(paths, stylesheet, output_dir=output_dir):
+        assert result.error is None, result.error
+
+
+def processes(paths, stylesheet, output_dir):
+    for result in xsl_transform_many(paths, stylesheet, output_dir=output_dir,
+                                     processes=True, chunksize=8):
+        assert result.error is None, result.error
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else FILES
+    directory = tempfile.mkdtemp()
+    try:
+        stylesheet = os.path.join(directory, 'ead.xsl')
+        with open(stylesheet, 'w') as out:
+            out.write(XSL)
+        paths = write_files(directory, count)
+        output_dir = os.path.join(directory, 'html')
+        os.mkdir(output_dir)
+
+        print '%d files, %d CPUs' % (count, multiprocessing.cpu_count())
+        timings = []
+        for label, func in [('one at a time', one_at_a_time),
+                            ('worker threads', threads),
+                            ('worker processes', processes)]:
+            start = time.time()
+            func(paths, stylesheet, output_dir)
+            timings.append(time.time() - start)
+            print '  %-18s %8.3fs  (%.2fx)' % (label, timings[-1], timings[0] / timings[-1])
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_validate_many.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare validating documents one at a time with validating them in
+threads with :func:`~eulxml.xmlmap.validate_many`, and count how many
+documents get the wrong errors when threads validate with a single shared
+:class:`lxml.etree.XMLSchema` and read its error log, as
+:meth:`~eulxml.xmlmap.XmlObject.validation_errors` used to.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_validate_many.py [number of threads]
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+
+from lxml import etree
+
+from eulxml import xmlmap
+
+DOCUMENTS = 400
+SUBJECTS = 500
+
+XSD = '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+    <xsd:element name="record">
+        <xsd:complexType>
+            <xsd:sequence>
+                <xsd:element name="title" type="xsd:string"/>
+                <xsd:element name="date" type="xsd:gYear"/>
+                <xsd:element name="subject" type="xsd:string" maxOccurs="unbounded"/>
+            </xsd:sequence>
+        </xsd:complexType>
+    </xsd:element>
+</xsd:schema>
+'''
+
+
+def record(i):
+    # every other record has an invalid date, which its error will mention
+    date = '1966' if i % 2 else 'date%d' % i
+    subjects = ''.join('<subject>subject %d</subject>' % j for j in xrange(SUBJECTS))
+    return '<record><title>Record %d</title><date>%s</date>%s</record>' % \
+        (i, date, subjects)
+
+
+def correct(i, errors):
+    if i % 2:
+        return len(errors) == 0
+    return len(errors) == 1 and "'date%d'" % i in errors[0].message
+
+
+def shared_schema(objects, threads):
+    # validate with the shared schema, reading its error log afterwards
+    schema = objects[0].xmlschema
+    results = [None] * len(objects)
+    def validate(start):
+        for i in xrange(start, len(objects), threads):
+            schema.validate(objects[i].node)
+            results[i] = list(schema.error_log)
+    workers = [threading.Thread(target=validate, args=(n,)) for n in xrange(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else multiprocessing.cpu_count() * 2
+    xsd_file = tempfile.NamedTemporaryFile(suffix='.xsd')
+    xsd_file.write(XSD)
+    xsd_file.flush()
+
+    class Record(xmlmap.XmlObject):
+        XSD_SCHEMA = xsd_file.name
+
+    objects = [xmlmap.load_xmlobject_from_string(record(i), Record)
+               for i in xrange(DOCUMENTS)]
+    # load the schema and compile copies for each thread before timing
+    xmlmap.validate_many(objects[:threads * 4], threads)
+
+    print '%d documents, %d threads, %d CPUs' % (DOCUMENTS, threads,
+                                               multiprocessing.cpu_count())
+    serial, serial_results = timed(lambda: [obj.validation_errors() for obj in objects])
+    pooled, pooled_results = timed(xmlmap.validate_many, objects, threads)
+    shared, shared_results = timed(shared_schema, objects, threads)
+    for label, elapsed, results in [('one at a time', serial, serial_results),
+                                    ('validate_many', pooled, pooled_results),
+                                    ('shared schema, threads', shared, shared_results)]:
+        wrong = sum(1 for i, errors in enumerate(results) if not correct(i, errors))
+        print '  %-24s %8.3fs  %4d wrong error lists' % (label, elapsed, wrong)
+    print 'speedup: %.2fx' % (serial / pooled)
+
+
+if __name__ == '__main__':
+    main()
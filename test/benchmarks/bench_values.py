@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_values.py
+# 
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare reading all the fields of EAD objects one attribute at a time
+with the batched :meth:`~eulxml.xmlmap.XmlObject.values`, using the
+heaney653.xml EAD fixture: the top-level finding aid, and the archdesc and
+series components, as an indexing pipeline would.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_values.py
+"""
+
+import os
+import time
+
+from eulxml.xmlmap import load_xmlobject_from_file
+from eulxml.xmlmap.eadmap import EncodedArchivalDescription
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       '..', 'test_xmlmap', 'fixtures', 'heaney653.xml')
+ROUNDS = 2000
+
+
+def read_attributes(obj, names):
+    return [getattr(obj, name) for name in names]
+
+
+def read_values(obj, names):
+    return obj.values(*names)
+
+
+def timed(func, objects):
+    start = time.time()
+    for i in xrange(ROUNDS):
+        for obj, names in objects:
+            func(obj, names)
+    return time.time() - start
+
+
+def main():
+    ead = load_xmlobject_from_file(FIXTURE, EncodedArchivalDescription)
+    objects = [ead, ead.archdesc] + list(ead.dsc.c)
+    objects = [(obj, sorted(obj._fields.keys())) for obj in objects]
+    fields = sum(len(names) for obj, names in objects)
+
+    attributes = timed(read_attributes, objects)
+    values = timed(read_values, objects)
+    print '%d objects, %d fields, %d rounds' % (len(objects), fields, ROUNDS)
+    print '  getattr  %8.3fs' % attributes
+    print '  values   %8.3fs' % values
+    print 'speedup: %.2fx' % (attributes / values)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_xpath_cache.py
+# 
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare reading EAD fields with per-field compiled xpaths against
+re-evaluating the xpath string on the node for every access (the pre-cache
+behavior), using the heaney653.xml EAD fixture.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_xpath_cache.py
+"""
+
+import os
+import time
+
+from eulxml.xmlmap import load_xmlobject_from_file
+from eulxml.xmlmap.eadmap import EncodedArchivalDescription
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       '..', 'test_xmlmap', 'fixtures', 'heaney653.xml')
+ROUNDS = 2000
+
+
+def read_uncompiled(obj, fields):
+    # evaluate the xpath string on the node each time, as field access did
+    # before compiled xpaths were cached
+    for name, field in fields:
+        matches = obj.node.xpath(field.xpath, **obj.context)
+        if isinstance(matches, list):
+            matches = matches[0] if matches else None
+        field.mapper.to_python(matches)
+
+
+def read_compiled(obj, fields):
+    for name, field in fields:
+        getattr(obj, name)
+
+
+def timed(label, func, obj, fields):
+    start = time.time()
+    for i in xrange(ROUNDS):
+        func(obj, fields)
+    elapsed = time.time() - start
+    print '%-12s %8.3fs  (%d field reads)' % (label, elapsed, ROUNDS * len(fields))
+    return elapsed
+
+
+def main():
+    ead = load_xmlobject_from_file(FIXTURE, EncodedArchivalDescription)
+    # single-valued fields only, so both versions do equivalent work
+    fields = [(name, field) for name, field in ead._fields.iteritems()
+              if field.manager.__class__.__name__ == 'SingleNodeManager']
+
+    uncompiled = timed('uncompiled', read_uncompiled, ead, fields)
+    compiled = timed('compiled', read_compiled, ead, fields)
+    print 'speedup: %.2fx' % (uncompiled / compiled)
+
+
+if __name__ == '__main__':
+    main()
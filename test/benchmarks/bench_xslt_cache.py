@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# file benchmarks/bench_xslt_cache.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Compare rendering small EAD-like documents to HTML with
+:meth:`~eulxml.xmlmap.XmlObject.xsl_transform`, reading and compiling the
+stylesheet for every call as it used to, with the compiled stylesheets now
+cached in :data:`~eulxml.xmlmap.xslt_cache`, and with a registered
+stylesheet returning the raw result as a string.
+
+Run from the top-level directory of the source tree::
+
+    python test/benchmarks/bench_xslt_cache.py
+"""
+
+import tempfile
+import time
+
+from lxml import etree
+
+from eulxml import xmlmap
+from eulxml.xmlmap.core import _parser_pool
+
+ROUNDS = 2000
+
+# a stylesheet with a template for each of many element names, like the
+# stylesheets used to render finding aids
+XSL = '''<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" version="1.0">
+  <xsl:output method="html"/>
+  <xsl:template match="/">
+    <html><body><xsl:apply-templates/></body></html>
+  </xsl:template>
+%s
+</xsl:stylesheet>''' % ''.join('''  <xsl:template match="e%d">
+    <div class="e%d"><xsl:if test="@id"><a name="{@id}"/></xsl:if><xsl:apply-templates/></div>
+  </xsl:template>
+''' % (i, i) for i in xrange(200))
+
+DOCUMENT = '<ead><e1 id="a"><e2>Title</e2><e3>Abstract <e4>text</e4></e3></e1></ead>'
+
+
+def old_xsl_transform(obj, filename):
+    # xsl_transform as it used to be implemented
+    with _parser_pool.parser() as parser:
+        xslt_doc = etree.parse(filename, parser=parser)
+        transform = etree.XSLT(xslt_doc)
+    return str(xmlmap.XmlObject(transform(obj.node)).serialize())
+
+
+def cached(obj, filename):
+    return obj.xsl_transform(filename=filename).serialize()
+
+
+def registered(obj, filename):
+    return str(obj.xsl_transform(stylesheet='bench', raw=True))
+
+
+def timed(func, obj, filename):
+    start = time.time()
+    for i in xrange(ROUNDS):
+        func(obj, filename)
+    return time.time() - start
+
+
+def main():
+    xsl_file = tempfile.NamedTemporaryFile(suffix='.xsl')
+    xsl_file.write(XSL)
+    xsl_file.flush()
+    xmlmap.xslt_cache.register('bench', filename=xsl_file.name)
+    obj = xmlmap.load_xmlobject_from_string(DOCUMENT)
+
+    print '%d transforms' % ROUNDS
+    old = timed(old_xsl_transform, obj, xsl_file.name)
+    new = timed(cached, obj, xsl_file.name)
+    named = timed(registered, obj, xsl_file.name)
+    print '  compile every time       %8.3fs' % old
+    print '  cached                   %8.3fs  (%.1fx)' % (new, old / new)
+    print '  registered, raw result   %8.3fs  (%.1fx)' % (named, old / named)
+
+
+if __name__ == '__main__':
+    main()
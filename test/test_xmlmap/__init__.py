@@ -21,3 +21,4 @@ from test_xmlmap.test_tei import *
 from test_xmlmap.test_dc import *
 from test_xmlmap.test_cerp import *
 from test_xmlmap.test_mods import *
+from test_xmlmap.test_batch import *
@@ -0,0 +1,211 @@
+# file test_xmlmap/test_batch.py
+#
+#   Copyright 2011 Emory University Libraries
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+#!/usr/bin/env python
+
+from cStringIO import StringIO
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+
+from eulxml import xmlmap
+from eulxml.xmlmap import batch
+from testcore import main
+
+
+class SchemaObject(xmlmap.XmlObject):
+    XSD_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'fixtures', 'batch.xsd')
+
+
+class TestBatch(unittest.TestCase):
+    FILES = {
+        'valid.xml': '<a><b>one</b></a>',
+        'invalid.xml': '<a foo="1"><c/></a>',
+        'malformed.xml': '<a><b></a>',
+    }
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.paths = {}
+        for name, content in self.FILES.iteritems():
+            self.paths[name] = os.path.join(self.dir, name)
+            with open(self.paths[name], 'w') as xmlfile:
+                xmlfile.write(content)
+        self.paths['missing.xml'] = os.path.join(self.dir, 'missing.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check_results(self, results):
+        results = dict((os.path.basename(r.path), r) for r in results)
+        self.assertEqual(set(['valid.xml', 'invalid.xml', 'malformed.xml',
+                              'missing.xml']), set(results.keys()))
+        valid = results['valid.xml']
+        self.assert_(isinstance(valid, batch.ValidationResult))
+        self.assertTrue(valid.valid)
+        self.assertEqual([], valid.errors)
+        self.assert_(valid.load_time >= 0 and valid.validate_time >= 0)
+
+        invalid = results['invalid.xml']
+        self.assertFalse(invalid.valid)
+        self.assertEqual(2, len(invalid.errors))
+        self.assert_(all(isinstance(e, str) for e in invalid.errors))
+        self.assert_("'foo'" in invalid.errors[0])
+
+        for name in ['malformed.xml', 'missing.xml']:
+            self.assertFalse(results[name].valid)
+            self.assertEqual(1, len(results[name].errors))
+            self.assertEqual(0.0, results[name].validate_time)
+
+    def test_validate_file(self):
+        result = batch.validate_file(self.paths['valid.xml'], SchemaObject)
+        self.assertEqual(self.paths['valid.xml'], result.path)
+        self.assertTrue(result.valid)
+        # without a schema, anything well-formed is valid
+        result = batch.validate_file(self.paths['invalid.xml'])
+        self.assertTrue(result.valid)
+
+        # a schema that can't be loaded makes every file invalid
+        class MissingSchemaObject(xmlmap.XmlObject):
+            XSD_SCHEMA = os.path.join(self.dir, 'missing.xsd')
+        result = batch.validate_file(self.paths['valid.xml'], MissingSchemaObject)
+        self.assertFalse(result.valid)
+        self.assertEqual(1, len(result.errors))
+        self.assert_('missing.xsd' in result.errors[0])
+        # including one that loadSchema skips, such as a url without a proxy
+        class UrlSchemaObject(xmlmap.XmlObject):
+            XSD_SCHEMA = 'http://localhost/unloadable.xsd'
+        proxy = os.environ.pop('HTTP_PROXY', None)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                result = batch.validate_file(self.paths['valid.xml'], UrlSchemaObject)
+        finally:
+            if proxy is not None:
+                os.environ['HTTP_PROXY'] = proxy
+        self.assertFalse(result.valid)
+        self.assertEqual(['Schema http://localhost/unloadable.xsd could not be loaded'],
+                         result.errors)
+
+    def test_validate_files(self):
+        # in this process
+        self.check_results(batch.validate_files(self.paths.values(),
+                                                SchemaObject, processes=1))
+        # in worker processes, with the class by name
+        self.check_results(batch.validate_files(self.paths.values(),
+            'test_xmlmap.test_batch.SchemaObject', processes=2, chunksize=1))
+
+    def test_main(self):
+        stdout = sys.stdout
+        stderr = sys.stderr
+        sys.stdout = StringIO()
+        sys.stderr = StringIO()
+        try:
+            status = batch.main(['-c', 'test_xmlmap.test_batch.SchemaObject',
+                                 '-p', '2', '-q', self.paths['valid.xml'],
+                                 self.paths['invalid.xml']])
+            output = sys.stdout.getvalue()
+            summary = sys.stderr.getvalue()
+        finally:
+            sys.stdout = stdout
+            sys.stderr = stderr
+        self.assertEqual(1, status)
+        # quiet: only the invalid file is listed, followed by its errors
+        lines = output.splitlines()
+        self.assertEqual(3, len(lines))
+        self.assert_(lines[0].startswith('%s\tinvalid\t' % self.paths['invalid.xml']))
+        self.assert_(lines[1].startswith('    '))
+        self.assert_(summary.startswith('2 files, 1 invalid'))
+
+
+class TestTransformMany(unittest.TestCase):
+    XSL = '''<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" version="1.0">
+        <xsl:param name="label" select="'item'"/>
+        <xsl:output method="html"/>
+        <xsl:template match="/"><p><xsl:value-of select="$label"/>: <xsl:value-of select="a/b"/><br/></p></xsl:template>
+    </xsl:stylesheet>'''
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.xsl = os.path.join(self.dir, 'test.xsl')
+        with open(self.xsl, 'w') as xslfile:
+            xslfile.write(self.XSL)
+        self.paths = []
+        for i in range(5):
+            self.paths.append(os.path.join(self.dir, 'record%d.xml' % i))
+            with open(self.paths[-1], 'w') as xmlfile:
+                xmlfile.write('<a><b>%d</b></a>' % i)
+        self.output = os.path.join(self.dir, 'output')
+        os.mkdir(self.output)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_strings(self):
+        # sources are read lazily, and results are in the same order
+        results = list(batch.xsl_transform_many(iter(self.paths), self.xsl,
+                                                workers=2))
+        self.assertEqual(self.paths, [result.source for result in results])
+        for i, result in enumerate(results):
+            self.assert_(isinstance(result, batch.TransformResult))
+            self.assertEqual(None, result.error)
+            self.assertEqual('<p>item: %d<br></p>' % i, result.output.strip())
+            self.assert_(result.load_time >= 0 and result.transform_time >= 0)
+
+        # objects, a registered stylesheet, and parameters
+        objects = [xmlmap.load_xmlobject_from_string('<a><b>%d</b></a>' % i)
+                   for i in range(3)]
+        xmlmap.xslt_cache.register('test-transform-many', xsl=self.XSL)
+        try:
+            results = list(batch.xsl_transform_many(objects, 'test-transform-many',
+                                                    {'label': "'obj'"}, workers=2))
+        finally:
+            xmlmap.xslt_cache.forget('test-transform-many')
+        self.assertEqual(objects, [result.source for result in results])
+        for i, result in enumerate(results):
+            self.assertEqual('<p>obj: %d<br></p>' % i, result.output.strip())
+            self.assertEqual(0, result.load_time)
+
+    def test_files(self):
+        found = []
+        sources = self.paths + [os.path.join(self.dir, 'missing.xml')]
+        count = batch.xsl_transform_many(sources, self.xsl, processes=True,
+            workers=2, output_dir=self.output, callback=found.append)
+        self.assertEqual(6, count)
+        self.assertEqual(sources, [result.source for result in found])
+        errors = [result for result in found if result.error]
+        self.assertEqual([found[-1]], errors)
+        self.assertEqual(None, errors[0].output)
+        self.assertEqual(sorted('record%d.html' % i for i in range(5)),
+                         sorted(os.listdir(self.output)))
+        with open(os.path.join(self.output, 'record3.html')) as html:
+            self.assertEqual('<p>item: 3<br></p>', html.read().strip())
+
+        # objects can't be sent to worker processes; the error is raised
+        # when the result for the object is reached
+        results = batch.xsl_transform_many(
+            [self.paths[0], xmlmap.load_xmlobject_from_string('<a/>')],
+            self.xsl, processes=True, workers=2)
+        self.assertEqual(self.paths[0], results.next().source)
+        self.assertRaises(TypeError, results.next)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,10 +16,17 @@
 
 #!/usr/bin/env python
 
+from cStringIO import StringIO
+import gc
+import gzip
 from lxml import etree
+import os
 from os import path
+import shutil
 import unittest
 import tempfile
+import threading
+import weakref
 
 import eulxml.xmlmap.core as xmlmap
 from testcore import main
@@ -86,7 +93,96 @@ class TestXsl(unittest.TestCase):
         self.assertEqual(None, newobj.bar_baz)
 
         self.FILE.close()
-        # not yet tested: xsl with parameters
+
+    def test_xsl_transform_params(self):
+        xsl = '''<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" version="1.0">
+            <xsl:param name="label"/>
+            <xsl:output method="html"/>
+            <xsl:template match="/"><p><xsl:value-of select="$label"/> <br/></p></xsl:template>
+        </xsl:stylesheet>'''
+        obj = xmlmap.XmlObject(self.fixture)
+        newobj = obj.xsl_transform(xsl=xsl, label="'foo'")
+        self.assertEqual('foo', newobj.node.getroot().text)
+        # raw result tree, serialized as specified by the stylesheet
+        result = obj.xsl_transform(xsl=xsl, raw=True, label="'foo'")
+        self.assert_(isinstance(result, etree._XSLTResultTree))
+        self.assertEqual('<p>foo<br></p>', str(result).strip())
+
+    def test_xsl_transform_options(self):
+        xsl = '''<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+                xmlns:ex="urn:example" version="1.0">
+            <xsl:param name="suffix" select="''"/>
+            <xsl:template match="/"><p><xsl:value-of select="ex:twice(string(/foo/bar/baz))"/><xsl:value-of select="$suffix"/></p></xsl:template>
+        </xsl:stylesheet>'''
+        def twice(context, value):
+            return value * 2
+        extensions = {('urn:example', 'twice'): twice}
+        obj = xmlmap.XmlObject(self.fixture)
+        # XSLT options are passed to the XSLT constructor, other keyword
+        # arguments to the transformation
+        newobj = obj.xsl_transform(xsl=xsl, extensions=extensions, suffix="'!'")
+        self.assertEqual('4242!', newobj.node.getroot().text)
+
+        # stylesheets are cached separately for each set of options
+        cache = xmlmap.XsltCache()
+        plain = cache.get(xsl=xsl)
+        transform = cache.get(xsl=xsl, extensions=extensions)
+        self.assert_(transform is not plain)
+        self.assert_(transform is cache.get(xsl=xsl, extensions=dict(extensions)))
+        self.assertRaises(TypeError, cache.get, xsl=xsl, bogus=True)
+
+        # named stylesheets get their options when registered
+        cache.register('test', xsl=xsl, extensions=extensions)
+        self.assertEqual('4242', cache.get(name='test')(self.fixture).getroot().text)
+        self.assertRaises(ValueError, cache.get, name='test', extensions=extensions)
+
+    def test_xslt_cache(self):
+        cache = xmlmap.XsltCache(size=2)
+        transform = cache.get(xsl=self.FIXTURE_XSL)
+        self.assert_(isinstance(transform, etree.XSLT))
+        self.assert_(transform is cache.get(xsl=self.FIXTURE_XSL))
+        self.assert_(transform is cache.get(xsl=unicode(self.FIXTURE_XSL)))
+
+        # files are compiled again when modified
+        xsl_file = tempfile.NamedTemporaryFile(mode="w")
+        xsl_file.write(self.FIXTURE_XSL)
+        xsl_file.flush()
+        from_file = cache.get(filename=xsl_file.name)
+        self.assert_(from_file is cache.get(filename=xsl_file.name))
+        mtime = os.path.getmtime(xsl_file.name)
+        os.utime(xsl_file.name, (mtime + 10, mtime + 10))
+        self.assert_(from_file is not cache.get(filename=xsl_file.name))
+
+        # least recently used stylesheets are discarded
+        cache.get(xsl=self.FIXTURE_XSL)
+        cache.get(xsl=self.FIXTURE_XSL.replace('baz', 'qux'))
+        self.assertEqual(2, len(cache._transforms))
+        self.assert_(transform is cache.get(xsl=self.FIXTURE_XSL))
+        self.assert_(cache.get(filename=xsl_file.name) is not from_file)
+
+        # named stylesheets
+        cache.register('test', filename=xsl_file.name)
+        named = cache.get(name='test')
+        cache.forget()
+        self.assert_(named is cache.get(name='test'))
+        os.utime(xsl_file.name, (mtime + 20, mtime + 20))
+        self.assert_(named is not cache.get(name='test'))
+        cache.forget('test')
+        self.assertRaises(KeyError, cache.get, name='test')
+        xsl_file.close()
+
+        # errors are raised when registering
+        self.assertRaises(etree.XSLTParseError, cache.register, 'invalid',
+            xsl='<xsl:stylesheet xmlns:xsl="http://www.w3.org/1999/XSL/Transform" ' +
+                'version="1.0"><xsl:bogus/></xsl:stylesheet>')
+
+        # xsl_transform uses the shared cache and registered names
+        xmlmap.xslt_cache.register('test-bar-baz', xsl=self.FIXTURE_XSL)
+        try:
+            newobj = xmlmap.XmlObject(self.fixture).xsl_transform(stylesheet='test-bar-baz')
+            self.assertEqual('baz', newobj.node.getroot()[0].tag)
+        finally:
+            xmlmap.xslt_cache.forget('test-bar-baz')
 
 
 # NOTE: using TestXsl fixture text for the init tests
@@ -169,6 +265,48 @@ class TestXmlObjectFileInit(unittest.TestCase):
         obj = xmlmap.load_xmlobject_from_file(self.VALID.name, validate=True)
         self.assert_(isinstance(obj, xmlmap.XmlObject))
 
+    def test_iter_xmlobjects(self):
+        class Baz(xmlmap.XmlObject):
+            ROOT_NAME = 'baz'
+            value = xmlmap.IntegerField('.')
+
+        objects = xmlmap.iter_xmlobjects(self.FILE.name, xmlclass=Baz)
+        first = objects.next()
+        self.assert_(isinstance(first, Baz))
+        self.assertEqual(42, first.value)
+        # the whole document is available while the object is in use
+        self.assertEqual('foo', first.node.getroottree().getroot().tag)
+        root = first.node.getroottree().getroot()
+        second = objects.next()
+        self.assertEqual(13, second.value)
+        # previous content has been cleared
+        self.assertEqual(None, first.node.text)
+        self.assertRaises(StopIteration, objects.next)
+        # and everything processed has been removed
+        self.assertEqual(['foo', 'bar', 'baz'], [el.tag for el in root.iter()])
+        self.assertEqual(None, root[0][0].text)
+
+        # prefixed tag with namespaces
+        account = StringIO('''<Account xmlns="http://www.archives.ncdcr.gov/mail-account">
+            <Folder><Name>In</Name>
+                <Message><LocalId>1</LocalId></Message>
+                <Message><LocalId>2</LocalId></Message>
+            </Folder>
+            <Folder><Name>Out</Name>
+                <Message><LocalId>3</LocalId></Message>
+            </Folder>
+        </Account>''')
+        class Message(xmlmap.XmlObject):
+            ROOT_NAMESPACES = {'xm': 'http://www.archives.ncdcr.gov/mail-account'}
+            id = xmlmap.IntegerField('xm:LocalId')
+        ids = []
+        for message in xmlmap.iter_xmlobjects(account, 'xm:Message', Message):
+            root = message.node.getroottree().getroot()
+            ids.append(message.id)
+        self.assertEqual([1, 2, 3], ids)
+        self.assertEqual(['Account', 'Folder', 'Message'],
+                         [etree.QName(el).localname for el in root.iter()])
+
 class TestXmlObject(unittest.TestCase):
 
     def setUp(self):
@@ -185,6 +323,42 @@ class TestXmlObject(unittest.TestCase):
         obj = xmlmap.load_xmlobject_from_string(u'<text>unicode \u2026</text>')
         self.assertEqual('unicode &#8230;', obj.__string__())
 
+    def test__unicode_cache(self):
+        class SubObj(xmlmap.XmlObject):
+            baz = xmlmap.StringField('baz')
+        class XmlObj(xmlmap.XmlObject):
+            CACHE_TEXT = True
+            bar_list = xmlmap.NodeListField('bar', SubObj)
+            bazes = xmlmap.StringListField('bar/baz')
+            id = xmlmap.StringField('@id')
+
+        xml = '<foo id="a"> one <!-- comment --> <?pi x?><bar><baz>42</baz></bar>\n<bar><baz>13</baz></bar></foo>'
+        obj = xmlmap.load_xmlobject_from_string(xml, XmlObj)
+        # same result as the xpath normalize-space()
+        self.assertEqual(obj.node.xpath('normalize-space(.)'), unicode(obj))
+        self.assertEqual(u'one 42 13', unicode(obj))
+        self.assert_(obj._text is not None)
+
+        # changes made through the object discard the cached text
+        obj.bazes[0] = 'forty-two'
+        self.assertEqual(u'one forty-two 13', unicode(obj))
+        obj.bar_list[1].node.getparent().remove(obj.bar_list[1].node)
+        self.assertEqual(u'one forty-two 13', unicode(obj))  # not seen
+        obj.id = 'b'
+        self.assertEqual(u'one forty-two', unicode(obj))
+        self.assertEqual('one forty-two', obj.__string__())
+        # including changes made through the fields of a child object
+        bar = obj.bar_list[0]
+        bar.baz = '42'
+        self.assertEqual(u'one 42', unicode(obj))
+
+        # without caching, any change is seen
+        obj = xmlmap.load_xmlobject_from_string(xml)
+        self.assertEqual(u'one 42 13', unicode(obj))
+        obj.node.text = 'two'
+        self.assertEqual(u'two 42 13', unicode(obj))
+        self.assertEqual(None, obj._text)
+
     def test_serialize_tostring(self):
         xml_s = self.obj.serialize()        
         self.assert_("<baz>42</baz>" in xml_s)
@@ -210,6 +384,36 @@ class TestXmlObject(unittest.TestCase):
         self.assert_('<!DOCTYPE a' in xmlstr,
             "XML generated by serializeDocument should include DOCTYPE declaration")
 
+    def test_serialize_chunks(self):
+        # streamed output is the same as the string
+        obj = xmlmap.load_xmlobject_from_string(TestXmlObjectStringInit.VALID_XML)
+        baz = xmlmap.XmlObject(self.obj.node.xpath('bar/baz[1]')[0])
+        for method in [self.obj.serialize, self.obj.serializeDocument,
+                       obj.serialize, obj.serializeDocument, baz.serialize]:
+            for pretty in [False, True]:
+                stream = StringIO()
+                self.assert_(stream is method(stream, pretty=pretty))
+                self.assertEqual(method(pretty=pretty), stream.getvalue())
+
+        # large documents are written in chunks, not as a single string
+        big = xmlmap.load_xmlobject_from_string('<a>%s</a>' % ('<b>text</b>' * 100000))
+        writes = []
+        class Stream(object):
+            def write(self, data):
+                writes.append(data)
+        big.serializeDocument(Stream())
+        self.assert_(len(writes) > 1)
+        self.assert_(max(len(data) for data in writes) < len(big.serialize()))
+
+    def test_serialize_gzip(self):
+        for method in [self.obj.serialize, self.obj.serializeDocument]:
+            data = gzip.GzipFile(fileobj=StringIO(method(compression=6))).read()
+            self.assertEqual(method(), data)
+            stream = StringIO()
+            method(stream, compression=9)
+            stream.seek(0)
+            self.assertEqual(method(), gzip.GzipFile(fileobj=stream).read())
+
     def test_isvalid(self):
         # attempting schema-validation on an xmlobject with no schema should raise an exception
         self.assertRaises(Exception, self.obj.schema_valid)
@@ -293,6 +497,215 @@ class TestXmlObject(unittest.TestCase):
         self.assertTrue(obj.generic == obj.bar,
             'different xmlobject classes pointing at the same node are considered equal')
 
+    def test_equal_structure(self):
+        load = xmlmap.load_xmlobject_from_string
+        obj = load('<a xmlns:x="urn:x" id="1" n="2"><x:b>text</x:b><!--c--><?pi d?>tail</a>')
+        # prefixes, attribute order, and unused namespaces don't matter
+        for xml in ['<a xmlns:y="urn:x" n="2" id="1"><y:b>text</y:b><!--c--><?pi d?>tail</a>',
+                    '<a xmlns:x="urn:x" xmlns:z="urn:z" id="1" n="2"><x:b>text</x:b><!--c--><?pi d?>tail</a>']:
+            other = load(xml)
+            self.assertTrue(obj == other, xml)
+            self.assertEqual(obj.structural_hash(), other.structural_hash())
+        # anything else does
+        for xml in ['<a xmlns:x="urn:y" id="1" n="2"><x:b>text</x:b><!--c--><?pi d?>tail</a>',
+                    '<a xmlns:x="urn:x" id="1" n="3"><x:b>text</x:b><!--c--><?pi d?>tail</a>',
+                    '<a xmlns:x="urn:x" id="1"><x:b>text</x:b><!--c--><?pi d?>tail</a>',
+                    '<a xmlns:x="urn:x" id="1" n="2"><x:b>text!</x:b><!--c--><?pi d?>tail</a>',
+                    '<a xmlns:x="urn:x" id="1" n="2"><x:b>text</x:b><!--c--><?pi e?>tail</a>',
+                    '<a xmlns:x="urn:x" id="1" n="2"><x:b>text</x:b><!--c--><?pi d?></a>',
+                    '<a xmlns:x="urn:x" id="1" n="2"><x:b>text</x:b><?pi d?>tail</a>',
+                    '<a xmlns:x="urn:x" id="1" n="2"><x:b>text</x:b><!--c--><?pi d?>tail<e/></a>']:
+            other = load(xml)
+            self.assertTrue(obj != other, xml)
+            self.assertNotEqual(obj.structural_hash(), other.structural_hash(), xml)
+
+        # the text after the compared nodes themselves is ignored
+        parent = load('<p><a>1</a> <a>1</a>\n</p>')
+        first, second = [xmlmap.XmlObject(node) for node in parent.node]
+        self.assertEqual(first, second)
+        self.assertEqual(first.structural_hash(), second.structural_hash())
+
+    def test_cache_hash(self):
+        class SubObj(xmlmap.XmlObject):
+            baz = xmlmap.StringField('baz')
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT)
+        bar = SubObj(obj.node.xpath('bar[1]')[0])
+        # hashed by identity by default
+        self.assertEqual(object.__hash__(bar), hash(bar))
+        self.assertNotEqual(hash(SubObj(bar.node)), hash(bar))
+        original = bar.structural_hash()
+        self.assertEqual(None, bar._hash)
+
+        bar.CACHE_HASH = True
+        self.assertEqual(original, hash(bar))
+        self.assert_(bar._hash is not None)
+        # modifying the xml through the object discards the cached hash
+        bar.baz = 'changed'
+        self.assertNotEqual(original, hash(bar))
+        self.assertEqual(SubObj(bar.node).structural_hash(), hash(bar))
+
+    def test_cache_hash_equality(self):
+        class SubObj(xmlmap.XmlObject):
+            baz = xmlmap.StringField('baz')
+        class XmlObj(xmlmap.XmlObject):
+            CACHE_HASH = True
+            bar = xmlmap.NodeField('bar', SubObj)
+
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+        other = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+        obj.bar.baz = 'changed'
+        self.assertNotEqual(obj, other)
+        self.assertNotEqual(hash(obj), hash(other))
+        # changes made through a NodeField child are not seen by the
+        # cached hash of the parent, but are seen when comparing
+        other.bar.baz = 'changed'
+        self.assertNotEqual(hash(obj), hash(other))
+        self.assertEqual(obj, other)
+        other.bar.baz = 'changed again'
+        self.assertNotEqual(obj, other)
+
+    def test_context(self):
+        class SubObj(xmlmap.XmlObject):
+            baz = xmlmap.StringField('baz')
+        class XmlObj(xmlmap.XmlObject):
+            ROOT_NAMESPACES = {'ex': 'http://example.com/'}
+            bar_list = xmlmap.NodeListField('bar', SubObj)
+
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+        self.assertEqual({'ex': 'http://example.com/'}, obj.context['namespaces'])
+        # instances of the same class on nodes with the same namespaces share a context
+        obj2 = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+        self.assert_(obj.context is obj2.context)
+        self.assert_(obj.bar_list[0].context is obj.bar_list[1].context)
+        self.assert_(obj.context is not obj.bar_list[0].context)
+        # contexts are shared, so they can't be modified
+        self.assertRaises(TypeError, obj.context.update, {'foo': 'bar'})
+        self.assertRaises(TypeError, obj.context['namespaces'].__setitem__,
+                          'foo', 'urn:foo')
+
+        # context passed in is used, but not modified
+        namespaces = {'foo': 'urn:foo'}
+        obj = XmlObj(obj.node, context={'namespaces': namespaces})
+        self.assertEqual({'foo': 'urn:foo', 'ex': 'http://example.com/'},
+                         obj.context['namespaces'])
+        self.assertEqual({'foo': 'urn:foo'}, namespaces)
+
+    def test_values(self):
+        class SubObj(xmlmap.XmlObject):
+            baz = xmlmap.IntegerField('baz')
+        class XmlObj(xmlmap.XmlObject):
+            first_baz = xmlmap.StringField('bar[1]/baz')
+            first_int = xmlmap.IntegerField('bar[1]/baz')
+            first_node = xmlmap.NodeField('bar[1]/baz', xmlmap.XmlObject)
+            second_baz = xmlmap.IntegerField('bar[2]/baz')
+            any_baz = xmlmap.StringField('bar/baz')
+            other_baz = xmlmap.StringField('bar/baz[. = "13"]')
+            missing = xmlmap.StringField('bar[3]/baz')
+            missing_int = xmlmap.IntegerField('bar[3]/baz')
+            bazes = xmlmap.StringListField('bar/baz')
+            bars = xmlmap.NodeListField('bar', SubObj)
+            first_bar = xmlmap.NodeField('bar[1]', SubObj)
+            bar = xmlmap.NodeField('bar', SubObj)
+            bar_str = xmlmap.StringField('bar')
+            baz = xmlmap.StringField('baz')
+
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+        names = sorted(XmlObj._fields.keys())
+        self.assertEqual([getattr(obj, name) for name in names],
+                         obj.values(*names))
+        self.assertEqual(['42', 13], obj.values('first_baz', 'second_baz'))
+        self.assertEqual(['13', '42'], obj.values('other_baz', 'any_baz'))
+        self.assertEqual([None, None], obj.values('missing', 'missing_int'))
+        self.assertEqual([None, 42], [obj.values('baz', 'bar')[0],
+                                      obj.values('baz', 'bar')[1].baz])
+        # non-field attributes are retrieved normally
+        self.assertEqual(['42', XmlObj], obj.values('first_baz', '__class__'))
+        self.assertRaises(AttributeError, obj.values, 'first_baz', 'bogus')
+
+        # dictionary, with node fields converted recursively
+        data = obj.to_dict()
+        self.assertEqual('42', data['first_baz'])
+        self.assertEqual(['42', '13'], data['bazes'])
+        self.assertEqual([{'baz': 42}, {'baz': 13}], data['bars'])
+        self.assertEqual({'baz': 42}, data['first_bar'])
+        self.assertEqual({}, data['first_node'])
+        self.assertEqual(None, data['missing'])
+        data = obj.to_dict(depth=0)
+        self.assert_('bars' not in data)
+        self.assert_('first_bar' not in data)
+        self.assertEqual(['42', '13'], data['bazes'])
+        self.assertEqual({'first_baz': '42', 'bars': [{'baz': 42}, {'baz': 13}]},
+                         obj.to_dict(fields=['first_baz', 'bars']))
+        self.assert_('bars' not in obj.to_dict(exclude=['bars']))
+
+    def test_identity_map(self):
+        class SubObj(xmlmap.XmlObject):
+            baz = xmlmap.NodeField('baz', xmlmap.XmlObject)
+        class XmlObj(xmlmap.XmlObject):
+            IDENTITY_MAP = True
+            first_bar = xmlmap.NodeField('bar[1]', SubObj)
+            bars = xmlmap.NodeListField('bar', SubObj)
+            generic = xmlmap.NodeField('bar[1]', xmlmap.XmlObject)
+            baz = xmlmap.StringField('bar[1]/baz')
+
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+        bar = obj.first_bar
+        self.assert_(bar is obj.first_bar)
+        self.assert_(bar is obj.bars[0])
+        self.assert_(bar is obj.values('first_bar', 'baz')[0])
+        self.assert_(obj.bars[1] is obj.bars[1])
+        # objects reached through wrapped objects share the identity map
+        self.assert_(bar.baz is obj.bars[0].baz)
+        # wrapping the same node as a different class gives a different object
+        self.assert_(obj.generic is not bar)
+        self.assertEqual(bar.node, obj.generic.node)
+
+        # the objects are freed along with the map, when no longer used
+        identity_map = weakref.ref(obj._identity_map)
+        self.assertEqual(4, len(obj._identity_map))
+        del obj, bar
+        gc.collect()
+        self.assertEqual(None, identity_map())
+
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT, XmlObj)
+
+        # without the identity map, every access creates a new object
+        obj.IDENTITY_MAP = False
+        obj._identity_map = None
+        self.assert_(obj.first_bar is not obj.first_bar)
+        self.assertEqual(obj.first_bar, obj.first_bar)
+
+    def test_slots(self):
+        class SubObj(xmlmap.XmlObject):
+            CACHE_TEXT = True
+            baz = xmlmap.StringField('baz')
+        class DynamicObj(SubObj):
+            DYNAMIC_ATTRIBUTES = True
+
+        obj = xmlmap.load_xmlobject_from_string(TestXsl.FIXTURE_TEXT)
+        bar = SubObj(obj.node.xpath('bar[1]')[0])
+        self.assertEqual((), SubObj.__slots__)
+        self.assert_(not hasattr(bar, '__dict__'))
+        self.assertRaises(AttributeError, setattr, bar, 'bogus', 1)
+        # fields and options work as before
+        self.assertEqual('42', bar.baz)
+        bar.baz = '43'
+        self.assertEqual('43', unicode(bar))
+        # options set on the class can be overridden on an instance
+        self.assertEqual(True, SubObj.CACHE_TEXT)
+        bar.CACHE_TEXT = False
+        self.assertEqual(False, bar.CACHE_TEXT)
+        self.assertEqual(True, SubObj.CACHE_TEXT)
+        self.assertEqual(True, SubObj(bar.node).CACHE_TEXT)
+        del bar.CACHE_TEXT
+        self.assertEqual(True, bar.CACHE_TEXT)
+
+        # subclasses can opt out, to set other attributes
+        dynamic = DynamicObj(bar.node)
+        dynamic.bogus = 1
+        self.assertEqual(1, dynamic.bogus)
+        self.assertEqual('43', dynamic.baz)
+
     def test_quickinit(self):
         class XmlObj(xmlmap.XmlObject):
             ROOT_NAME = 'foo'
@@ -373,5 +786,310 @@ class TestLoadSchema(unittest.TestCase):
             self.assert_('Failed to parse' in str(parse_err),
                 'schema parse exception includes detail about what went wrong')
 
+class TestParserPool(unittest.TestCase):
+
+    def test_reuse(self):
+        first = xmlmap.parseString('<foo/>').getroottree().parser
+        # parsers are re-used for subsequent parses in the same thread
+        self.assert_(first is xmlmap.parseString('<bar/>').getroottree().parser)
+        self.assert_(first is xmlmap.load_xmlobject_from_string('<foo/>',
+                        resolver=xmlmap.default_resolver).node.getroottree().parser)
+        # different settings use a different parser
+        no_resolver = xmlmap.load_xmlobject_from_string('<foo/>').node.getroottree().parser
+        self.assert_(first is not no_resolver)
+
+        # each thread has its own parsers
+        parsers = []
+        thread = threading.Thread(target=lambda:
+            parsers.append(xmlmap.parseString('<foo/>').getroottree().parser))
+        thread.start()
+        thread.join()
+        self.assert_(first is not parsers[0])
+
+    def test_nested(self):
+        # a parser in use is not handed out again
+        with xmlmap._parser_pool.parser() as parser:
+            self.assert_(parser is not xmlmap.parseString('<foo/>').getroottree().parser)
+
+    def test_errors(self):
+        with xmlmap._parser_pool.parser() as parser:
+            pass
+        # parsers are discarded after errors
+        self.assertRaises(etree.XMLSyntaxError, xmlmap.parseString, '<foo>')
+        self.assert_(parser is not xmlmap.parseString('<foo/>').getroottree().parser)
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    XSD = '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+            <xsd:element name="a" type="xsd:string"/>
+        </xsd:schema>
+    '''
+
+    def setUp(self):
+        self.registry = xmlmap.SchemaRegistry()
+        self.xsd_file = tempfile.NamedTemporaryFile(mode="w")
+        self.xsd_file.write(self.XSD)
+        self.xsd_file.flush()
+        # count loads by wrapping the module-level loadSchema
+        self.loads = []
+        self._loadSchema = xmlmap.loadSchema
+        def counting_loadSchema(uri, base_uri=None):
+            self.loads.append(uri)
+            return self._loadSchema(uri, base_uri)
+        xmlmap.loadSchema = counting_loadSchema
+
+    def tearDown(self):
+        xmlmap.loadSchema = self._loadSchema
+        self.xsd_file.close()
+
+    def test_get(self):
+        schema = self.registry.get(self.xsd_file.name)
+        self.assert_(isinstance(schema, etree.XMLSchema))
+        # subsequent requests get the same schema without loading again
+        self.assert_(schema is self.registry.get(self.xsd_file.name))
+        self.assertEqual([self.xsd_file.name], self.loads)
+
+        # forget causes the schema to be loaded again
+        self.registry.forget(self.xsd_file.name)
+        self.assert_(schema is not self.registry.get(self.xsd_file.name))
+        self.assertEqual(2, len(self.loads))
+
+    def test_failures(self):
+        # load errors are raised every time, but only loaded once
+        self.assertRaises(IOError, self.registry.get, '/bogus.xsd')
+        self.assertRaises(IOError, self.registry.get, '/bogus.xsd')
+        self.assertEqual(['/bogus.xsd'], self.loads)
+
+        # schemas not loaded for lack of a proxy are remembered
+        xmlmap.loadSchema = lambda uri, base_uri=None: self.loads.append(uri)
+        self.assertEqual(None, self.registry.get('http://example.com/a.xsd'))
+        self.assertEqual(None, self.registry.get('http://example.com/a.xsd'))
+        self.assertEqual(2, len(self.loads))
+
+        # failures are retried once the retry interval has passed
+        self.registry.retry_interval = 0
+        self.assertEqual(None, self.registry.get('http://example.com/a.xsd'))
+        self.assertEqual(3, len(self.loads))
+
+    def test_threads(self):
+        results = []
+        def get_schema():
+            results.append(self.registry.get(self.xsd_file.name))
+        threads = [threading.Thread(target=get_schema) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(10, len(results))
+        self.assert_(all(schema is results[0] for schema in results))
+
+    def test_xmlobject(self):
+        class TestSchemaObject(xmlmap.XmlObject):
+            XSD_SCHEMA = self.xsd_file.name
+            ROOT_NAME = 'a'
+
+        xmlmap.schema_registry.forget(self.xsd_file.name)
+        obj = TestSchemaObject()
+        other = TestSchemaObject()
+        # instances share the schema, loaded once
+        self.assert_(obj.xmlschema is other.xmlschema)
+        self.assert_(obj.xmlschema is xmlmap.schema_registry.get(self.xsd_file.name))
+        self.assertEqual(1, len(self.loads))
+        self.assertTrue(obj.is_valid())
+
+    def test_validate(self):
+        valid = etree.XML('<a>valid</a>')
+        invalid = etree.XML('<b>invalid</b>')
+        self.assertEqual(0, len(self.registry.validate(valid, self.xsd_file.name)))
+        errors = self.registry.validate(invalid, self.xsd_file.name)
+        self.assertEqual(1, len(errors))
+        # errors are not affected by later validations
+        self.registry.validate(valid, self.xsd_file.name)
+        self.assertEqual(1, len(errors))
+        # the schema is loaded once, plus one copy used to validate that is
+        # reused
+        self.assertEqual(2, len(self.loads))
+        self.assertEqual(1, len(self.registry._validators[(self.xsd_file.name, None)]))
+        self.registry.forget(self.xsd_file.name)
+        self.assertEqual({}, dict(self.registry._validators))
+        # no errors, and no validation, if the schema can't be loaded
+        xmlmap.loadSchema = lambda uri, base_uri=None: None
+        self.assertEqual(None, self.registry.validate(valid, 'http://example.com/a.xsd'))
+
+    def test_validate_failures(self):
+        valid = etree.XML('<a>valid</a>')
+        # errors loading or parsing a schema are reported as by loadSchema
+        self.assertRaises(IOError, self.registry.validate, valid, '/bogus.xsd')
+        bad_xsd = tempfile.NamedTemporaryFile(mode="w")
+        bad_xsd.write('<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema"><xsd:bogus/></xsd:schema>')
+        bad_xsd.flush()
+        try:
+            self.assertRaises(etree.XMLSchemaParseError, self.registry.validate,
+                              valid, bad_xsd.name)
+        finally:
+            bad_xsd.close()
+
+        # including when compiling another copy of a loaded schema
+        self.registry.get(self.xsd_file.name)
+        self.xsd_file.close()
+        try:
+            self.registry.validate(valid, self.xsd_file.name)
+        except IOError as err:
+            self.assert_('Failed to load schema %s' % self.xsd_file.name in str(err))
+        else:
+            self.fail('expected an IOError for a schema that can no longer be loaded')
+
+    def test_validate_many(self):
+        class TestSchemaObject(xmlmap.XmlObject):
+            XSD_SCHEMA = self.xsd_file.name
+
+        # each invalid document has a different root element, which the
+        # error for that document should mention
+        objects = []
+        for i in range(200):
+            xml = '<a>%d</a>' % i if i % 2 else '<b%d/>' % i
+            objects.append(xmlmap.load_xmlobject_from_string(xml, TestSchemaObject))
+        results = xmlmap.validate_many(objects, threads=8)
+        self.assertEqual(200, len(results))
+        for i, errors in enumerate(results):
+            if i % 2:
+                self.assertEqual([], errors)
+            else:
+                self.assertEqual(1, len(errors))
+                self.assert_("'b%d'" % i in errors[0].message)
+        # errors are also kept with each object
+        self.assert_(objects[0].schema_validation_errors() is results[0])
+        self.assertTrue(objects[1].is_valid())
+
+        # a schema not from the registry is used by one thread at a time
+        class OtherSchemaObject(xmlmap.XmlObject):
+            xmlschema = etree.XMLSchema(etree.XML(self.XSD))
+        objects = [xmlmap.load_xmlobject_from_string('<b%d/>' % i, OtherSchemaObject)
+                   for i in range(20)]
+        for i, errors in enumerate(xmlmap.validate_many(objects, threads=4)):
+            self.assert_("'b%d'" % i in errors[0].message)
+
+    def test_lazy_xmlschema(self):
+        xmlmap.schema_registry.forget(self.xsd_file.name)
+        class TestSchemaObject(xmlmap.XmlObject):
+            XSD_SCHEMA = self.xsd_file.name
+            ROOT_NAME = 'a'
+
+        # defining and instantiating the class doesn't load the schema
+        obj = TestSchemaObject()
+        self.assertEqual([], self.loads)
+        # schema is loaded on first use, for the class or an instance
+        self.assert_(isinstance(TestSchemaObject.xmlschema, etree.XMLSchema))
+        self.assert_(obj.xmlschema is TestSchemaObject.xmlschema)
+        self.assertEqual(1, len(self.loads))
+        self.assertEqual(None, xmlmap.XmlObject.xmlschema)
+
+        # a schema set on an instance or subclass takes precedence
+        schema = etree.XMLSchema(etree.XML(self.XSD))
+        obj.xmlschema = schema
+        self.assert_(obj.xmlschema is schema)
+        class OtherSchemaObject(TestSchemaObject):
+            xmlschema = schema
+        self.assert_(OtherSchemaObject().xmlschema is schema)
+
+
+class TestCachingResolver(unittest.TestCase):
+    # schema a imports b from another server, which includes c relative to b
+    SCHEMAS = {
+        'http://example.invalid/a.xsd': '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:b="urn:b">
+            <xsd:import namespace="urn:b" schemaLocation="http://other.invalid/xsd/b.xsd"/>
+            <xsd:element name="a" type="b:BType"/>
+        </xsd:schema>''',
+        'http://other.invalid/xsd/b.xsd': '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:b">
+            <xsd:include schemaLocation="c.xsd"/>
+        </xsd:schema>''',
+        'http://other.invalid/xsd/c.xsd': '''<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:b">
+            <xsd:simpleType name="BType"><xsd:restriction base="xsd:string"/></xsd:simpleType>
+        </xsd:schema>''',
+    }
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fetched = []
+        self._urlopen = xmlmap.urllib2.urlopen
+        def urlopen(url):
+            self.fetched.append(url)
+            if url not in self.SCHEMAS:
+                raise IOError('not found: %s' % url)
+            return StringIO(self.SCHEMAS[url])
+        xmlmap.urllib2.urlopen = urlopen
+
+    def tearDown(self):
+        xmlmap.urllib2.urlopen = self._urlopen
+        shutil.rmtree(self.tmpdir)
+
+    def load(self, resolver, url='http://example.invalid/a.xsd'):
+        parser = etree.XMLParser()
+        parser.resolvers.add(resolver)
+        return etree.XMLSchema(etree.parse(url, parser))
+
+    def test_cache(self):
+        cache_dir = path.join(self.tmpdir, 'cache')
+        resolver = xmlmap.CachingResolver(cache_dir=cache_dir)
+        schema = self.load(resolver)
+        self.assert_(schema.validate(etree.fromstring('<a>text</a>')))
+        self.assertEqual(3, len(self.fetched))
+        self.assertEqual((0, 3), (resolver.hits, resolver.misses))
+        self.assertEqual(3, len(os.listdir(cache_dir)))
+
+        # loading again uses the in-memory copies
+        self.load(resolver)
+        self.assertEqual((3, 3), (resolver.hits, resolver.misses))
+
+        # a new resolver with the same cache directory works offline
+        offline = xmlmap.CachingResolver(cache_dir=cache_dir, offline=True)
+        self.load(offline)
+        self.assertEqual((3, 0), (offline.hits, offline.misses))
+        self.assertEqual(3, len(self.fetched))
+
+    def test_offline(self):
+        resolver = xmlmap.CachingResolver(offline=True)
+        self.assertRaises(Exception, self.load, resolver)
+        self.assertEqual([], self.fetched)
+        self.assertRaises(IOError, resolver.get, 'http://example.invalid/a.xsd')
+
+    def test_catalog(self):
+        # local copies of the schemas, and a catalog pointing to them
+        os.mkdir(path.join(self.tmpdir, 'other'))
+        for url, name in [('http://example.invalid/a.xsd', 'a.xsd'),
+                          ('http://other.invalid/xsd/b.xsd', 'other/b.xsd'),
+                          ('http://other.invalid/xsd/c.xsd', 'other/c.xsd')]:
+            with open(path.join(self.tmpdir, name), 'w') as local_copy:
+                local_copy.write(self.SCHEMAS[url])
+        catalog = path.join(self.tmpdir, 'catalog.xml')
+        with open(catalog, 'w') as catalog_file:
+            catalog_file.write('''<catalog xmlns="urn:oasis:names:tc:entity:xmlns:xml:catalog">
+                <system systemId="http://example.invalid/a.xsd" uri="a.xsd"/>
+                <rewriteURI uriStartString="http://other.invalid/xsd/" rewritePrefix="other/"/>
+            </catalog>''')
+
+        resolver = xmlmap.CachingResolver(catalogs=[catalog], offline=True)
+        self.assertEqual(path.join(self.tmpdir, 'other/b.xsd'),
+                         resolver.catalog_location('http://other.invalid/xsd/b.xsd'))
+        schema = self.load(resolver)
+        self.assert_(schema.validate(etree.fromstring('<a>text</a>')))
+        self.assertEqual((3, 0), (resolver.hits, resolver.misses))
+        self.assertEqual([], self.fetched)
+
+    def test_warm(self):
+        cache_dir = path.join(self.tmpdir, 'cache')
+        resolver = xmlmap.CachingResolver(cache_dir=cache_dir)
+        self.assertEqual(['http://example.invalid/a.xsd',
+                          'http://other.invalid/xsd/b.xsd',
+                          'http://other.invalid/xsd/c.xsd'],
+                         resolver.warm('http://example.invalid/a.xsd'))
+        self.assertEqual(3, len(self.fetched))
+
+        offline = xmlmap.CachingResolver(cache_dir=cache_dir, offline=True)
+        self.load(offline)
+        self.assertEqual(3, offline.hits)
+
+
 if __name__ == '__main__':
     main()
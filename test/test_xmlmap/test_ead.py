@@ -136,6 +136,7 @@ class TestEad(unittest.TestCase):
         self.assert_(isinstance(index.entry[0].ptrgroup.ref[0], eadmap.Reference))
         self.assertEqual('simple', index.entry[0].ptrgroup.ref[0].type)
         self.assert_(u'1995 July' in unicode(index.entry[0].ptrgroup.ref[0].value))
+        self.assert_(u'1995 July' in unicode(index.entry[0].ptrgroup.ref[0]))
         self.assertEqual(u'Belton, Neil', unicode(index.entry[1].name))
         self.assert_(u'1993 November 3' in unicode(index.entry[1].ptrgroup.ref[-1].value))
 
@@ -258,6 +259,11 @@ class TestEad(unittest.TestCase):
         self.assertEqual(u'Writings by Seamus Heaney',
             unicode(self.ead.dsc.c[0].did.unittitle.short))
 
+        # cached text is updated for changes made through a nested field
+        self.assertEqual(u'Seamus Heaney collection,1972-2005', unicode(title))
+        title.unitdate.value = '2000'
+        self.assertEqual(u'Seamus Heaney collection,2000', unicode(title))
+
         
 if __name__ == '__main__':
     main()
@@ -16,10 +16,12 @@
 
 #!/usr/bin/env python
 
+from lxml import etree
 import tempfile
 import unittest
 
 import eulxml.xmlmap.core as xmlmap
+from eulxml.xmlmap.fields import IntegerMapper, StringMapper
 from testcore import main
 
 class TestFields(unittest.TestCase):
@@ -314,11 +316,23 @@ class TestFields(unittest.TestCase):
         class TestObject(xmlmap.XmlObject):
             letter = xmlmap.ItemField('substring(bar/baz, 1, 1)')
             missing = xmlmap.ItemField('missing', required=False)
+            id = xmlmap.ItemField('@id')
+            text = xmlmap.ItemField('text()')
+            id_node = xmlmap.NodeField('@id', xmlmap.XmlObject)
 
         obj = TestObject(self.fixture)
         self.assertEqual(obj.letter, '4')
         self.assertEqual(obj.missing, None)
 
+        # simple attribute and text() xpaths still return the lxml results
+        self.assertEqual('a', obj.id)
+        self.assert_(obj.id.getparent() is self.fixture)
+        self.assertTrue(obj.id.is_attribute)
+        self.assertEqual('id', obj.id.attrname)
+        self.assert_(obj.text.getparent() is self.fixture)
+        self.assertTrue(obj.text.is_text)
+        self.assert_(obj.id_node.node.getparent() is self.fixture)
+
         # check required
         self.assertFalse(obj._fields['missing'].required)
 
@@ -436,6 +450,136 @@ class TestFields(unittest.TestCase):
         obj.nested_pred = 'test'
         self.assertEqual(obj.node.xpath('string(pred[pred[@a="foo"]]/val)'), 'test')
 
+    def testCreationPlan(self):
+        class TestObject(xmlmap.XmlObject):
+            deep = xmlmap.StringField('a/b[@type="x"]/c')
+            path_pred = xmlmap.StringField('pred[sub/val="bar"]/val')
+            attr = xmlmap.StringField('a/@id')
+            sibling = xmlmap.StringField('bar/following-sibling::empty_field/@name')
+
+        field = TestObject._fields['deep']
+        plan = field._creation_plan
+        self.assertEqual(['a', 'b', 'c'],
+                         [step.xast.node_test.name for step in plan.steps])
+        self.assertEqual(['a', "a/b[@type='x']"], plan.paths)
+        self.assertEqual('child', plan.terminal.kind)
+
+        obj = TestObject(self.fixture)
+        obj.deep = 'one'
+        self.assertEqual('one', obj.node.xpath('string(a/b[@type="x"]/c)'))
+        # existing portions of the path are re-used
+        obj.attr = 'a1'
+        self.assertEqual(1, len(obj.node.xpath('a')))
+        self.assertEqual('a1', obj.node.xpath('string(a/@id)'))
+        # the plan is re-used for subsequent sets
+        self.assert_(plan is field._creation_plan)
+        del obj.deep
+        self.assertEqual(0, len(obj.node.xpath('a/b/c')))
+
+        # predicates with paths are constructed
+        obj.path_pred = 'test'
+        self.assertEqual('test', obj.node.xpath('string(pred[sub/val="bar"]/val)'))
+
+        # steps that can't be constructed only fail when creation is needed
+        self.assertEqual(None, obj.sibling)
+        obj.sibling = 'still here'
+        self.assertEqual('still here', obj.sibling)
+        obj.node.remove(obj.node.find('empty_field'))
+        self.assertRaises(Exception, setattr, obj, 'sibling', 'gone')
+
+    def testCreateElement(self):
+        class TestObject(xmlmap.XmlObject):
+            ROOT_NAMESPACES = {'ex': 'http://example.com/'}
+            missing_ns = xmlmap.StringField('ex:missing')
+            sub_ns = xmlmap.StringField('ex:missing/ex:sub')
+
+        obj = TestObject(self.fixture)
+        step = TestObject._fields['missing_ns']._creation_plan.terminal
+        tag, nsmap = step.element_name(obj.context)
+        self.assertEqual('{http://example.com/}missing', tag)
+        self.assertEqual({'ex': 'http://example.com/'}, dict(nsmap))
+        # element names are cached per context
+        self.assert_(step.element_name(obj.context)[0] is tag)
+
+        obj.missing_ns = 'here'
+        obj.sub_ns = 'there'
+        # namespaces already declared on the parent are not repeated
+        self.assert_('<ex:missing>here<ex:sub>there</ex:sub></ex:missing>'
+                     in obj.serialize())
+
+        # new elements declare namespaces from the context where needed
+        bare = TestObject(etree.fromstring('<foo/>'))
+        bare.missing_ns = 'here'
+        self.assertEqual('<foo><ex:missing xmlns:ex="http://example.com/">here' +
+                         '</ex:missing></foo>', bare.serialize())
+
+    def testCompiledXpath(self):
+        class TestObject(xmlmap.XmlObject):
+            val = xmlmap.StringField('bar[1]/baz')
+            missing_ns = xmlmap.StringField('ex:missing')
+
+        obj = TestObject(self.fixture)
+        field = TestObject._fields['val']
+        compiled = field.compiled_xpath(obj.context)
+        self.assert_(isinstance(compiled, etree.XPath))
+        self.assertEqual('bar[1]/baz', compiled.path)
+        # same namespaces should re-use the cached xpath
+        self.assert_(compiled is field.compiled_xpath({'namespaces': dict(obj.context['namespaces'])}))
+        # different namespaces get a different compiled xpath
+        self.assert_(compiled is not field.compiled_xpath({'namespaces': {'foo': 'urn:foo'}}))
+        self.assertEqual('42', obj.val)
+
+        # setting values goes through the compiled xpath as well
+        obj.missing_ns = 'here'
+        self.assertEqual('here', obj.missing_ns)
+        self.assertEqual('here', obj.node.xpath('string(ex:missing)',
+                                                namespaces=self.namespaces))
+
+        # contexts with extension functions can't be compiled and cached
+        self.assertEqual('bar[1]/baz',
+            field.compiled_xpath({'extensions': {(None, 'f'): lambda c: 1}}))
+
+    def testSimpleXpath(self):
+        xml = '''<foo xmlns:ex='http://example.com/' id='a' ex:id='b'>text
+            <bar/><!-- comment -->tail<bar/></foo>'''
+        node = etree.fromstring(xml)
+        context = {'namespaces': self.namespaces}
+        for xpath in ['@id', '@ex:id', '@missing', 'text()']:
+            field = xmlmap.StringField(xpath)
+            compiled = field.compiled_xpath(context, read_only=True)
+            self.assert_(not isinstance(compiled, etree.XPath),
+                         '%s should be read without the xpath engine' % xpath)
+            self.assertEqual(xpath, compiled.path)
+            self.assertEqual(node.xpath(xpath, namespaces=self.namespaces),
+                             compiled(node),
+                             'simple evaluation of %s should match xpath' % xpath)
+            # values that may be updated always use the xpath engine
+            self.assert_(isinstance(field.compiled_xpath(context), etree.XPath))
+
+        for xpath in ['bar', '@*', '@id[. = "a"]', 'bar/@id', 'node()', 'text()[1]']:
+            self.assertEqual(None, xmlmap.StringField(xpath)._simple_step)
+        # undefined prefixes are left to the xpath engine
+        field = xmlmap.StringField('@ex:id')
+        self.assert_(isinstance(field.compiled_xpath({}, read_only=True), etree.XPath))
+
+    def testMapperShortcuts(self):
+        # text-only elements are converted without the xpath engine; the
+        # results should match those for elements with child nodes
+        xml = '''<foo><s> a  b\t\n c </s><m> a <!-- x --> b\t\n c </m>
+            <i> 42 </i><j>4<!-- x -->2</j><k>+4</k><l>4.0</l><e/></foo>'''
+        node = etree.fromstring(xml)
+        s, m, i, j, k, l, e = list(node)
+        self.assertEqual(' a  b\t\n c ', StringMapper().to_python(s))
+        self.assertEqual('a b c', StringMapper(normalize=True).to_python(s))
+        self.assertEqual('a b c', StringMapper(normalize=True).to_python(m))
+        self.assertEqual('', StringMapper().to_python(e))
+        mapper = IntegerMapper()
+        self.assertEqual(42, mapper.to_python(i))
+        self.assertEqual(42, mapper.to_python(j))
+        self.assertEqual(None, mapper.to_python(k))
+        self.assertEqual(4, mapper.to_python(l))
+        self.assertEqual(None, mapper.to_python(e))
+
 # tests for settable listfields
 class SubList(xmlmap.XmlObject):
     ROOT_NAME = 'sub'
@@ -484,12 +628,30 @@ class TestNodeList(unittest.TestCase):
 
     def test_index_checking(self):
         self.assertRaises(TypeError, self.obj.str.__getitem__, 'a')
-        self.assertRaises(AssertionError, self.obj.str.__getitem__, slice(0, 10))
         self.assertRaises(TypeError, self.obj.str.__setitem__, 'a', 'val')
         self.assertRaises(AssertionError, self.obj.str.__setitem__, slice(0, 10), ['val'])
         self.assertRaises(TypeError, self.obj.str.__delitem__, 'a')
         self.assertRaises(AssertionError, self.obj.str.__delitem__, slice(0, 10))
 
+    def test_slice(self):
+        letters = self.obj.letters
+        all_letters = list(letters)
+        self.assertEqual(all_letters[2:5], letters[2:5])
+        self.assertEqual(all_letters[:3], letters[:3])
+        self.assertEqual(all_letters[-3:], letters[-3:])
+        self.assertEqual(all_letters[::2], letters[::2])
+        self.assertEqual(all_letters[8:100], letters[8:100])
+        self.assertEqual([], letters[5:2])
+        self.assertEqual([], self.obj.empty[0:10])
+        self.assertEqual(all_letters[3:6], list(letters.islice(3, 6)))
+        self.assertEqual(all_letters[9:], list(letters.islice(9)))
+        self.assertEqual(['007'], [n.id for n in self.obj.nodes[0:1]])
+
+        class SnapshotTestObject(ListTestObject):
+            SNAPSHOT_LISTS = True
+        obj = SnapshotTestObject(self.fixture)
+        self.assertEqual(all_letters[2:5], obj.letters[2:5])
+
     def test_equals(self):
         # custom equal/not equals allows comparing to normal lists
         self.assertTrue(self.obj.int == [42, 13])
@@ -772,7 +934,97 @@ class TestNodeList(unittest.TestCase):
             "length of nodelistfield should be 3 after extending with 2 nodes, got %d" \
             % len(self.obj.nodes))
         self.assertEqual(node1.id, self.obj.nodes[1].id)
-        self.assertEqual(node2.id, self.obj.nodes[2].id)        
+        self.assertEqual(node2.id, self.obj.nodes[2].id)
+
+        # new nodes are added immediately after the last item in the list
+        self.obj.str.extend(['one', 'two'])
+        self.assertEqual(['baz', 'baz', 'baz', 'baz', 'bar'],
+                         [child.tag for child in self.obj.node[:5]])
+
+    def test_replace_all(self):
+        letters = self.obj.letters
+        # shorter list: existing nodes updated, extras removed
+        letters.replace_all(['x', 'y'])
+        self.assertEqual(['x', 'y'], letters)
+        self.assertEqual(2, len(self.obj.node.findall('l')))
+        # longer list: extra nodes added after the last item
+        letters.replace_all(['p', 'q', 'r', 's'])
+        self.assertEqual(['p', 'q', 'r', 's'], letters)
+        self.assertEqual('sub', self.obj.node.findall('l')[-1].getnext().tag)
+
+        # empty list
+        self.obj.empty.replace_all(['a', 'b'])
+        self.assertEqual(['a', 'b'], self.obj.empty)
+        letters.replace_all([])
+        self.assertEqual([], letters)
+
+        # node list
+        node = SubList()
+        node.id = '1a'
+        self.obj.nodes.replace_all([self.obj.nodes[0], node])
+        self.assertEqual(['007', '1a'], [n.id for n in self.obj.nodes])
+
+    def test_replace_all_reorder(self):
+        # add two more sub nodes, for a list of three xmlobjects
+        for id in ['008', '009']:
+            node = SubList()
+            node.id = id
+            self.obj.nodes.append(node)
+        nodes = list(self.obj.nodes)
+        self.assertEqual(['007', '008', '009'], [n.id for n in nodes])
+
+        # swap: nodes already in the list are moved, not lost
+        self.obj.nodes = [nodes[1], nodes[0], nodes[2]]
+        self.assertEqual(['008', '007', '009'], [n.id for n in self.obj.nodes])
+        self.assertEqual(['side-a', 'side-b'], self.obj.nodes[1].parts)
+        self.obj.nodes = [nodes[0], nodes[1]]
+        self.assertEqual(['007', '008'], [n.id for n in self.obj.nodes])
+        self.assertEqual(2, len(self.obj.node.findall('sub')))
+
+        # reverse and rotate three items
+        self.obj.nodes.append(nodes[2])
+        self.obj.nodes = list(reversed(nodes))
+        self.assertEqual(['009', '008', '007'], [n.id for n in self.obj.nodes])
+        self.obj.nodes = nodes[1:] + nodes[:1]
+        self.assertEqual(['008', '009', '007'], [n.id for n in self.obj.nodes])
+        # rotation that also adds and drops items
+        node = SubList()
+        node.id = '010'
+        self.obj.nodes = [nodes[0], nodes[1], node]
+        self.assertEqual(['007', '008', '010'], [n.id for n in self.obj.nodes])
+        self.assertEqual(3, len(self.obj.node.findall('sub')))
+
+    def test_replace_all_changes(self):
+        letters = self.obj.letters
+        orig_letters = list(letters)
+        orig_nodes = self.obj.node.findall('l')
+        # change one item: only that node is modified
+        new_letters = list(orig_letters)
+        new_letters[4] = 'q'
+        letters.replace_all(new_letters)
+        self.assertEqual(new_letters, letters)
+        nodes = self.obj.node.findall('l')
+        self.assertEqual(orig_nodes, nodes)
+        self.assertEqual('q', nodes[4].text)
+
+        # remove from the middle: the other nodes are untouched
+        del new_letters[3:6]
+        letters.replace_all(new_letters)
+        self.assertEqual(new_letters, letters)
+        self.assertEqual(orig_nodes[:3] + orig_nodes[6:], self.obj.node.findall('l'))
+
+        # add in the middle: new nodes are created in place
+        new_letters[2:2] = ['x', 'y']
+        letters.replace_all(new_letters)
+        self.assertEqual(new_letters, letters)
+        nodes = self.obj.node.findall('l')
+        self.assertEqual(orig_nodes[:2], nodes[:2])
+        self.assertEqual(orig_nodes[2:3] + orig_nodes[6:], nodes[4:])
+
+        # delete removes every item, including duplicates
+        del self.obj.letters
+        self.assertEqual([], self.obj.letters)
+        self.assertEqual(0, len(self.obj.node.findall('l')))
 
     def test_insert(self):
         letters = self.obj.letters
@@ -824,6 +1076,65 @@ class TestNodeList(unittest.TestCase):
         self.assertEqual(node.id, self.obj.nodes[0].id)
         self.assertEqual(node.parts, self.obj.nodes[0].parts)
 
+    def test_len_exists(self):
+        converted = []
+        class CountingMapper(object):
+            def to_python(self, node):
+                converted.append(node)
+                return node
+
+        letters = self.obj.letters
+        letters.mapper = CountingMapper()
+        self.assertEqual(11, len(letters))
+        self.assertTrue(letters.exists())
+        self.assertTrue(letters)
+        self.assertEqual([], converted,
+            'len and exists should not convert list items')
+
+        self.assertEqual(0, len(self.obj.empty))
+        self.assertFalse(self.obj.empty.exists())
+        self.assertFalse(self.obj.empty)
+        self.assertEqual(1, len(self.obj.nodes))
+        self.assertTrue(self.obj.nodes)
+
+    def test_snapshot(self):
+        class SnapshotTestObject(ListTestObject):
+            SNAPSHOT_LISTS = True
+            first_letter = xmlmap.StringField('l[1]')
+
+        obj = SnapshotTestObject(self.fixture)
+        letters = obj.letters
+        self.assert_(letters.snapshot)
+        self.assert_(letters is obj.letters,
+            'list field should return the same NodeList in snapshot mode')
+        self.assert_(obj.nodes[0] is obj.nodes[0],
+            'converted values should be cached in snapshot mode')
+        self.assertEqual(['forty-two', 'thirteen'], obj.str)
+
+        # changes through the list are reflected
+        letters.append('z')
+        self.assertEqual('z', letters[-1])
+        letters[0] = 'q'
+        self.assertEqual('q', obj.letters[0])
+        del letters[0]
+        self.assertEqual('b', letters[0])
+
+        # changes through the owning xmlobject are reflected
+        obj.str = ['one']
+        self.assertEqual(['one'], obj.str)
+        obj.first_letter = 'r'
+        self.assertEqual('r', letters[0])
+
+        # changes made directly in the xml are not seen until refresh
+        obj.node.remove(obj.node.find('l'))
+        self.assertEqual('r', letters[0])
+        letters.refresh()
+        self.assertEqual('a', letters[0])
+
+        # default mode is not affected
+        self.assertFalse(self.obj.letters.snapshot)
+        self.assert_(self.obj.letters is not self.obj.letters)
+
 
 if __name__ == '__main__':
     main()